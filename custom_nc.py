@@ -103,140 +103,150 @@ class custom_nc():
         self.model = model
         self.basetime = model_dict[model]['basetime']
 
-def dumptonc_ts(outpath,filename,results_dict,title,basetime):
+# variables of collocation time series:
+# name, key in results_dict, standard_name, long_name, units,
+# packed dtype, scale_factor
+ts_vars = [
+    ('time','date_matches','time matches',
+     'associated time steps between model and observation',
+     None,'f8',None),
+    ('mlats','model_lats_matches','model lats',
+     'latitudes of associated model grid points','degrees north',
+     'f4',None),
+    ('mlons','model_lons_matches','model lons',
+     'longitudes of associated model grid points','degrees east',
+     'f4',None),
+    ('mHs','model_Hs_matches','model Hs',
+     'significant wave height from wave model','m','i2',0.001),
+    ('slats','sat_lats_matches','obs lats',
+     'latitudes of observations','degrees north','f4',None),
+    ('slons','sat_lons_matches','obs lons',
+     'longitudes of observations','degrees east','f4',None),
+    ('sHs','sat_Hs_matches','observed Hs',
+     'significant wave height from wave observation','m','i2',0.001),
+    ('dists','dist_matches','dists',
+     'distances between observations and model grids','km','f4',None),
+    ]
+
+class ts_writer():
+    '''
+    buffered writer of collocation time series (see ts_vars) to one
+    netcdf file with unlimited time dimension. The file is opened
+    once, records are appended when flushsize records are buffered
+    and on close. New files are chunked along time and compressed
+    (zlib, shuffle), with packed=True Hs is stored as int16 with
+    scale_factor 0.001 (up to 32.767 m), coordinates and distances
+    as float32.
+    Existing files are appended with their own layout.
+    '''
+    def __init__(self,fullpath,title,basetime,complevel=None,
+        packed=None,chunksize=None,flushsize=None):
+        if complevel is None:
+            complevel = 4
+        if chunksize is None:
+            # small enough that single appends do not fragment the file
+            chunksize = 512
+        if flushsize is None:
+            flushsize = 8*chunksize
+        self.fullpath = fullpath
+        self.basetime = basetime
+        self.flushsize = flushsize
+        self.buffer = dict([(var[0],[]) for var in ts_vars])
+        self.buffered = 0
+        if os.path.isfile(fullpath):
+            self.nc = netCDF4.Dataset(fullpath,mode='a',clobber=False)
+        else:
+            outpath = os.path.dirname(fullpath)
+            if (outpath != '' and not os.path.isdir(outpath)):
+                os.makedirs(outpath)
+            self.nc = netCDF4.Dataset(fullpath,mode='w',format='NETCDF4')
+            self.create(title,complevel,packed,chunksize)
+
+    def create(self,title,complevel,packed,chunksize):
+        '''
+        dimension and variables of a new file
+        '''
+        nc = self.nc
+        nc.title = title
+        nc.createDimension('time',size=None)
+        for name, key, stdname, longname, units, pdtype, scale in ts_vars:
+            if (packed == True or name == 'time'):
+                dtype = pdtype
+            else:
+                dtype = 'f8'
+            fill_value = None
+            if dtype == 'i2':
+                fill_value = np.int16(-32767)
+            var = nc.createVariable(name,dtype,dimensions=('time',),
+                                    zlib=(complevel>0),
+                                    complevel=max(complevel,1),
+                                    shuffle=True,
+                                    chunksizes=(chunksize,),
+                                    fill_value=fill_value)
+            if dtype == 'i2':
+                var.scale_factor = scale
+                var.add_offset = 0.
+            var.standard_name = stdname
+            var.long_name = longname
+            if name == 'time':
+                var.units = 'seconds since ' + str(self.basetime)
+            else:
+                var.units = units
+
+    def append(self,results_dict):
+        '''
+        buffer the matches of results_dict, flushed when flushsize
+        records are buffered
+        '''
+        from utils import datetime2num
+        for name, key, stdname, longname, units, pdtype, scale in ts_vars:
+            if name == 'time':
+                values = datetime2num(results_dict[key],self.basetime)
+            else:
+                values = np.array(results_dict[key],dtype='float64')
+            self.buffer[name].append(values.ravel())
+        self.buffered += len(results_dict['date_matches'])
+        if self.buffered >= self.flushsize:
+            self.flush()
+
+    def flush(self):
+        '''
+        write buffered records as one slice of each variable
+        '''
+        if self.buffered == 0:
+            return
+        start = len(self.nc.dimensions['time'])
+        stop = start + self.buffered
+        for name in self.buffer.keys():
+            values = np.concatenate(self.buffer[name])
+            var = self.nc.variables[name]
+            if var.dtype.kind == 'i':
+                # nans are stored as fill values of packed variables
+                values = np.ma.masked_invalid(values)
+                limit = (np.iinfo(var.dtype).max
+                         * getattr(var,'scale_factor',1.))
+                if np.ma.any(np.ma.abs(values) > limit):
+                    raise ValueError(name + " exceeds packed range +-"
+                                     + str(limit) + " " + var.units)
+            var[start:stop] = values
+            self.buffer[name] = []
+        self.buffered = 0
+
+    def close(self):
+        self.flush()
+        self.nc.close()
+
+def dumptonc_ts(outpath,filename,results_dict,title,basetime,
+    complevel=None,packed=None,chunksize=None):
     """
     1. check if nc file already exists
     2. - if so use append mode
-       - if not create file
+       - if not create file (chunked and compressed, see ts_writer)
+    For many appends to the same file use ts_writer directly.
     """
-    time_dt = results_dict['date_matches']
-    # create time vector in seconds since first date
-    time = []
-    for dt in time_dt:
-        time.append((dt-basetime).total_seconds())
-    time = np.array(time)
-    mHs = results_dict['model_Hs_matches']
-    mlons = results_dict['model_lons_matches']
-    mlats = results_dict['model_lats_matches']
-    sHs = results_dict['sat_Hs_matches']
-    slons = results_dict['sat_lons_matches']
-    slats = results_dict['sat_lats_matches']
-    dists = results_dict['dist_matches']
-    
     fullpath = outpath + filename
     print ('Dump data to file: ' + fullpath)
-    if os.path.isfile(fullpath):
-        nc = netCDF4.Dataset(
-                        fullpath,mode='a',
-                        clobber=False
-                        )
-        # variables
-        #ncrtime=nc.variables['rtime'][:]
-        startidx = len(nc['time'])
-        endidx = len(nc['time'])+len(time)
-        nc.variables['time'][startidx:endidx] = time[:]
-        nc.variables['mHs'][startidx:endidx] = mHs[:]
-        nc.variables['mlons'][startidx:endidx] = mlons[:]
-        nc.variables['mlats'][startidx:endidx] = mlats[:]
-        nc.variables['sHs'][startidx:endidx] = sHs[:]
-        nc.variables['slons'][startidx:endidx] = slons[:]
-        nc.variables['slats'][startidx:endidx] = slats[:]
-        nc.variables['dists'][startidx:endidx] = dists[:]
-    else:
-        os.system('mkdir -p ' + outpath)
-        nc = netCDF4.Dataset(
-                        fullpath,mode='w',
-                        format='NETCDF4'
-                        )
-        nc.title = title
-        timerange=len(time)
-        dimsize = None
-        # dimensions
-        dimtime = nc.createDimension(
-                                'time',
-                                size=dimsize
-                                )
-        # variables
-        nctime = nc.createVariable(
-                               'time',
-                               np.float64,
-                               dimensions=('time')
-                               )
-        ncmlats = nc.createVariable(
-                               'mlats',
-                               np.float64,
-                               dimensions=('time')
-                               )
-        ncmlons = nc.createVariable(
-                               'mlons',
-                               np.float64,
-                               dimensions=('time')
-                               )
-        ncmHs = nc.createVariable(
-                               'mHs',
-                               np.float64,
-                               dimensions=('time')
-                               )
-        ncslats = nc.createVariable(
-                               'slats',
-                               np.float64,
-                               dimensions=('time')
-                               )
-        ncslons = nc.createVariable(
-                               'slons',
-                               np.float64,
-                               dimensions=('time')
-                               )
-        ncsHs = nc.createVariable(
-                               'sHs',
-                               np.float64,
-                               dimensions=('time')
-                               )
-        ncdists = nc.createVariable(
-                               'dists',
-                               np.float64,
-                               dimensions=('time')
-                               )
-        # generate time for netcdf file
-        # time
-        nctime.standard_name = 'time matches'
-        nctime.long_name = 'associated time steps between model and observation'
-        nctime.units = 'seconds since ' + str(basetime)
-        nctime[:] = time
-        # mHs
-        ncmHs.standard_name = 'model Hs'
-        ncmHs.long_name = 'significant wave height from wave model'
-        ncmHs.units = 'm'
-        ncmHs[:] = mHs
-        # mlons
-        ncmlons.standard_name = 'model lons'
-        ncmlons.long_name = 'longitudes of associated model grid points'
-        ncmlons.units = 'degrees east'
-        ncmlons[:] = mlons
-        # mlats
-        ncmlats.standard_name = 'model lats'
-        ncmlats.long_name = 'latitudes of associated model grid points'
-        ncmlats.units = 'degrees north'
-        ncmlats[:] = mlats
-        # sHs
-        ncsHs.standard_name = 'observed Hs'
-        ncsHs.long_name = 'significant wave height from wave observation'
-        ncsHs.units = 'm'
-        ncsHs[:] = sHs
-        # slons
-        ncslons.standard_name = 'obs lons'
-        ncslons.long_name = 'longitudes of observations'
-        ncslons.units = 'degrees east'
-        ncslons[:] = slons
-        # slats
-        ncslats.standard_name = 'obs lats'
-        ncslats.long_name = 'latitudes of observations'
-        ncslats.units = 'degrees north'
-        ncslats[:] = slats
-        # dists
-        ncdists.standard_name = 'dists'
-        ncdists.long_name = 'distances between observations and model grids'
-        ncdists.units = 'km'
-        ncdists[:] = dists
-    nc.close()
-
+    writer = ts_writer(fullpath,title,basetime,complevel=complevel,
+                       packed=packed,chunksize=chunksize)
+    writer.append(results_dict)
+    writer.close()
@@ -2,16 +2,19 @@
 Based on OJ's plotd22v5.py
 """
 
-#Creat dictionaries and variables
-dat = {'10min':[],'1hr':[]}
-WM1 = {'name':'WM1','Hs_10min':[],'Hs_1hr':[],'Hmax_10min':[],'EMC_10min':[],'EMC_1hr':[],'HEC_10min':[],'HEC_1hr':[],'Tp_10min':[],'Tp_1hr':[],'Tm_10min':[],'Tm_1hr':[],'Mdir_10min':[],'Mdir_1hr':[]}
-WM2 = {'name':'WM2','Hs_10min':[],'Hs_1hr':[],'Hmax_10min':[],'EMC_10min':[],'EMC_1hr':[],'HEC_10min':[],'HEC_1hr':[],'Tp_10min':[],'Tp_1hr':[],'Tm_10min':[],'Tm_1hr':[],'Mdir_10min':[],'Mdir_1hr':[]}
-WM3 = {'name':'WM3','Hs_10min':[],'Hs_1hr':[],'Hmax_10min':[],'EMC_10min':[],'EMC_1hr':[],'HEC_10min':[],'HEC_1hr':[],'Tp_10min':[],'Tp_1hr':[],'Tm_10min':[],'Tm_1hr':[],'Mdir_10min':[],'Mdir_1hr':[]}
+# sensors of each type
+d22_sensors = {'WM':['WM1','WM2','WM3'],
+               'WI':['WIA','WIB','WIC'],
+               'WL':['WL1','WL2','WL3']}
 
-WL1 = {'name':'WL1','Hlat':[]}
-WL2 = {'name':'WL2','Hlat':[]}
-WL3 = {'name':'WL3','Hlat':[]}
+# variables of each sensor type
+d22_vars = {'WM':['Hs_10min','Hs_1hr','Hmax_10min','EMC_10min','EMC_1hr',
+                  'HEC_10min','HEC_1hr','Tp_10min','Tp_1hr','Tm_10min',
+                  'Tm_1hr','Mdir_10min','Mdir_1hr'],
+            'WI':['FF_10min','DD_10min','FF_2min','DD_2min'],
+            'WL':['Hlat']}
 
-WIA = {'name':'WIA','FF_10min':[],'DD_10min':[],'FF_2min':[],'DD_2min':[]}
-WIB = {'name':'WIB','FF_10min':[],'DD_10min':[],'FF_2min':[],'DD_2min':[]}
-WIC = {'name':'WIC','FF_10min':[],'DD_10min':[],'FF_2min':[],'DD_2min':[]}
+# line of the value relative to the line with the sensor name
+d22_lines = {'WM':{'Hs_10min':2,'Hmax_10min':4,'Tp_10min':5,'Tm_10min':11},
+             'WI':{'FF_10min':10,'DD_10min':13},
+             'WL':{'Hlat':2}}
@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------#
+'''
+Reading of model fields from netcdf files, only the requested time
+steps are read and decoded fields are kept in a memory limited LRU
+cache shared by neighbouring fc_dates.
+'''
+__version__ = "0.5.0"
+__author__="Patrik Bohlinger, Norwegian Meteorological Institute"
+__maintainer__ = "Patrik Bohlinger"
+__email__ = "patrikb@met.no"
+__status__ = "under development with operation ARCMFC branch"
+
+# --- import libraries ------------------------------------------------#
+# all class
+import numpy as np
+import os
+from collections import OrderedDict
+
+# read files
+import netCDF4
+
+# import outsorced specs
+from model_specs import model_dict
+
+# --- global functions ------------------------------------------------#
+def nbytes(obj):
+    '''
+    memory used by arrays (including masks) in obj
+    '''
+    if isinstance(obj,(tuple,list)):
+        return sum([nbytes(x) for x in obj])
+    if isinstance(obj,np.ma.MaskedArray):
+        return obj.data.nbytes + np.ma.getmask(obj).nbytes
+    if isinstance(obj,np.ndarray):
+        return obj.nbytes
+    return 0
+
+def file_key(filestr):
+    '''
+    identifies a file including its version, raises IOError as
+    netCDF4 would if the file is missing
+    '''
+    try:
+        st = os.stat(filestr)
+    except OSError as e:
+        raise IOError(e.errno,e.strerror,filestr)
+    return (filestr,st.st_size,st.st_mtime)
+
+def read_only(obj):
+    '''
+    cached arrays are shared, prevent modification in place
+    '''
+    if isinstance(obj,np.ndarray):
+        obj.flags.writeable = False
+    return obj
+
+# ---------------------------------------------------------------------#
+
+
+class field_cache():
+    '''
+    LRU cache for decoded model fields with a memory budget in bytes.
+    Least recently used entries are evicted when the budget is
+    exceeded. hits and misses are counted.
+    '''
+    maxbytes = 1024**3
+
+    def __init__(self,maxbytes=None):
+        if maxbytes is not None:
+            self.maxbytes = maxbytes
+        self._data = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self,key):
+        return key in self._data
+
+    def get(self,key):
+        '''
+        returns cached value and marks it as recently used
+        '''
+        value = self._data.pop(key)
+        self._data[key] = value
+        self.hits += 1
+        return value
+
+    def put(self,key,value):
+        '''
+        adds value and evicts least recently used entries
+        '''
+        self.misses += 1
+        if key in self._data:
+            self.nbytes -= nbytes(self._data.pop(key))
+        self._data[key] = value
+        self.nbytes += nbytes(value)
+        self.evict()
+        return value
+
+    def evict(self):
+        '''
+        remove least recently used entries until within memory budget,
+        the newest entry is always kept
+        '''
+        while (self.nbytes > self.maxbytes and len(self._data) > 1):
+            oldkey, oldvalue = self._data.popitem(last=False)
+            self.nbytes -= nbytes(oldvalue)
+
+    def clear(self):
+        self._data.clear()
+        self.nbytes = 0
+
+    def info(self):
+        return {'hits':self.hits,
+                'misses':self.misses,
+                'entries':len(self._data),
+                'nbytes':self.nbytes,
+                'maxbytes':self.maxbytes}
+
+# cache shared by all readers in the process
+cache = field_cache()
+
+def set_cache_size(maxbytes):
+    '''
+    set memory budget of the shared cache in bytes
+    '''
+    cache.maxbytes = maxbytes
+    cache.evict()
+
+def cache_info():
+    '''
+    hits, misses and memory use of the shared cache
+    '''
+    return cache.info()
+
+def read_model_coords(model,filestr):
+    '''
+    returns model_lons, model_lats of the model file
+    '''
+    key = ('coords',) + file_key(filestr)
+    if key in cache:
+        return cache.get(key)
+    f = netCDF4.Dataset(filestr,'r')
+    model_lons = read_only(f.variables[model_dict[model]['lons']][:])
+    model_lats = read_only(f.variables[model_dict[model]['lats']][:])
+    f.close()
+    return cache.put(key,(model_lons,model_lats))
+
+def read_model_time(model,filestr):
+    '''
+    returns the numeric time steps of the model file
+    '''
+    key = ('time',) + file_key(filestr)
+    if key in cache:
+        return cache.get(key)
+    f = netCDF4.Dataset(filestr,'r')
+    model_time = read_only(f.variables[model_dict[model]['time']][:])
+    f.close()
+    return cache.put(key,model_time)
+
+def get_fields(model,filestr,tidx,varname=None):
+    '''
+    list of model fields [lat,lon] for time indices tidx,
+    time steps not cached are read as one hyperslab for each run
+    of consecutive indices
+    varname -> key of model_dict[model], default is 'Hs'
+    '''
+    if varname is None:
+        varname = 'Hs'
+    fkey = file_key(filestr)
+    tidx = [int(i) for i in tidx]
+    fields = {}
+    missing = []
+    for i in tidx:
+        key = (varname,i) + fkey
+        if key in cache:
+            fields[i] = cache.get(key)
+        elif i not in missing:
+            missing.append(i)
+    if len(missing)>0:
+        # runs of consecutive time steps, sparse time steps are not
+        # read with the steps in between
+        missing = sorted(missing)
+        runs = [[missing[0]]]
+        for i in missing[1:]:
+            if i == runs[-1][-1]+1:
+                runs[-1].append(i)
+            else:
+                runs.append([i])
+        f = netCDF4.Dataset(filestr,'r')
+        var = f.variables[model_dict[model][varname]]
+        for run in runs:
+            start, stop = run[0], run[-1]+1
+            slab = var[start:stop]
+            for i in run:
+                # copy such that the cache does not hold the hyperslab
+                fields[i] = cache.put((varname,i) + fkey,
+                            read_only(slab[i-start].squeeze().copy()))
+            del slab
+        f.close()
+    return [fields[i] for i in tidx]
+
+def read_model_fields(model,filestr,tidx,varname=None):
+    '''
+    returns model fields for time indices tidx as [len(tidx),lat,lon]
+    '''
+    fields = get_fields(model,filestr,tidx,varname=varname)
+    if len(fields)==0:
+        lons, lats = read_model_coords(model,filestr)
+        return np.ma.zeros((0,)+np.shape(lons))
+    return np.ma.concatenate([x[np.newaxis] for x in fields])
+
+def read_model_field(model,filestr,tidx,varname=None):
+    '''
+    returns the model field of time index tidx as [lat,lon],
+    the array is shared with the cache and read-only
+    '''
+    return get_fields(model,filestr,[tidx],varname=varname)[0]
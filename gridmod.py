@@ -0,0 +1,395 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------#
+'''
+Region masks, nearest grid point search trees and station tables of
+model grids, stored on disk per model and grid hash and reused across
+processes and runs.
+'''
+__version__ = "0.5.0"
+__author__="Patrik Bohlinger, Norwegian Meteorological Institute"
+__maintainer__ = "Patrik Bohlinger"
+__email__ = "patrikb@met.no"
+__status__ = "under development with operation ARCMFC branch"
+
+# --- import libraries ------------------------------------------------#
+# all class
+import numpy as np
+import os
+
+# hash and store
+import hashlib
+import pickle
+import tempfile
+import shutil
+import weakref
+
+# get necessary paths for module
+import pathfinder
+
+# region definitions
+from region_specs import regions_dict
+
+# --- global functions ------------------------------------------------#
+def grid_hash(lons,lats):
+    '''
+    hash of the coordinate arrays of a grid
+    '''
+    h = hashlib.sha1()
+    for arr in [lons,lats]:
+        arr = np.ascontiguousarray(np.ma.getdata(arr),dtype='float64')
+        h.update(str(arr.shape).encode())
+        h.update(arr.tobytes())
+    return h.hexdigest()[:16]
+
+def region_hash(region):
+    '''
+    short hash of a region definition such that cached masks are
+    renewed if the definition in regions_dict changes
+    '''
+    if isinstance(region,basestring):
+        region = regions_dict[region]
+    if isinstance(region,dict):
+        region = sorted(region.items())
+    return hashlib.sha1(repr(region).encode()).hexdigest()[:8]
+
+def station_hash(lats,lons):
+    '''
+    short hash of station coordinates
+    '''
+    h = hashlib.sha1()
+    for arr in [lats,lons]:
+        h.update(np.ascontiguousarray(arr,dtype='float64').tobytes())
+    return h.hexdigest()[:16]
+
+def unwrap_polygon(lons,polygon):
+    '''
+    polygon with lons continuous across the dateline i.e. consecutive
+    vertices less than 180 degrees apart, and lons of the points
+    shifted by 360 degrees into the lon range of the polygon
+    '''
+    plons = [float(polygon[0][0])]
+    for p in polygon[1:]:
+        plons.append(plons[-1] + (p[0] - plons[-1] + 180.) % 360. - 180.)
+    polygon = [(plons[i],polygon[i][1]) for i in range(len(polygon))]
+    west = min(plons)
+    lons = np.asarray(lons,dtype='float64')
+    outside = (lons < west) | (lons >= west + 360.)
+    if np.any(outside):
+        lons = np.where(outside,west + (lons - west) % 360.,lons)
+    return lons, polygon
+
+def points_in_polygon(lons,lats,polygon):
+    '''
+    even-odd rule for points given by 1-D arrays lons, lats
+    polygon -> list of (lon,lat) vertices, may cross the dateline
+    points on edges are inside on the west and south side of the
+    polygon and outside on the east and north side
+    '''
+    lons, polygon = unwrap_polygon(lons,polygon)
+    plons = np.array([p[0] for p in polygon],dtype='float64')
+    plats = np.array([p[1] for p in polygon],dtype='float64')
+    inside = np.zeros(len(lons),dtype='bool')
+    j = len(plons)-1
+    for i in range(len(plons)):
+        # edges crossing the latitude of the points
+        cross = np.flatnonzero((plats[i]>lats) != (plats[j]>lats))
+        lon_cross = (plons[i] + (plons[j]-plons[i])
+                    * (lats[cross]-plats[i]) / (plats[j]-plats[i]))
+        inside[cross[lons[cross]<lon_cross]] ^= True
+        j = i
+    return inside
+
+def region_mask(lats,lons,region):
+    '''
+    returns boolean mask for coordinates within region
+    region can be a key of regions_dict, a dict with the same keys
+    or a list of [llcrnrlat,urcrnrlat,llcrnrlon,urcrnrlon]
+    regions are defined by:
+     - boundinglat: polar cap north of boundinglat
+     - llcrnrlat,urcrnrlat,llcrnrlon,urcrnrlon: lat/lon box
+     - polygon: list of (lon,lat) vertices, points are checked
+                only within the bounding box of the polygon, polygons
+                may cross the dateline
+    '''
+    shape = np.shape(lats)
+    lats = np.ma.getdata(lats).ravel()
+    lons = np.ma.getdata(lons).ravel()
+    if region is None:
+        region = "Global"
+    if isinstance(region,basestring):
+        bounds = regions_dict[region]
+    elif isinstance(region,dict):
+        bounds = region
+    else:
+        bounds = {"llcrnrlat":region[0],"urcrnrlat":region[1],
+                  "llcrnrlon":region[2],"urcrnrlon":region[3]}
+    if "boundinglat" in bounds:
+        mask = lats >= bounds["boundinglat"]
+    elif "polygon" in bounds:
+        lons, polygon = unwrap_polygon(lons,bounds["polygon"])
+        plons = [p[0] for p in polygon]
+        plats = [p[1] for p in polygon]
+        # bounding box prefilter
+        cand = np.flatnonzero((lats >= min(plats)) & (lats <= max(plats))
+                            & (lons >= min(plons)) & (lons <= max(plons)))
+        mask = np.zeros(len(lats),dtype='bool')
+        mask[cand] = points_in_polygon(lons[cand],lats[cand],polygon)
+    else:
+        mask = ((lats >= bounds["llcrnrlat"]) & (lats <= bounds["urcrnrlat"])
+              & (lons >= bounds["llcrnrlon"]) & (lons <= bounds["urcrnrlon"]))
+    return mask.reshape(shape)
+
+# grid hashes of read-only coordinate arrays (e.g. from the field
+# cache in fieldmod) by identity, entries vanish with the arrays
+_hash_memo = {}
+
+def memo_grid_hash(lons,lats):
+    '''
+    grid_hash that is computed only once for read-only arrays
+    '''
+    key = (id(lons),id(lats))
+    if key in _hash_memo:
+        rlons, rlats, ghash = _hash_memo[key]
+        if (rlons() is lons and rlats() is lats):
+            return ghash
+    ghash = grid_hash(lons,lats)
+    if not (np.asarray(lons).flags.writeable
+    or np.asarray(lats).flags.writeable):
+        def remove(ref,key=key):
+            entry = _hash_memo.get(key)
+            if (entry is not None and (entry[0] is ref or entry[1] is ref)):
+                del _hash_memo[key]
+        _hash_memo[key] = (weakref.ref(lons,remove),
+                           weakref.ref(lats,remove),ghash)
+    return ghash
+
+# in process memory of already loaded grid indices
+_grid_memo = {}
+
+def get_grid_index(model,lons,lats,cachepath=None):
+    '''
+    returns the grid_index for the given model grid, loaded from
+    cache if the grid was indexed before
+    '''
+    ghash = memo_grid_hash(lons,lats)
+    if (model,ghash) not in _grid_memo:
+        _grid_memo[(model,ghash)] = grid_index(model,lons,lats,
+                                        ghash=ghash,cachepath=cachepath)
+    return _grid_memo[(model,ghash)]
+
+# ---------------------------------------------------------------------#
+
+
+class grid_index():
+    '''
+    class to handle the persistent index of a model grid i.e.
+    flattened lons[n], lats[n], region masks and the spherical
+    KD-tree for each region.
+    Files are stored in cachepath/<model>_<hash>/:
+     - lons.npy, lats.npy (memory-mapped when loaded)
+     - mask_<region>_<hash>.npy (memory-mapped when loaded)
+     - tree_<region>_<hash>_scipy<version>.pkl (pickled KD-tree of
+       points in region, rebuilt if it cannot be loaded)
+     - stations_<hash>_k<knear>.pkl (nearest grid points of stations)
+    where <hash> is the hash of the region definition or of the
+    station coordinates. If the cache directory cannot be written
+    the index is kept in memory only.
+    '''
+    gridcache_path = pathfinder.gridcache_path
+
+    def __init__(self,model,lons,lats,ghash=None,cachepath=None):
+        if cachepath is None:
+            cachepath = self.gridcache_path
+        if ghash is None:
+            ghash = grid_hash(lons,lats)
+        self.model = model
+        self.hash = ghash
+        self.path = os.path.join(cachepath, model + '_' + ghash)
+        self.shape = np.shape(lons)
+        if not os.path.isfile(os.path.join(self.path,'lats.npy')):
+            try:
+                self.build(lons,lats)
+            except (IOError, OSError) as error:
+                # e.g. missing or read-only cache directory
+                print ("Grid index for " + model + " kept in memory: "
+                        + str(error))
+                self.path = None
+        else:
+            print ("Grid index for " + model + " read from: " + self.path)
+        if self.path is None:
+            self.lons = np.ascontiguousarray(np.ma.getdata(lons),
+                                             dtype='float64').ravel()
+            self.lats = np.ascontiguousarray(np.ma.getdata(lats),
+                                             dtype='float64').ravel()
+        else:
+            self.lons = np.load(os.path.join(self.path,'lons.npy'),
+                                mmap_mode='r')
+            self.lats = np.load(os.path.join(self.path,'lats.npy'),
+                                mmap_mode='r')
+        self._masks = {}
+        self._trees = {}
+        self._tables = {}
+
+    def build(self,lons,lats):
+        '''
+        write flattened coordinates and masks for all regions in
+        regions_dict, the directory is renamed in place when complete
+        such that concurrent processes never see a partial index
+        '''
+        print ("Build grid index for " + self.model + " in: " + self.path)
+        lons = np.ascontiguousarray(np.ma.getdata(lons),
+                                    dtype='float64').ravel()
+        lats = np.ascontiguousarray(np.ma.getdata(lats),
+                                    dtype='float64').ravel()
+        parent = os.path.dirname(self.path)
+        if not os.path.isdir(parent):
+            os.makedirs(parent)
+        tmppath = tempfile.mkdtemp(dir=parent)
+        try:
+            np.save(os.path.join(tmppath,'lons.npy'),lons)
+            np.save(os.path.join(tmppath,'lats.npy'),lats)
+            for region in regions_dict.keys():
+                np.save(os.path.join(tmppath,self._fname('mask',region)),
+                        region_mask(lats,lons,region))
+        except (IOError, OSError):
+            shutil.rmtree(tmppath,ignore_errors=True)
+            raise
+        try:
+            os.rename(tmppath,self.path)
+        except OSError:
+            # other process was faster
+            shutil.rmtree(tmppath)
+
+    def mask(self,region):
+        '''
+        boolean mask of the flattened grid for region
+        '''
+        if not isinstance(region,basestring):
+            return region_mask(self.lats,self.lons,region)
+        if region not in self._masks:
+            fname = self._file(self._fname('mask',region))
+            if (fname is not None and os.path.isfile(fname)):
+                self._masks[region] = np.load(fname,mmap_mode='r')
+            else:
+                mask = region_mask(self.lats,self.lons,region)
+                self._save(fname,mask)
+                self._masks[region] = mask
+        return self._masks[region]
+
+    def ridx(self,region):
+        '''
+        indices of the flattened grid within region
+        '''
+        return np.flatnonzero(self.mask(region))
+
+    def tree(self,region):
+        '''
+        spherical KD-tree of grid points within region,
+        tree indices refer to ridx(region)
+        '''
+        from utils import spherical_tree
+        if not isinstance(region,basestring):
+            ridx = self.ridx(region)
+            return spherical_tree(self.lons[ridx],self.lats[ridx])
+        if region not in self._trees:
+            fname = self._file(self._fname('tree',region))
+            tree = self._load(fname)
+            if tree is None:
+                ridx = self.ridx(region)
+                tree = spherical_tree(self.lons[ridx],self.lats[ridx])
+                self._save(fname,tree)
+            self._trees[region] = tree
+        return self._trees[region]
+
+    def station_table(self,lats,lons,knear=None):
+        '''
+        knear (default 8) nearest grid points of the stations at
+        lats, lons from one query of the global KD-tree, the table
+        is stored with the index and built only once for each grid
+        returns dict with
+        idx -> flat grid indices [stations,knear] sorted by distance
+        dists -> distances in km [stations,knear]
+        weights -> normalized inverse distance weights [stations,knear]
+        '''
+        from utils import lonlat2xyz, chord2km
+        if knear is None:
+            knear = 8
+        shash = station_hash(lats,lons)
+        if (shash,knear) not in self._tables:
+            fname = self._file('stations_' + shash
+                               + '_k' + str(knear) + '.pkl')
+            table = self._load(fname)
+            if table is not None:
+                self._tables[(shash,knear)] = table
+            else:
+                tree = self.tree('Global')
+                k = min(knear,tree.n)
+                chord, j = tree.query(lonlat2xyz(lons,lats),k=k)
+                chord = chord.reshape(len(chord),-1)
+                j = j.reshape(len(j),-1)
+                dists = chord2km(chord)
+                with np.errstate(divide='ignore'):
+                    weights = 1./dists
+                # stations on a grid point take its value only
+                exact = dists[:,0]==0
+                weights[exact] = 0.
+                weights[exact,0] = 1.
+                weights = weights/np.sum(weights,axis=1)[:,np.newaxis]
+                table = {'idx':self.ridx('Global')[j],
+                         'dists':dists,'weights':weights}
+                self._save(fname,table)
+                self._tables[(shash,knear)] = table
+        return self._tables[(shash,knear)]
+
+    def _fname(self,kind,region):
+        '''
+        file name for mask or tree of region, pickled trees depend
+        on the scipy version
+        '''
+        from scipy import __version__ as scipy_version
+        if kind == 'mask':
+            ext = '.npy'
+        else:
+            ext = '_scipy' + scipy_version + '.pkl'
+        return kind + '_' + region + '_' + region_hash(region) + ext
+
+    def _file(self,fname):
+        '''
+        path of fname in the index, None for indices in memory
+        '''
+        if self.path is None:
+            return None
+        return os.path.join(self.path,fname)
+
+    def _load(self,fname):
+        '''
+        pickled object or None if missing or not readable e.g. when
+        written by other library versions
+        '''
+        if (fname is None or not os.path.isfile(fname)):
+            return None
+        try:
+            with open(fname,'rb') as f:
+                return pickle.load(f)
+        except Exception as error:
+            print ("Cannot load " + fname + ", rebuilt: " + str(error))
+            return None
+
+    def _save(self,fname,obj):
+        '''
+        write to temporary file and rename to avoid partial files,
+        the object is kept in memory only if this fails
+        '''
+        if fname is None:
+            return
+        try:
+            fd, tmpname = tempfile.mkstemp(dir=self.path)
+            with os.fdopen(fd,'wb') as f:
+                if isinstance(obj,np.ndarray):
+                    np.save(f,obj)
+                else:
+                    pickle.dump(obj,f,protocol=2)
+            os.rename(tmpname,fname)
+        except (IOError, OSError) as error:
+            print ("Cannot write " + fname + ": " + str(error))
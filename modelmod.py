@@ -57,8 +57,14 @@ from model_specs import model_dict
 # matchtime fct
 from stationmod import matchtime
 
+# read model fields
+from fieldmod import read_model_coords, read_model_time, \
+                     read_model_fields
+
 # colocate
-from misc import haversine
+from utils import num2datetime
+from satmod import collocate
+from gridmod import get_grid_index
 
 # module to dump sentinel_class object into nc-file
 # should also treat other similar type data
@@ -158,14 +164,9 @@ def get_model_cont_mode(model,sdate,edate,filestr,expname,sa_obj,
     timewin):
     print ("Read model output file: ")
     print (filestr)
-    # read the file
-    f = netCDF4.Dataset(filestr,'r')
-    model_lons = f.variables[model_dict[model]['lons']][:]
-    model_lats = f.variables[model_dict[model]['lats']][:]
-    model_time = f.variables[model_dict[model]['time']][:]
-    # Hs [time,lat,lon]
-    model_Hs = f.variables[model_dict[model]['Hs']][:].squeeze()
-    f.close()
+    # read coordinates and time, Hs only for matching time steps
+    model_lons, model_lats = read_model_coords(model,filestr)
+    model_time = read_model_time(model,filestr)
     # create datetime objects
     model_basetime = model_dict[model]['basetime']
     model_time_dt=[]
@@ -173,8 +174,9 @@ def get_model_cont_mode(model,sdate,edate,filestr,expname,sa_obj,
         model_time_dt.append(model_basetime
                         + timedelta(seconds=element))
     # adjust to sdate and edate
-    ctime,cidx = matchtime(sdate,edate,model_time,model_basetime,timewin)
-    model_Hs = model_Hs[cidx,:,:]
+    cidx = matchtime(sdate,edate,model_time,model_basetime,timewin,
+                    idxonly=True)
+    model_Hs = read_model_fields(model,filestr,cidx)
     model_time = model_time[cidx]
     model_time_dt = np.array(model_time_dt)[cidx]
     return model_Hs, model_lats, model_lons, model_time, model_time_dt
@@ -220,74 +222,6 @@ def get_model_cont_mode(model,sdate,edate,filestr,expname,sa_obj,
 #    print model_time_dt_valid
 #
 
-def tmploop_get_model(
-    j,sat_time_dt,model_time_dt_valid,distlim,model,
-    sat_rlats,sat_rlons,sat_rHs,
-    model_rlats,model_rlons,model_rHs,
-    moving_win
-    ):
-    lat_win = 0.1
-    if (model=='mwam8' or model=='mwam4' or model=='ARCMFC'
-    or model=='ARCMFCnew'):
-        sat_rlat=sat_rlats[j]
-        sat_rlon=sat_rlons[j]
-        # constraints to reduce workload
-        model_rlats_new=model_rlats[
-                    (model_rlats>=sat_rlat-lat_win)
-                    &
-                    (model_rlats<=sat_rlat+lat_win)
-                    &
-                    (model_rlons>=sat_rlon-moving_win)
-                    &
-                    (model_rlons<=sat_rlon+moving_win)
-                    ]
-        model_rlons_new=model_rlons[
-                    (model_rlats>=sat_rlat-lat_win)
-                    &
-                    (model_rlats<=sat_rlat+lat_win)
-                    &
-                    (model_rlons>=sat_rlon-moving_win)
-                    &
-                    (model_rlons<=sat_rlon+moving_win)
-                    ]
-        tmp=range(len(model_rlats))
-        tmp_idx=np.array(tmp)[
-                    (model_rlats>=sat_rlat-lat_win)
-                    &
-                    (model_rlats<=sat_rlat+lat_win)
-                    &
-                    (model_rlons>=sat_rlon-moving_win)
-                    &
-                    (model_rlons<=sat_rlon+moving_win)
-                    ]
-        # compute distances
-        distlst=map(
-                haversine,
-                [sat_rlon]*len(model_rlons_new),
-                [sat_rlat]*len(model_rlons_new),
-                model_rlons_new,model_rlats_new
-                )
-        tmp_idx2 = distlst.index(np.min(distlst))
-        idx_valid = tmp_idx[tmp_idx2]
-        if (distlst[tmp_idx2]<=distlim and model_rHs[idx_valid]>=0):####
-            nearest_all_dist_matches=distlst[tmp_idx2]
-            nearest_all_date_matches=sat_time_dt[j]
-            nearest_all_model_Hs_matches=\
-                           model_rHs[idx_valid] ####
-            nearest_all_sat_Hs_matches=sat_rHs[j]
-            nearest_all_sat_lons_matches=sat_rlon
-            nearest_all_sat_lats_matches=sat_rlat
-            nearest_all_model_lons_matches=\
-                            model_rlons[idx_valid]
-            nearest_all_model_lats_matches=\
-                            model_rlats[idx_valid]
-            return nearest_all_date_matches,nearest_all_dist_matches,\
-                nearest_all_model_Hs_matches,nearest_all_sat_Hs_matches,\
-                nearest_all_sat_lons_matches, nearest_all_sat_lats_matches,\
-                nearest_all_model_lons_matches, nearest_all_model_lats_matches
-        else:
-            return
-
 def colocate(model,model_Hs,model_lats,model_lons,model_time_dt,\
     sa_obj,datein,distlim=None):
     """
@@ -296,126 +230,30 @@ def colocate(model,model_Hs,model_lats,model_lons,model_time_dt,\
     if distlim is None:
         distlim = int(6)
     timewin = sa_obj.timewin
-    ctime, cidx = matchtime(datein,datein,sa_obj.rTIME,sa_obj.basetime,timewin=sa_obj.timewin)
-    sat_time_dt=np.array(sa_obj.rtime)[cidx]
+    cidx = matchtime(datein,datein,sa_obj.rTIME,sa_obj.basetime,
+                    timewin=sa_obj.timewin,idxonly=True,issorted=True)
+    sat_time_dt=num2datetime(sa_obj.rTIME[cidx],sa_obj.basetime)
     model_time_idx = model_time_dt.index(datein)
     model_time_dt_valid=[model_time_dt[model_time_idx]]
     print ("date matches found:")
     print model_time_dt_valid
-    # Constrain to region
-    if ((model=='mwam8' or model=='mwam4' or model=='ARCMFC')
-    and (sa_obj.region!='Arctic' and sa_obj.region!='ARCMFC')):
-        model_rlats = model_lats[
-                    (model_lats
-                    >= sa_obj.regions_dict[sa_obj.region]["llcrnrlat"])
-                  & (model_lats
-                    <= sa_obj.regions_dict[sa_obj.region]["urcrnrlat"])
-                  & (model_lons
-                    >= sa_obj.regions_dict[sa_obj.region]["llcrnrlon"])
-                  & (model_lons
-                    <= sa_obj.regions_dict[sa_obj.region]["urcrnrlon"])
-                            ]
-        model_rlons = model_lons[
-                    (model_lats
-                    >= sa_obj.regions_dict[sa_obj.region]["llcrnrlat"])
-                  & (model_lats
-                    <= sa_obj.regions_dict[sa_obj.region]["urcrnrlat"])
-                  & (model_lons
-                    >= sa_obj.regions_dict[sa_obj.region]["llcrnrlon"])
-                  & (model_lons
-                    <= sa_obj.regions_dict[sa_obj.region]["urcrnrlon"])
-                            ]
-        model_rHs=[]
-        for i in range(len(model_Hs)):
-            tmpA = model_Hs[i,:]
-            tmpB = tmpA[
-                    (model_lats
-                    >= sa_obj.regions_dict[sa_obj.region]["llcrnrlat"])
-                  & (model_lats
-                    <= sa_obj.regions_dict[sa_obj.region]["urcrnrlat"])
-                  & (model_lons
-                    >= sa_obj.regions_dict[sa_obj.region]["llcrnrlon"])
-                  & (model_lons
-                    <= sa_obj.regions_dict[sa_obj.region]["urcrnrlon"])
-                            ]
-            model_rHs.append(tmpB)
-            del tmpA, tmpB
-    elif ((model=='mwam8' or model=='mwam4'
-    or model=='ARCMFC' or model=='ARCMFCnew')
-    and (sa_obj.region=='Arctic' or sa_obj.region=='ARCMFC')):
-        model_rlats = model_lats[
-                    (model_lats
-                    >= sa_obj.regions_dict[sa_obj.region]["boundinglat"])
-                            ]
-        model_rlons = model_lons[
-                    (model_lats
-                    >= sa_obj.regions_dict[sa_obj.region]["boundinglat"])
-                            ]
-        model_rHs=[]
-        tmpA = model_Hs[model_time_idx,:]
-        tmpB = tmpA[
-                (model_lats
-                >= sa_obj.regions_dict[sa_obj.region]["boundinglat"])
-                        ]
-        model_rHs = tmpB
-        del tmpA, tmpB
+    # Constrain to region using the cached grid index
+    grid = get_grid_index(model,model_lons,model_lats)
+    ridx = grid.ridx(sa_obj.region)
+    model_rlats = grid.lats[ridx]
+    model_rlons = grid.lons[ridx]
+    # masked and negative Hs (land) are no valid model values
+    model_rHs = np.ma.masked_less(model_Hs[model_time_idx].ravel()[ridx],0)
     # Compare wave heights of satellite with model with 
     # constraint on distance and time frame
-    nearest_all_date_matches=[]
-    nearest_all_dist_matches=[]
-    nearest_all_model_Hs_matches=[]
-    nearest_all_sat_Hs_matches=[]
-    nearest_all_sat_lons_matches=[]
-    nearest_all_sat_lats_matches=[]
-    nearest_all_model_lons_matches=[]
-    nearest_all_model_lats_matches=[]
-    # create local variables before loop
     sat_rlats=sa_obj.rloc[0][cidx]
     sat_rlons=sa_obj.rloc[1][cidx]
-    sat_rHs=np.array(sa_obj.rHs)[cidx]
-    # moving window compensating for increasing latitudes
-    try:
-        moving_win = round(
-                (distlim /
-                 haversine(0,
-                    np.max(sat_rlats),
-                    1,
-                    np.max(sat_rlats))
-                ),
-                2)
-    except (ValueError):
-        moving_win = .6
-    print ("Searching for matches with moving window of degree:",\
-            moving_win)
-    for j in range(len(sat_time_dt)):
-        progress(j,str(int(len(sat_time_dt))),'')
-        try:
-            resultlst = tmploop_get_model(\
-                j,sat_time_dt,model_time_dt_valid,distlim,model,\
-                sat_rlats,sat_rlons,sat_rHs,\
-                model_rlats,model_rlons,model_rHs,moving_win)
-            nearest_all_date_matches.append(resultlst[0])
-            nearest_all_dist_matches.append(resultlst[1])
-            nearest_all_model_Hs_matches.append(resultlst[2])
-            nearest_all_sat_Hs_matches.append(resultlst[3])
-            nearest_all_sat_lons_matches.append(resultlst[4])
-            nearest_all_sat_lats_matches.append(resultlst[5])
-            nearest_all_model_lons_matches.append(resultlst[6])
-            nearest_all_model_lats_matches.append(resultlst[7])
-        except:
-            #print "Unexpected error:", sys.exc_info()[0]
-            pass
-    results_dict = {
-        'valid_date':np.array(model_time_dt_valid),
-        'date_matches':np.array(nearest_all_date_matches),
-        'dist_matches':np.array(nearest_all_dist_matches),
-        'model_Hs_matches':np.array(nearest_all_model_Hs_matches),
-        'sat_Hs_matches':np.array(nearest_all_sat_Hs_matches),
-        'sat_lons_matches':np.array(nearest_all_sat_lons_matches),
-        'sat_lats_matches':np.array(nearest_all_sat_lats_matches),
-        'model_lons_matches':np.array(nearest_all_model_lons_matches),
-        'model_lats_matches':np.array(nearest_all_model_lats_matches)
-        }
+    sat_rHs=np.asarray(sa_obj.rHs)[cidx]
+    # footprints nearest to land points are dropped
+    results_dict = collocate(sat_time_dt,sat_rlats,sat_rlons,sat_rHs,
+                    model_rlats,model_rlons,model_rHs,
+                    model_time_dt_valid,timewin=timewin,distlim=distlim,
+                    tree=grid.tree(sa_obj.region),skipmasked=True)
     return results_dict
 
 def colocate_all():
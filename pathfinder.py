@@ -24,3 +24,7 @@ station_d22_starc = ('/lustre/storeB/immutable/archive/projects/'\
                    + 'metproduction/DNMI_OFFSHORE/')
                    # +rig+'/d22/'+YY+'/'+dy+'.d22'
 station_d22_opdate = ('/vol/gorgon/offshore/')#+rig+'/d22/'+dy+'.d22'
+gridcache_path = ('/lustre/storeA/project/fou/om/waveverification/'
+                + 'gridcache/')
+d22cache_path = ('/lustre/storeA/project/fou/om/waveverification/'
+                + 'd22cache/')
@@ -1,6 +1,9 @@
 ''' 
 dict for regions, currently defined by lat(e/w) lon(s/n) borders.
 llcrnrlon=12.2,llcrnrlat=67.6,urcrnrlon=13.2,urcrnrlat=67.9
+or by a boundinglat for polar regions.
+Arbitrary regions can be defined by a polygon of (lon,lat) vertices:
+"name": {"polygon":[(lon1,lat1),(lon2,lat2),...]}
 Ultimately, a shape file would be preferred.
 '''
 regions_dict = {"Global":           {
@@ -236,78 +236,428 @@ def get_remotefiles(satpath_ftp_014_001,destination,sdate,edate,timewin,
                + '&& ./organize.sh')
     print ('Files downloaded to: \n' + destination)
 
-def tmploop_get_model(
-    j,sat_time_dt,model_time_dt_valid,timewin,distlim,model,
-    sat_rlats,sat_rlons,sat_rHs,
-    model_rlats,model_rlons,model_rHs,
-    moving_win
-    ):
-    from utils import haversine
-    lat_win = 0.1
-    if (sat_time_dt[j]>=model_time_dt_valid[0]
-    -timedelta(minutes=timewin) 
-    and sat_time_dt[j]<=model_time_dt_valid[0]
-    +timedelta(minutes=timewin)):
-        if (model=='mwam8' or model=='mwam4' or model=='ARCMFC' 
-        or model=='ARCMFCnew'):
-            sat_rlat=sat_rlats[j]
-            sat_rlon=sat_rlons[j]
-            # constraints to reduce workload
-            model_rlats_new=model_rlats[
-                        (model_rlats>=sat_rlat-lat_win)
-                        & 
-                        (model_rlats<=sat_rlat+lat_win)
-                        &
-                        (model_rlons>=sat_rlon-moving_win)
-                        &
-                        (model_rlons<=sat_rlon+moving_win)
-                        ]
-            model_rlons_new=model_rlons[
-                        (model_rlats>=sat_rlat-lat_win)
-                        & 
-                        (model_rlats<=sat_rlat+lat_win)
-                        &
-                        (model_rlons>=sat_rlon-moving_win)
-                        &
-                        (model_rlons<=sat_rlon+moving_win)
-                        ]
-            tmp=range(len(model_rlats))
-            tmp_idx=np.array(tmp)[
-                        (model_rlats>=sat_rlat-lat_win)
-                        & 
-                        (model_rlats<=sat_rlat+lat_win)
-                        &
-                        (model_rlons>=sat_rlon-moving_win)
-                        &
-                        (model_rlons<=sat_rlon+moving_win)
-                        ]
-            # compute distances
-            distlst=map(
-                    haversine,
-                    [sat_rlon]*len(model_rlons_new),
-                    [sat_rlat]*len(model_rlons_new),
-                    model_rlons_new,model_rlats_new
+def archive_slice(f,frame):
+    '''
+    slice of the footprints of the days overlapping frame (start, end
+    in seconds since 2000-01-01) from the coverage table of a monthly
+    file (see altimeter_archive), None if the file has no valid table
+    '''
+    if ('day_count' not in f.variables
+    or getattr(f,'rtime_sorted',0) != 1):
+        return None
+    day = f.variables['day'][:]
+    count = f.variables['day_count'][:]
+    start = f.variables['day_start'][:]
+    sel = (day < frame[1]) & (day + 86400. > frame[0]) & (count > 0)
+    if not np.any(sel):
+        return slice(0,0)
+    return slice(int(np.min(start[sel])),int(np.max(start[sel]+count[sel])))
+
+def tmploop_read_localfiles(element,mode,frame=None):
+    '''
+    read one altimeter file, returns arrays of time, lats, lons, Hs
+    with missing values as np.nan or None if the file is not readable
+    frame -> (start, end) in seconds since 2000-01-01, only the days
+             overlapping frame are read from monthly files with
+             coverage table (mode ARCMFC)
+    '''
+    if mode=='ARCMFC':
+        varnames = ['rtime','rlats','rlons','rHs']
+    else:
+        varnames = ['time','latitude','longitude','VAVH']
+    try:
+        # file includes a 1-D dataset with dimension time
+        f = netCDF4.Dataset(element,'r')
+        sl = None
+        if (mode=='ARCMFC' and frame is not None):
+            sl = archive_slice(f,frame)
+        if sl is None:
+            sl = slice(None)
+        time, lats, lons, VAVH = [
+                np.ma.filled(
+                    np.ma.array(f.variables[var][sl],dtype='float64'),
+                    np.nan).ravel()
+                for var in varnames]
+        f.close()
+    except (IOError):
+        print ("No such file or directory: " + element)
+        return
+    if mode!='ARCMFC':
+        # transform
+        lons = ((lons - 180) % 360) - 180
+    return time, lats, lons, VAVH
+
+def get_localfilelst(sdate,edate,timewin,mode,region,satpath_lustre):
+    '''
+    sorted list of local altimeter files for the time frame,
+    each month directory is listed only once
+    '''
+    if mode == 'ARCMFC':
+        tmpdatestr=(satpath_lustre + '/monthly/')
+        tmplst = np.sort(os.listdir(tmpdatestr))
+        pathlst = []
+        filelst = []
+        tmpdate = deepcopy(sdate)
+        while (tmpdate <= edate + timedelta(minutes=timewin)):
+            for element in tmplst:
+                if (element.find(tmpdate.strftime("%Y%m"))>0 and \
+                element.find(region))>0:
+                    pathlst.append(tmpdatestr + element)
+                    filelst.append(element)
+            tmpdate = tmpdate + relativedelta(months=+1)
+    else:
+        print ("Time window: ", timewin)
+        tmpdate=deepcopy(sdate-timedelta(minutes=timewin))
+        pathlst = []
+        filelst = []
+        listed = []
+        while (tmpdate <= edate + timedelta(minutes=timewin)):
+            tmpdatestr=(satpath_lustre
+                        + str(tmpdate.year)
+                        + '/' + tmpdate.strftime('%m')
+                        + '/')
+            if tmpdatestr not in listed:
+                tmplst = np.sort(os.listdir(tmpdatestr))
+                filelst.append(tmplst)
+                for element in tmplst:
+                    pathlst.append(tmpdatestr + element)
+                listed.append(tmpdatestr)
+            if (edate is not None and edate!=sdate):
+                tmpdate = tmpdate + timedelta(hours=1)
+            else:
+                tmpdate = tmpdate + relativedelta(months=+1)
+        filelst=np.sort(flatten(filelst))
+        pathlst=np.sort(pathlst)
+        idx_start,tmp = check_date(pathlst,sdate-timedelta(minutes=timewin))
+        tmp,idx_end = check_date(pathlst,edate+timedelta(minutes=timewin))
+        del tmp
+        pathlst = np.unique(pathlst[idx_start:idx_end+1])
+        filelst = np.unique(filelst[idx_start:idx_end+1])
+        print (str(int(len(pathlst))) + " valid files found")
+    return pathlst,filelst
+
+def select_localfiles(pathlst,sdate,edate,mode=None):
+    '''
+    files of pathlst that may contain footprints in [sdate,edate),
+    i.e. with a time stamp of a day (month for mode ARCMFC) of the
+    time frame in their name
+    '''
+    if mode == 'ARCMFC':
+        fmt = "%Y%m"
+    else:
+        fmt = "%Y%m%d"
+    last = (edate-timedelta(microseconds=1)).strftime(fmt)
+    stamps = []
+    tmpdate = deepcopy(sdate)
+    while tmpdate.strftime(fmt) <= last:
+        stamps.append(tmpdate.strftime(fmt))
+        tmpdate = tmpdate + timedelta(days=1)
+    return [element for element in pathlst
+            if any(os.path.basename(element).find(s)>0 for s in stamps)]
+
+def read_localtimes(pathlst,mode):
+    '''
+    sorted unique footprint times of all files without reading
+    the other variables e.g. to find time frames with new data
+    '''
+    if mode=='ARCMFC':
+        varname = 'rtime'
+    else:
+        varname = 'time'
+    times = [np.array([])]
+    for element in pathlst:
+        try:
+            f = netCDF4.Dataset(element,'r')
+            times.append(np.ma.filled(
+                    np.ma.array(f.variables[varname][:],dtype='float64'),
+                    np.nan).ravel())
+            f.close()
+        except (IOError):
+            print ("No such file or directory: " + element)
+    times = np.unique(np.concatenate(times))
+    return times[~np.isnan(times)]
+
+def read_localfiles(pathlst,mode,corenum=None,cache=None,frame=None):
+    '''
+    read and concatenate all data to one timeseries for each variable
+    files are read in parallel using corenum processes
+    cache -> dict of already read files, files not yet in cache
+             are read and added
+    frame -> (start, end) in seconds since 2000-01-01, monthly files
+             are read only for days overlapping frame
+    '''
+    from utils import runmean
+    if corenum is None:
+        corenum = 1
+    if cache is None:
+        cache = {}
+    # --- open files and read variables --- #
+    print ("Processing " + str(int(len(pathlst))) + " files")
+    print (pathlst[0])
+    print (pathlst[-1])
+    print ("Used number of cores " + str(corenum) + "!")
+    missing = [element for element in pathlst if element not in cache]
+    results = Parallel(n_jobs=corenum)(
+                    delayed(tmploop_read_localfiles)(element,mode,frame)
+                    for element in missing
                     )
-            tmp_idx2 = distlst.index(np.min(distlst))
-            idx_valid = tmp_idx[tmp_idx2]
-            if distlst[tmp_idx2]<=distlim:
-                nearest_all_dist_matches=distlst[tmp_idx2]
-                nearest_all_date_matches=sat_time_dt[j]
-                nearest_all_model_Hs_matches=\
-                               model_rHs[0][idx_valid]
-                nearest_all_sat_Hs_matches=sat_rHs[j]
-                nearest_all_sat_lons_matches=sat_rlon
-                nearest_all_sat_lats_matches=sat_rlat
-                nearest_all_model_lons_matches=\
-                                model_rlons[idx_valid]
-                nearest_all_model_lats_matches=\
-                                model_rlats[idx_valid]
-                return nearest_all_date_matches,nearest_all_dist_matches,\
-                    nearest_all_model_Hs_matches,nearest_all_sat_Hs_matches,\
-                    nearest_all_sat_lons_matches, nearest_all_sat_lats_matches,\
-                    nearest_all_model_lons_matches, nearest_all_model_lats_matches
+    cache.update(zip(missing,results))
+    results = [cache[element] for element in pathlst
+               if cache[element] is not None]
+    # concatenate to contiguous arrays
+    fTIME,fLATS,fLONS,fVAVHS = [
+            np.concatenate([r[i] for r in results] + [np.array([])])
+            for i in range(4)]
+    fMAXS = [np.nanmax(r[3]) if len(r[3])>0 else np.nan
+             for r in results]
+    del results
+    # remove duplicates and sort once for all files
+    fTIME,indices=np.unique(fTIME,return_index=True)
+    fLATS=fLATS[indices]
+    fLONS=fLONS[indices]
+    fVAVHS=fVAVHS[indices]
+    # smooth Hs time series
+    fVAVHS_smooth,fVAVHS_std = runmean(fVAVHS,5,'centered')
+    return fLATS, fLONS, fTIME, fVAVHS, fMAXS, fVAVHS_smooth
+
+def stream_sentinel(sdate,edate,timewin=None,region=None,mode=None,
+    chunk=None,corenum=None,download=None):
+    '''
+    generator yielding sentinel_altimeter objects for consecutive
+    chunks of the time frame [sdate-timewin,edate+timewin) such that
+    long periods can be processed with bounded memory. Only the files
+    needed for the current chunk and their neighbours are kept in
+    memory. rHs_smooth equals the one of a single read unless a
+    neighbouring file has less footprints than half the smoothing
+    window.
+    chunk -> timedelta, chunks are time windows aligned to multiples
+             of chunk since 2000-01-01 (default: one day)
+          -> int, chunks of at most chunk footprints within a day
+    Chunks without footprints in region are skipped.
+    '''
+    if timewin is None:
+        timewin = 0
+    if region is None:
+        region = 'Global'
+    if chunk is None:
+        chunk = timedelta(days=1)
+    if isinstance(chunk,timedelta):
+        step = chunk.total_seconds()
+        maxlen = None
+    else:
+        step = timedelta(days=1).total_seconds()
+        maxlen = int(chunk)
+    basetime = datetime(2000,1,1)
+    get_remotefiles(sentinel_altimeter.satpath_ftp_014_001,
+                    sentinel_altimeter.satpath_lustre,
+                    sdate,edate,timewin,corenum,download)
+    pathlst, filelst = get_localfilelst(sdate,edate,timewin,mode,region,
+                                    sentinel_altimeter.satpath_lustre)
+    cache = {}
+    tmpstart = sdate-timedelta(minutes=timewin)
+    end = edate+timedelta(minutes=timewin)
+    while tmpstart < end:
+        tmpend = basetime + timedelta(seconds=
+                (math.floor((tmpstart-basetime).total_seconds()/step)+1)
+                * step)
+        tmpend = min(tmpend,end)
+        chunklst = select_localfiles(pathlst,tmpstart,tmpend,mode)
+        # neighbouring files are read as well such that the running
+        # mean of Hs at the chunk edges uses the same footprints as
+        # one read of the whole time frame
+        idx = [i for i, element in enumerate(pathlst)
+               if element in chunklst]
+        if len(idx)>0:
+            chunklst = list(pathlst[max(idx[0]-1,0):idx[-1]+2])
+        # keep only files of the current chunk in memory
+        for element in list(cache.keys()):
+            if element not in chunklst:
+                del cache[element]
+        if len(chunklst)>0:
+            cols = read_localfiles(chunklst,mode,corenum=corenum,
+                                   cache=cache)
+            files = [element for element in chunklst
+                     if cache[element] is not None]
+            sa_obj = sentinel_altimeter(tmpstart,edate=tmpend,timewin=0,
+                                        region=region,mode=mode,cols=cols,
+                                        files=files)
+            del cols
+            n = len(sa_obj.rTIME)
+            if (n>0 and (maxlen is None or n<=maxlen)):
+                yield sa_obj
+            elif n>0:
+                for i in range(0,n,maxlen):
+                    # per-file maxima are those of the whole chunk
+                    cols = [x[i:i+maxlen] for x in
+                            [sa_obj.rloc[0],sa_obj.rloc[1],
+                             sa_obj.rTIME,sa_obj.rHs,sa_obj.rHs_smooth]]
+                    cols.insert(4,sa_obj.gHsMax)
+                    piece = sentinel_altimeter(tmpstart,edate=tmpend,
+                                timewin=0,region=region,mode=mode,
+                                cols=cols,files=sa_obj.gfiles)
+                    # time frame of the piece is [first footprint,
+                    # first footprint of the next piece)
+                    if i>0:
+                        piece.sdate = basetime + timedelta(microseconds=
+                                        math.floor(sa_obj.rTIME[i]*1e6))
+                    if i+maxlen<n:
+                        piece.edate = basetime + timedelta(microseconds=
+                                math.floor(sa_obj.rTIME[i+maxlen]*1e6))
+                    yield piece
+            del sa_obj
+        tmpstart = tmpend
+
+def merge_sentinel(chunks):
+    '''
+    one sentinel_altimeter object for a list of consecutive chunks,
+    per-file maxima of files shared by chunks are kept once
+    '''
+    files, HsMax = [], []
+    for c in chunks:
+        gfiles = c.gfiles
+        if gfiles is None:
+            gfiles = [None]*len(c.gHsMax)
+        for element, value in zip(gfiles,c.gHsMax):
+            if (element is None or element not in files):
+                files.append(element)
+                HsMax.append(value)
+    cols = [np.concatenate([c.rloc[0] for c in chunks]),
+            np.concatenate([c.rloc[1] for c in chunks]),
+            np.concatenate([c.rTIME for c in chunks]),
+            np.concatenate([c.rHs for c in chunks]),
+            np.array(HsMax),
+            np.concatenate([c.rHs_smooth for c in chunks])]
+    if any(c.gfiles is None for c in chunks):
+        files = None
+    return sentinel_altimeter(chunks[0].sdate,edate=chunks[-1].edate,
+                timewin=0,region=chunks[-1].region,cols=cols,files=files)
+
+def collocation_windows(chunks,fc_dates,timewin=None):
+    '''
+    consumes a stream of sentinel_altimeter chunks for the collocation
+    and yields (fc_date, sa_obj) as soon as all footprints within
+    timewin of fc_date are streamed. sa_obj is the chunk itself if it
+    covers the time window, else the merge of the required chunks.
+    fc_dates -> sorted list of datetime objects
+    '''
+    if timewin is None:
+        timewin = int(30)
+    win = timedelta(minutes=timewin)
+    fc_dates = list(fc_dates)
+    kept = []
+    for sa_obj in chunks:
+        # drop chunks not needed for any remaining fc_date
+        if len(fc_dates)>0:
+            kept = [c for c in kept if c.edate > fc_dates[0]-win]
+        else:
+            kept = []
+        kept.append(sa_obj)
+        merged = None
+        while (len(fc_dates)>0 and fc_dates[0]+win < sa_obj.edate):
+            fc_date = fc_dates.pop(0)
+            if fc_date-win >= sa_obj.sdate:
+                yield fc_date, sa_obj
             else:
-                return
+                if merged is None:
+                    merged = merge_sentinel(kept)
+                yield fc_date, merged
+    # fc_dates at the end of the stream
+    if (len(fc_dates)>0 and len(kept)>0):
+        merged = merge_sentinel(kept)
+        for fc_date in fc_dates:
+            yield fc_date, merged
+
+def bintime_stream(chunks):
+    '''
+    daily frequency of occurrence of footprints for a stream of
+    sentinel_altimeter chunks, returns freqlst and datelst with one
+    entry per day from the first to the last day with footprints
+    '''
+    basetime = datetime(2000,1,1)
+    days = np.array([],dtype='int64')
+    freq = np.array([],dtype='int64')
+    for sa_obj in chunks:
+        tmpdays, tmpfreq = np.unique(
+            np.floor(sa_obj.rTIME[~np.isnan(sa_obj.rHs)]/86400.
+                    ).astype('int64'),
+            return_counts=True)
+        days, idx = np.unique(np.concatenate([days,tmpdays]),
+                              return_inverse=True)
+        freq = np.bincount(idx,
+                    weights=np.concatenate([freq,tmpfreq])
+                    ).astype('int64')
+    if len(days)==0:
+        return [], []
+    freqlst = np.zeros(days[-1]-days[0]+1,dtype='int64')
+    freqlst[days-days[0]] = freq
+    datelst = [basetime + timedelta(days=int(d))
+               for d in range(days[0],days[-1]+1)]
+    return list(freqlst), datelst
+
+def collocate(sat_time_dt,sat_rlats,sat_rlons,sat_rHs,
+    model_rlats,model_rlons,model_rHs,model_time_dt_valid,
+    timewin=None,distlim=None,tree=None,skipmasked=None):
+    """
+    Collocate all satellite footprints with the nearest model grid 
+    point using one batched query on a spherical KD-tree.
+    model_rlats, model_rlons, model_rHs are the (region constrained)
+    model grid and Hs for the valid time step. A prebuilt tree for 
+    the model grid can be given to avoid rebuilding it.
+    Footprints whose nearest grid point is masked are matched with
+    nan as model Hs, as in the original per-footprint loop.
+    skipmasked=True drops these footprints instead, which changes
+    nov and mor of validate.
+    Returns the results_dict as known from get_model.
+    """
+    from utils import spherical_tree, query_tree
+    if timewin is None:
+        timewin = int(30)
+    if distlim is None:
+        distlim = int(6)
+    sat_time_dt = np.array(sat_time_dt)
+    sat_rlats = np.array(sat_rlats).ravel()
+    sat_rlons = np.array(sat_rlons).ravel()
+    sat_rHs = np.array(sat_rHs).ravel()
+    model_rlats = np.ma.getdata(model_rlats).ravel()
+    model_rlons = np.ma.getdata(model_rlons).ravel()
+    model_rHs = np.ma.filled(
+                    np.ma.array(model_rHs,dtype='float64').ravel(),
+                    np.nan)
+    # time constraint
+    if len(sat_time_dt)>0:
+        tidx = np.flatnonzero(
+                (sat_time_dt 
+                    >= model_time_dt_valid[0]-timedelta(minutes=timewin))
+              & (sat_time_dt 
+                    <= model_time_dt_valid[0]+timedelta(minutes=timewin))
+                )
+    else:
+        tidx = np.array([],dtype='int')
+    # spatial constraint
+    if tree is None:
+        tree = spherical_tree(model_rlons,model_rlats)
+    dists, idx = query_tree(tree,sat_rlons[tidx],sat_rlats[tidx],
+                            distlim=distlim)
+    # footprints at masked grid points are kept with nan model Hs
+    found = np.isfinite(dists)
+    if skipmasked == True:
+        found[found] = ~np.isnan(model_rHs[idx[found]])
+    sidx = tidx[found]
+    midx = idx[found]
+    print ("Found " + str(len(sidx)) + " matches for " 
+            + str(len(tidx)) + " footprints")
+    results_dict = {
+        'valid_date':np.array(model_time_dt_valid),
+        'date_matches':sat_time_dt[sidx],
+        'dist_matches':dists[found],
+        'model_Hs_matches':model_rHs[midx],
+        'sat_Hs_matches':sat_rHs[sidx],
+        'sat_lons_matches':sat_rlons[sidx],
+        'sat_lats_matches':sat_rlats[sidx],
+        'model_lons_matches':model_rlons[midx],
+        'model_lats_matches':model_rlats[midx]
+        }
+    return results_dict
 
 # flatten all lists before returning them
 # define flatten function for lists
@@ -423,10 +773,18 @@ class sentinel_altimeter():
     satpath_ftp_008_052 = pathfinder.satpath_ftp_008_052
     # from 20180320, now valid from start!
     satpath_ftp_014_001 = pathfinder.satpath_ftp_014_001 
+    # gap in seconds between footprints of different passes
+    pass_deltalim = 10
     from region_specs import regions_dict
 
     def __init__(self,sdate,edate=None,timewin=None,download=None,region=None,
-                corenum=None,mode=None):
+                corenum=None,mode=None,cols=None,files=None):
+        '''
+        cols -> output of read_localfiles, skips download and reading
+                e.g. for chunks of stream_sentinel
+        files -> paths of the files of cols, one for each value of
+                 the per-file maxima gHsMax
+        '''
         print ('# ----- ')
         print (" ### Initializing sentinel_altimeter instance ###")
         print ('# ----- ')
@@ -442,154 +800,149 @@ class sentinel_altimeter():
         else:
             print ("Requested time frame: " + 
                 str(sdate) + " - " + str(edate))
-        get_remotefiles(self.satpath_ftp_014_001,self.satpath_lustre,
-                        sdate,edate,timewin,corenum,download)
-        pathlst, filelst = self.get_localfilelst(sdate,edate,timewin,mode,region)
-        fLATS,fLONS,fTIME,fVAVHS,fMAXS,fVAVHS_smooth = \
-                                        self.read_localfiles(pathlst,mode)
-        idx = np.array(range(len(fVAVHS)))[~np.isnan(fVAVHS)]
-        fLATS = list(np.array(fLATS)[idx])
-        fLONS = list(np.array(fLONS)[idx])
-        fTIME = list(np.array(fTIME)[idx])
-        fVAVHS = list(np.array(fVAVHS)[idx])
-        fVAVHS_smooth = list(np.array(fVAVHS_smooth)[idx])
-        gloc = [fLATS,fLONS]
-        gHs = fVAVHS
-        gHs_smooth = fVAVHS_smooth
-        ctime,cidx,timelst = self.matchtime(sdate,edate,fTIME,timewin)
-        cloc = [np.array(fLATS)[cidx],np.array(fLONS)[cidx]]
-        cHs = list(np.array(gHs)[cidx])
-        cHs_smooth = list(np.array(gHs_smooth)[cidx])
-        cTIME = list(np.array(fTIME)[cidx])
+        if cols is None:
+            get_remotefiles(self.satpath_ftp_014_001,self.satpath_lustre,
+                            sdate,edate,timewin,corenum,download)
+            pathlst, filelst = self.get_localfilelst(sdate,edate,timewin,
+                                                     mode,region)
+            # days of monthly files around the time frame, one day of
+            # margin keeps the smoothing of the time frame unchanged
+            frame = ((sdate-timedelta(minutes=timewin,days=1)
+                      -datetime(2000,1,1)).total_seconds(),
+                     (edate+timedelta(minutes=timewin,days=1)
+                      -datetime(2000,1,1)).total_seconds())
+            cache = {}
+            cols = self.read_localfiles(pathlst,mode,corenum=corenum,
+                                        frame=frame,cache=cache)
+            files = [element for element in pathlst
+                     if cache[element] is not None]
+            del cache
+        fLATS,fLONS,fTIME,fVAVHS,fMAXS,fVAVHS_smooth = cols
+        del cols
+        # columnar footprint store, invalid values are removed once
+        valid = ~np.isnan(fVAVHS)
+        if not np.all(valid):
+            fLATS,fLONS,fTIME,fVAVHS,fVAVHS_smooth = [
+                    x[valid] for x in
+                    [fLATS,fLONS,fTIME,fVAVHS,fVAVHS_smooth]]
+        self.basetime = datetime(2000,1,1)
+        self._cols = {'lats':fLATS,'lons':fLONS,'time':fTIME,
+                      'Hs':fVAVHS,'Hs_smooth':fVAVHS_smooth}
+        del fLATS,fLONS,fTIME,fVAVHS,fVAVHS_smooth
+        # time steps are sorted, time selection is a contiguous slice
+        cidx = self.matchtime(sdate,edate,self.fTIME,timewin,idxonly=True)
+        if len(cidx)>0:
+            self._csl = slice(cidx[0],cidx[-1]+1)
+        else:
+            self._csl = slice(0,0)
         latlst,lonlst,rlatlst,rlonlst,ridx = \
-                self.matchregion(cloc[0],cloc[1],region=region)
-        rloc = [cloc[0][ridx],cloc[1][ridx]]
-        rHs = list(np.array(cHs)[ridx])
-        rHs_smooth = list(np.array(cHs_smooth)[ridx])
-        rtime = list(np.array(ctime)[ridx])
-        rTIME = list(np.array(cTIME)[ridx])
+                self.matchregion(self.cloc[0],self.cloc[1],region=region)
+        ridx = np.array(ridx,dtype='int')
+        # region selection as slice if contiguous to allow views
+        if (len(ridx)>0 and ridx[-1]-ridx[0]==len(ridx)-1):
+            self._rsel = slice(self._csl.start+ridx[0],
+                               self._csl.start+ridx[-1]+1)
+        else:
+            self._rsel = self._csl.start + ridx
+        self._rcols = {}
+        self._passes = {}
         self.edate = edate
         self.sdate = sdate
-        self.basetime = datetime(2000,1,1)
-        self.rloc = rloc # regional coords [lats,lons]
-        self.cloc = cloc # close time coords [lats,lons]
-        self.gloc = gloc # global coords [lats,lons]
-        self.fTIME = fTIME # custom time steps in seconds
-        self.cTIME = cTIME # custom time steps in seconds
-        self.ctime = ctime # custom time steps as datetime obj
         self.cidx = cidx # adjacent indices
-        self.gHs = gHs
-        self.cHs = cHs
-        self.rHs = rHs
-        self.rHs_smooth = rHs_smooth
         self.ridx = ridx # region indices
-        self.rtime = rtime # region time steps as datetime obj
-        self.rTIME = rTIME # region time steps in seconds
         self.timewin = timewin
         self.gHsMax = np.array(fMAXS)
+        self.gfiles = files
         self.region = region
         print ("Sentinel object initialized including " 
                 + str(len(self.rHs)) + " footprints.")
 
-    def get_localfilelst(self,sdate,edate,timewin,mode,region):
-        if mode == 'ARCMFC':
-            tmpdatestr=(self.satpath_lustre + '/monthly/')
-            tmplst = np.sort(os.listdir(tmpdatestr))
-            pathlst = []
-            filelst = []
-            tmpdate = deepcopy(sdate)
-            while (tmpdate <= edate + timedelta(minutes=timewin)):
-                for element in tmplst:
-                    if (element.find(tmpdate.strftime("%Y%m"))>0 and \
-                    element.find(region))>0:
-                        pathlst.append(tmpdatestr + element)
-                        filelst.append(element)
-                tmpdate = tmpdate + relativedelta(months=+1)
-        else:
-            print ("Time window: ", timewin)
-            tmpdate=deepcopy(sdate-timedelta(minutes=timewin))
-            pathlst = []
-            filelst = []
-            while (tmpdate <= edate + timedelta(minutes=timewin)):
-                tmpdatestr=(self.satpath_lustre
-                            + str(tmpdate.year)
-                            + '/' + tmpdate.strftime('%m')
-                            + '/')
-                tmplst = np.sort(os.listdir(tmpdatestr))
-                filelst.append(tmplst)
-                for element in tmplst:
-                    pathlst.append(tmpdatestr + element)
-                if (edate is not None and edate!=sdate):
-                    tmpdate = tmpdate + timedelta(hours=1)
-                else:
-                    tmpdate = tmpdate + relativedelta(months=+1)
-            filelst=np.sort(flatten(filelst))
-            pathlst=np.sort(pathlst)
-            idx_start,tmp = check_date(pathlst,sdate-timedelta(minutes=timewin))
-            tmp,idx_end = check_date(pathlst,edate+timedelta(minutes=timewin))
-            del tmp
-            pathlst = np.unique(pathlst[idx_start:idx_end+1])
-            filelst = np.unique(filelst[idx_start:idx_end+1])
-            print (str(int(len(pathlst))) + " valid files found")
-        return pathlst,filelst
-
-    def read_localfiles(self,pathlst,mode):
+    def _rcol(self,name):
         '''
-        read and concatenate all data to one timeseries for each variable
+        column for region and time frame, computed on first access
         '''
-        from utils import runmean
-        # --- open file and read variables --- #
-        LATS = []
-        LONS = []
-        VAVHS = []
-        TIME = []
-        MAXS = []
-        count = 0
-        print ("Processing " + str(int(len(pathlst))) + " files")
-        print (pathlst[0])
-        print (pathlst[-1])
-        for element in pathlst:
-            progress(count,str(int(len(pathlst))),'')
-            try:
-                # file includes a 1-D dataset with dimension time
-                f = netCDF4.Dataset(element,'r')
-                if mode=='ARCMFC':
-                    TIME.append(f.variables['rtime'][:])
-                    LATS.append(f.variables['rlats'][:])
-                    LONS.append(f.variables['rlons'][:])
-                    VAVH=f.variables['rHs'][:]
-                    VAVHS.append(f.variables['rHs'][:])
-                    MAXS.append(np.max(VAVH.astype('float')))
-                    f.close()
-                else:
-                    tmp = f.variables['longitude'][:]
-                    # transform
-                    lons = ((tmp - 180) % 360) - 180
-                    lats = f.variables['latitude'][:]
-                    time = f.variables['time'][:]
-                    VAVH = f.variables['VAVH'][:]
-                    f.close()
-                    LATS.append(lats)
-                    LONS.append(lons)
-                    TIME.append(time)
-                    VAVHS.append(VAVH)
-                    MAXS.append(np.max(VAVH.astype('float')))
-            except (IOError):
-                print ("No such file or directory")
-            count = count + 1
-        print ('\n')
-        # apply flatten to all lists
-        fTIME,fLATS,fLONS,fVAVHS,fMAXS=\
-            flatten(TIME),flatten(LATS),flatten(LONS),\
-            flatten(VAVHS),MAXS
-        fTIME_unique,indices=np.unique(fTIME,return_index=True)
-        fLATS=list(np.array(fLATS)[indices])
-        fLONS=list(np.array(fLONS)[indices])
-        fTIME=list(np.array(fTIME)[indices])
-        fVAVHS=list(np.array(fVAVHS)[indices])
-        # smooth Hs time series
-        fVAVHS_smooth,fVAVHS_std = runmean(fVAVHS,5,'centered')
-        return fLATS, fLONS, fTIME, fVAVHS, fMAXS, fVAVHS_smooth
+        if name not in self._rcols:
+            self._rcols[name] = self._cols[name][self._rsel]
+        return self._rcols[name]
+
+    def materialize(self):
+        '''
+        compute all region columns at once, e.g. before forking
+        worker processes such that they share the same arrays
+        instead of each computing its own copy
+        '''
+        for name in self._cols:
+            self._rcol(name)
+        return self
+
+    # global values
+    @property
+    def fTIME(self):
+        return self._cols['time'] # custom time steps in seconds
+    @property
+    def gloc(self):
+        return [self._cols['lats'],self._cols['lons']] # [lats,lons]
+    @property
+    def gHs(self):
+        return self._cols['Hs']
+    # values close in time
+    @property
+    def cloc(self):
+        return [self._cols['lats'][self._csl],
+                self._cols['lons'][self._csl]] # [lats,lons]
+    @property
+    def cTIME(self):
+        return self._cols['time'][self._csl] # custom time steps in seconds
+    @property
+    def ctime(self):
+        from utils import lazy_datetimes
+        return lazy_datetimes(self.cTIME,self.basetime) # as datetime obj
+    @property
+    def cHs(self):
+        return self._cols['Hs'][self._csl]
+    # values close in time and within region
+    @property
+    def rloc(self):
+        return [self._rcol('lats'),self._rcol('lons')] # [lats,lons]
+    @property
+    def rTIME(self):
+        return self._rcol('time') # custom time steps in seconds
+    @property
+    def rtime(self):
+        from utils import lazy_datetimes
+        return lazy_datetimes(self.rTIME,self.basetime) # as datetime obj
+    @property
+    def rHs(self):
+        return self._rcol('Hs')
+    @property
+    def rHs_smooth(self):
+        return self._rcol('Hs_smooth')
+
+    def passes(self,deltalim=None):
+        '''
+        start, stop indices of contiguous passes in the region time
+        series rTIME, passes are separated by gaps of more than
+        deltalim seconds (default pass_deltalim). The index is
+        computed once e.g. to loop over passes with
+        for start, stop in zip(*sa_obj.passes()):
+            sa_obj.rHs[start:stop]
+        '''
+        from utils import block_bounds
+        if deltalim is None:
+            deltalim = self.pass_deltalim
+        if deltalim not in self._passes:
+            self._passes[deltalim] = block_bounds(self.rTIME,
+                                                  deltalim=deltalim)
+        return self._passes[deltalim]
+
+    def get_localfilelst(self,sdate,edate,timewin,mode,region):
+        return get_localfilelst(sdate,edate,timewin,mode,region,
+                                self.satpath_lustre)
+
+    def read_localfiles(self,pathlst,mode,corenum=None,frame=None,
+        cache=None):
+        return read_localfiles(pathlst,mode,corenum=corenum,cache=cache,
+                               frame=frame)
 
     def quim(self,region=None):
         # ignore irrelevant warnings from matplotlib for stdout
@@ -721,12 +1074,13 @@ class sentinel_altimeter():
         timewin = 0
         for i in range(trange):
             lodt=sdate+timedelta(days=dincr)
-            ctime,cidx,timelst = self.matchtime(
+            cidx = self.matchtime(
                                     datetime(lodt.year,lodt.month,lodt.day),
                                     datetime(lodt.year,lodt.month,lodt.day)
                                     +timedelta(days=1),
                                     listofdatetimes_sec,
-                                    timewin = timewin)
+                                    timewin = timewin,
+                                    idxonly = True)
             count=len(np.array(self.rHs)[
                                 cidx][
                                 ~np.isnan(np.array(self.rHs)[cidx])
@@ -809,114 +1163,77 @@ class sentinel_altimeter():
         To come in future!
         '''
 
-    def matchtime(self,sdate,edate,fTIME,timewin=None):
+    def matchtime(self,sdate,edate,fTIME,timewin=None,idxonly=None):
         '''
         fct to obtain the index of the time step closest to the 
         requested time step from buoy and forecast including the 
         respective time stamp(s). Similarily, indices are chosen
         for the time and defined region.
+        fTIME is sorted, indices are found by binary search and only
+        matches are converted to datetime. timelst converts lazily.
+        idxonly=True returns only the indices.
         '''
+        from utils import timewin_idx, num2datetime, lazy_datetimes
         if timewin is None:
             timewin = 0
         basetime=datetime(2000,1,1)
-        # create list of datetime instances
-        timelst=[]
-        ctime=[]
-        cidx=[]
-        idx=0
         print ('Time window is: ', timewin)
         if (edate is None or sdate==edate):
-            for element in fTIME:
-                tmp=basetime + timedelta(seconds=element)
-                timelst.append(tmp)
-                # choose closest match within window of win[minutes]
-                if (tmp >= sdate-timedelta(minutes=timewin) 
-                and tmp < sdate+timedelta(minutes=timewin)):
-                    ctime.append(tmp)
-                    cidx.append(idx)
-                del tmp
-                idx=idx+1
-        if (edate is not None and edate!=sdate):
-            for element in fTIME:
-                tmp=basetime + timedelta(seconds=element)
-                timelst.append(tmp)
-                if (tmp >= sdate-timedelta(minutes=timewin)
-                and tmp < edate+timedelta(minutes=timewin)):
-                    ctime.append(tmp)
-                    cidx.append(idx)
-                del tmp
-                idx=idx+1
-        return ctime, cidx, timelst
+            edate = sdate
+        # choose closest match within window of win[minutes]
+        cidx = timewin_idx(fTIME,sdate-timedelta(minutes=timewin),
+                            edate+timedelta(minutes=timewin),basetime,
+                            issorted=True)
+        if idxonly == True:
+            return cidx
+        ctime = num2datetime(np.asarray(fTIME)[cidx],basetime)
+        timelst = lazy_datetimes(fTIME,basetime)
+        return ctime, list(cidx), timelst
 
     def matchregion(self,LATS,LONS,region=None):
-        if ~isinstance(region,basestring)==True:
-            print ("Manuall specified region " 
-                + [llcrnrlat,urcrnrlat,llcrnrlon,urcrnrlon] + ": \n" 
+        '''
+        indices of coordinates within region evaluated as one mask,
+        see gridmod.region_mask for possible region definitions
+        '''
+        from gridmod import region_mask
+        if region is None:
+            region = "Global"
+        if isinstance(region,basestring)==False:
+            print ("Manuall specified region: \n"
                 + " --> Bounds: " + str(region))
         else:
             print ("Specified region: " + region + "\n" 
               + " --> Bounds: " + str(self.regions_dict[region]))   
-        if region is None:
-            region = "Global"
-            latlst = LATS
-            lonlst = LONS
-            rlatlst= LATS
-            rlonlst= LONS
-            ridx = range(len(LATS))
-        else:
-            if isinstance(region,basestring)==True:
-                if (region=='ARCMFC' or region=='Arctic'):
-                    boundinglat = self.regions_dict[region]["boundinglat"]
-                else:
-                    llcrnrlat = self.regions_dict[region]["llcrnrlat"]
-                    urcrnrlat = self.regions_dict[region]["urcrnrlat"]
-                    llcrnrlon = self.regions_dict[region]["llcrnrlon"]
-                    urcrnrlon = self.regions_dict[region]["urcrnrlon"]
-            else:
-                llcrnrlat = region[0]     
-                urcrnrlat = region[1]
-                llcrnrlon = region[2]
-                urcrnrlon = region[3]
-            # check if coords in region
-            latlst=[]
-            lonlst=[]
-            rlatlst=[]
-            rlonlst=[]
-            ridx=[]
-            for i in range(len(LATS)):
-                latlst.append(LATS[i])
-                lonlst.append(LONS[i])
-                if (
-                (region=='ARCMFC' or region=='Arctic')
-                and LATS[i] >= boundinglat
-                    ):
-                    rlatlst.append(LATS[i])
-                    rlonlst.append(LONS[i])
-                    ridx.append(i)
-                elif(
-                region != 'ARCMFC' and region != 'Arctic'
-                and LATS[i] >= llcrnrlat
-                and LATS[i] <= urcrnrlat
-                and LONS[i] >= llcrnrlon
-                and LONS[i] <= urcrnrlon
-                    ):
-                    rlatlst.append(LATS[i])
-                    rlonlst.append(LONS[i])
-                    ridx.append(i)
-        if not ridx:
+        latlst = LATS
+        lonlst = LONS
+        ridx = np.flatnonzero(region_mask(LATS,LONS,region))
+        rlatlst = np.asarray(LATS)[ridx]
+        rlonlst = np.asarray(LONS)[ridx]
+        if len(ridx)==0:
             print ("No values for chosen region and time frame!!!")
         else:
-
             print ("Values found for chosen region and time frame.")
         return latlst, lonlst, rlatlst, rlonlst, ridx
 
-    def dumptonc(self,outpath,ncmode=None,timeframe=None):
+    def dumptonc(self,outpath,ncmode=None,timeframe=None,archive=None):
         """
         1. check if nc file already exists
         2. - if so use append mode
            - if not create file
         3. make sure files are only for one single month
+        monthly files (ncmode='auto') are written by altimeter_archive,
+        archive -> open altimeter_archive to append to, e.g. for
+                   consecutive days
         """
+        if archive is not None:
+            archive.append(self)
+            return
+        if (ncmode == 'auto' and
+        (timeframe == 'monthly' or timeframe is None)):
+            archive = altimeter_archive(outpath,self.region)
+            archive.append(self)
+            archive.close()
+            return
         # 1. check if nc file already exists
         win = int(30)
         if self.edate is None:
@@ -1026,8 +1343,12 @@ class sentinel_altimeter():
         /lustre/storeB/users/anac/HINDCAST2017
         /lustre/storeB/users/anac/HINDCAST2017/BETAMAX1.20
         """
-        from utils import haversine
         from model_specs import model_dict
+        from gridmod import get_grid_index
+        from fieldmod import read_model_coords, read_model_time, \
+                             read_model_field
+        from stationmod import matchtime
+        from utils import num2datetime
         print ("Get model data according to date ....")
         if timewin is None:
             timewin = int(30)
@@ -1045,19 +1366,18 @@ class sentinel_altimeter():
             filestr = (init_date.strftime(model_dict[model]['path_template'])
                   + init_date.strftime(model_dict[model]['file_template']))
         print (filestr)
-        f = netCDF4.Dataset(filestr,'r')
-        model_lons = f.variables[model_dict[model]['lons']][:]
-        model_lats = f.variables[model_dict[model]['lats']][:]
-        model_time = f.variables[model_dict[model]['time']][:]
-        # Hs [time,lat,lon]
-        model_Hs = f.variables[model_dict[model]['Hs']][:].squeeze()
-        f.close()
+        model_lons, model_lats = read_model_coords(model,filestr)
+        model_time = read_model_time(model,filestr)
         model_basetime = model_dict[model]['basetime']
         model_time_dt=[]
         for element in model_time:
             model_time_dt.append(model_basetime 
                             + timedelta(seconds=element))
-        sat_time_dt=self.rtime
+        # footprints within timewin of fc_date, only these are
+        # converted to datetime
+        cidx = matchtime(fc_date,fc_date,self.rTIME,self.basetime,
+                        timewin=timewin,idxonly=True,issorted=True)
+        sat_time_dt=num2datetime(self.rTIME[cidx],self.basetime)
         if simmode is None:
             model_time_dt_valid=[model_time_dt[model_time_dt.index(fc_date)]]
             print ("date matches found:")
@@ -1068,135 +1388,215 @@ class sentinel_altimeter():
         get stellite time steps close to model time step in a given 
         time frame. 
         """
-        # Constrain to region
-        if ((model=='mwam8' or model=='mwam4' or model=='ARCMFC')
-        and (self.region!='Arctic' and self.region!='ARCMFC')):
-            model_rlats = model_lats[
-                        (model_lats 
-                        >= self.regions_dict[self.region]["llcrnrlat"])
-                      & (model_lats
-                        <= self.regions_dict[self.region]["urcrnrlat"])
-                      & (model_lons
-                        >= self.regions_dict[self.region]["llcrnrlon"])
-                      & (model_lons
-                        <= self.regions_dict[self.region]["urcrnrlon"])
-                                ]
-            model_rlons = model_lons[
-                        (model_lats 
-                        >= self.regions_dict[self.region]["llcrnrlat"])
-                      & (model_lats
-                        <= self.regions_dict[self.region]["urcrnrlat"])
-                      & (model_lons
-                        >= self.regions_dict[self.region]["llcrnrlon"])
-                      & (model_lons
-                        <= self.regions_dict[self.region]["urcrnrlon"])
-                                ]
-            model_rHs=[]
-            for i in range(len(model_Hs)):
-                tmpA = model_Hs[i,:]
-                tmpB = tmpA[
-                        (model_lats 
-                        >= self.regions_dict[self.region]["llcrnrlat"])
-                      & (model_lats
-                        <= self.regions_dict[self.region]["urcrnrlat"])
-                      & (model_lons
-                        >= self.regions_dict[self.region]["llcrnrlon"])
-                      & (model_lons
-                        <= self.regions_dict[self.region]["urcrnrlon"])
-                                ]
-                model_rHs.append(tmpB)
-                del tmpA, tmpB
-        elif ((model=='mwam8' or model=='mwam4' 
-        or model=='ARCMFC' or model=='ARCMFCnew')
-        and (self.region=='Arctic' or self.region=='ARCMFC')):
-            model_rlats = model_lats[
-                        (model_lats 
-                        >= self.regions_dict[self.region]["boundinglat"])
-                                ]
-            model_rlons = model_lons[
-                        (model_lats 
-                        >= self.regions_dict[self.region]["boundinglat"])
-                                ]
-            model_rHs=[]
-            for i in range(len(model_Hs)):
-                tmpA = model_Hs[i,:]
-                tmpB = tmpA[
-                        (model_lats 
-                        >= self.regions_dict[self.region]["boundinglat"])
-                                ]
-                model_rHs.append(tmpB)
-                del tmpA, tmpB
+        # Constrain to region using the cached grid index
+        grid = get_grid_index(model,model_lons,model_lats)
+        ridx = grid.ridx(self.region)
+        model_rlats = grid.lats[ridx]
+        model_rlons = grid.lons[ridx]
+        model_rHs = read_model_field(model,filestr,
+                        model_time_dt.index(fc_date)).ravel()[ridx]
         # Compare wave heights of satellite with model with 
         # constraint on distance and time frame
-        nearest_all_date_matches=[]
-        nearest_all_dist_matches=[]
-        nearest_all_model_Hs_matches=[]
-        nearest_all_sat_Hs_matches=[]
-        nearest_all_sat_lons_matches=[]
-        nearest_all_sat_lats_matches=[]
-        nearest_all_model_lons_matches=[]
-        nearest_all_model_lats_matches=[]
-        # create local variables before loop
-        sat_rlats=self.rloc[0]
-        sat_rlons=self.rloc[1]
-        sat_rHs=self.rHs
-        # moving window compensating for increasing latitudes
-        try:
-            moving_win = round(
-                    (distlim / 
-                     haversine(0,
-                        np.max(sat_rlats),
-                        1,
-                        np.max(sat_rlats))
-                    ),
-                    2)
-        except (ValueError):
-            moving_win = .6
-        print ("Searching for matches with moving window of degree:",\
-                moving_win)
-        for j in range(len(sat_time_dt)):
-            progress(j,str(int(len(sat_time_dt))),'')
-            try:
-                resultlst=tmploop_get_model(
-                    j,sat_time_dt,model_time_dt_valid,timewin,distlim,model,
-                    sat_rlats,sat_rlons,sat_rHs,
-                    model_rlats,model_rlons,model_rHs,moving_win)
-                nearest_all_date_matches.append(resultlst[0])
-                nearest_all_dist_matches.append(resultlst[1])
-                nearest_all_model_Hs_matches.append(resultlst[2])
-                nearest_all_sat_Hs_matches.append(resultlst[3])
-                nearest_all_sat_lons_matches.append(resultlst[4])
-                nearest_all_sat_lats_matches.append(resultlst[5])
-                nearest_all_model_lons_matches.append(resultlst[6])
-                nearest_all_model_lats_matches.append(resultlst[7])
-            except:
-                pass
-        results_dict = {
-            'valid_date':np.array(model_time_dt_valid),
-            'date_matches':np.array(nearest_all_date_matches),
-            'dist_matches':np.array(nearest_all_dist_matches),
-            'model_Hs_matches':np.array(nearest_all_model_Hs_matches),
-            'sat_Hs_matches':np.array(nearest_all_sat_Hs_matches),
-            'sat_lons_matches':np.array(nearest_all_sat_lons_matches),
-            'sat_lats_matches':np.array(nearest_all_sat_lats_matches),
-            'model_lons_matches':np.array(nearest_all_model_lons_matches),
-            'model_lats_matches':np.array(nearest_all_model_lats_matches)
-            }
+        sat_rlats=self.rloc[0][cidx]
+        sat_rlons=self.rloc[1][cidx]
+        sat_rHs=np.asarray(self.rHs)[cidx]
+        results_dict = collocate(sat_time_dt,sat_rlats,sat_rlons,sat_rHs,
+                        model_rlats,model_rlons,model_rHs,
+                        model_time_dt_valid,timewin=timewin,distlim=distlim,
+                        tree=grid.tree(self.region))
         return results_dict
 
-def get_model2(sa_obj,model,init_date,fc_date,timewin=None,distlim=None,
-    expname=None,simmode=None):
-    """ 
-    Get model data.
+class altimeter_archive():
+    '''
+    writer of monthly altimeter files (rtime, rlats, rlons, rHs) as
+    written by sentinel_altimeter.dumptonc with ncmode='auto'. The
+    file of the current month is kept open across appends, e.g. for
+    all days of a month in aggregate.py.
+     - footprints with rtime already in the file are skipped, using a
+       sorted index of all rtime of the file
+     - appends are buffered and written every flushsize footprints
+     - new files are chunked and compressed (zlib, shuffle)
+     - a coverage table of the days of the month is kept up to date:
+       day (seconds since 2000-01-01), day_count (footprints) and
+       day_start (index of the first footprint of the day, valid if
+       the file attribute rtime_sorted is 1 i.e. rtime increases)
+    '''
+    basetime = datetime(2000,1,1)
+
+    def __init__(self,outpath,region,complevel=None,chunksize=None,
+        flushsize=None):
+        if complevel is None:
+            complevel = 4
+        if chunksize is None:
+            chunksize = 4096
+        if flushsize is None:
+            flushsize = 25*chunksize
+        self.outpath = outpath
+        self.region = region
+        self.complevel = complevel
+        self.chunksize = chunksize
+        self.flushsize = flushsize
+        self.nc = None
+        self.month = None
+
+    def filename(self,month):
+        return ("global_vavh_l3_rt_s3a_" + self.region + "_"
+                + month.strftime("%Y%m") + ".nc")
+
+    def append(self,sa_obj):
+        '''
+        footprints of sa_obj within region, each footprint is written
+        to the file of its month
+        '''
+        self.append_cols(sa_obj.rTIME,sa_obj.rloc[0],sa_obj.rloc[1],
+                         sa_obj.rHs)
+
+    def append_cols(self,time,lats,lons,Hs):
+        '''
+        footprints given as arrays of rtime (seconds since 2000-01-01),
+        lats, lons, Hs
+        '''
+        time = np.asarray(time,dtype='float64')
+        cols = [np.asarray(x,dtype='float64') for x in [lats,lons,Hs]]
+        # unique and sorted footprints, the first occurrence is kept
+        time, first = np.unique(time,return_index=True)
+        cols = [x[first] for x in cols]
+        while len(time)>0:
+            t0 = self.basetime + timedelta(seconds=float(time[0]))
+            month = datetime(t0.year,t0.month,1)
+            end = ((month + relativedelta(months=+1))
+                   - self.basetime).total_seconds()
+            stop = np.searchsorted(time,end,side='left')
+            self.open(month)
+            self._buffer(time[:stop],[x[:stop] for x in cols])
+            time = time[stop:]
+            cols = [x[stop:] for x in cols]
+
+    def open(self,month):
+        '''
+        open (or create) the file of month and read its rtime index,
+        the file of the previous month is closed
+        '''
+        if month == self.month:
+            return
+        self.close()
+        fullpath = os.path.join(self.outpath,self.filename(month))
+        print ('Dump altimeter wave data to file: ' + fullpath)
+        if os.path.isfile(fullpath):
+            self.nc = netCDF4.Dataset(fullpath,mode='a',clobber=False)
+            rtime = np.ma.filled(np.ma.array(
+                        self.nc.variables['rtime'][:],dtype='float64'),
+                        np.nan)
+            self.index = np.unique(rtime[~np.isnan(rtime)])
+            self.sorted = bool(len(rtime)==len(self.index)
+                               and np.all(np.diff(rtime)>0))
+        else:
+            if not os.path.isdir(self.outpath):
+                os.makedirs(self.outpath)
+            self.nc = netCDF4.Dataset(fullpath,mode='w',format='NETCDF4')
+            self.nc.title = 'altimeter significant wave height'
+            self.nc.createDimension('rtime',size=None)
+            for name, units in [('rtime','seconds since 2000-01-01 00:00:00'),
+                                ('rlats','degrees north'),
+                                ('rlons','degrees east'),
+                                ('rHs','m')]:
+                var = self.nc.createVariable(name,np.float64,
+                                dimensions=('rtime',),
+                                zlib=(self.complevel>0),
+                                complevel=max(self.complevel,1),
+                                shuffle=True,
+                                chunksizes=(self.chunksize,))
+                var.units = units
+            self.index = np.array([])
+            self.sorted = True
+        if 'day_count' not in self.nc.variables:
+            self._create_coverage(month)
+        self.month = month
+        self.bufs = [[],[],[],[]]
+        self.buffered = 0
+
+    def _create_coverage(self,month):
+        days = calendar.monthrange(month.year,month.month)[1]
+        self.nc.createDimension('day',size=days)
+        day = self.nc.createVariable('day',np.float64,dimensions=('day',))
+        day.units = 'seconds since 2000-01-01 00:00:00'
+        day[:] = [(month + timedelta(days=i)
+                   - self.basetime).total_seconds() for i in range(days)]
+        count = self.nc.createVariable('day_count',np.int32,
+                                       dimensions=('day',))
+        count.long_name = 'number of footprints of the day'
+        start = self.nc.createVariable('day_start',np.int32,
+                                       dimensions=('day',))
+        start.long_name = ('index of the first footprint of the day, '
+                           + 'valid if rtime_sorted is 1')
+        self._write_coverage()
+
+    def _buffer(self,time,cols):
+        '''
+        skip footprints already written and buffer the others
+        '''
+        pos = np.searchsorted(self.index,time)
+        known = np.zeros(len(time),dtype='bool')
+        inside = pos < len(self.index)
+        known[inside] = self.index[pos[inside]] == time[inside]
+        if np.any(known):
+            print ("Skip " + str(int(np.sum(known)))
+                   + " footprints already in file")
+            time = time[~known]
+            cols = [x[~known] for x in cols]
+        if len(time)==0:
+            return
+        if (len(self.index)>0 and time[0] < self.index[-1]):
+            self.sorted = False
+            self.index = np.sort(np.concatenate([self.index,time]),
+                                 kind='mergesort')
+        else:
+            self.index = np.concatenate([self.index,time])
+        for buf, x in zip(self.bufs,[time]+cols):
+            buf.append(x)
+        self.buffered += len(time)
+        if self.buffered >= self.flushsize:
+            self.flush()
+
+    def flush(self):
+        '''
+        write buffered footprints as one slice and update the coverage
+        '''
+        if (self.nc is None or self.buffered == 0):
+            return
+        start = len(self.nc.dimensions['rtime'])
+        stop = start + self.buffered
+        for name, buf in zip(['rtime','rlats','rlons','rHs'],self.bufs):
+            self.nc.variables[name][start:stop] = np.concatenate(buf)
+        self.bufs = [[],[],[],[]]
+        self.buffered = 0
+        self._write_coverage()
+
+    def _write_coverage(self):
+        day = self.nc.variables['day'][:]
+        edges = np.append(day,day[-1]+86400.)
+        first = np.searchsorted(self.index,edges,side='left')
+        count = np.diff(first)
+        start = np.where(count>0,first[:-1],-1)
+        if not self.sorted:
+            start[:] = -1
+        self.nc.variables['day_count'][:] = count
+        self.nc.variables['day_start'][:] = start
+        self.nc.rtime_sorted = int(self.sorted)
+
+    def close(self):
+        if self.nc is None:
+            return
+        self.flush()
+        self.nc.close()
+        self.nc = None
+        self.month = None
+
+def model_filestr(model,init_date,fc_date,expname=None):
+    """
+    model file containing fc_date of the run initialized at init_date
     """
-    from utils import haversine
     from model_specs import model_dict
-    from stationmod import matchtime
-    print ("Get model data according to date ....")
-    if timewin is None:
-        timewin = int(30)
-    if distlim is None:
-        distlim = int(6)
     if model == 'ARCMFC':
         filestr = (model_dict[model]['path']
               + fc_date.strftime('%Y%m%d')
@@ -1208,21 +1608,94 @@ def get_model2(sa_obj,model,init_date,fc_date,timewin=None,distlim=None,
     elif (model == 'mwam4' or model == 'mwam8'):
         filestr = (init_date.strftime(model_dict[model]['path_template'])
               + init_date.strftime(model_dict[model]['file_template']))
+    return filestr
+
+def load_state(statefile):
+    """
+    cells of previous runs, keys are (fc_date, lead time in hours)
+    """
+    import pickle
+    if (statefile is None or not os.path.isfile(statefile)):
+        return {}
+    with open(statefile,'rb') as f:
+        return pickle.load(f)
+
+def save_state(statefile,state):
+    """
+    write to temporary file and rename to avoid partial files
+    """
+    import pickle, tempfile
+    fd, tmpname = tempfile.mkstemp(
+                    dir=os.path.dirname(os.path.abspath(statefile)))
+    with os.fdopen(fd,'wb') as f:
+        pickle.dump(state,f,protocol=2)
+    os.rename(tmpname,statefile)
+
+def cell_signature(fc_date,init_date,sat_times,model=None,timewin=None):
+    """
+    model file version and hash of the footprint times (sorted,
+    seconds since 2000-01-01) within the collocation time window
+    of fc_date
+    """
+    import hashlib
+    from fieldmod import file_key
+    if model is None:
+        model = "ARCMFC"
+    if timewin is None:
+        timewin = int(30)
+    try:
+        model_key = file_key(model_filestr(model,init_date,fc_date))
+    except IOError:
+        model_key = None
+    lo = (fc_date - timedelta(minutes=timewin)
+          - datetime(2000,1,1)).total_seconds()
+    hi = (fc_date + timedelta(minutes=timewin)
+          - datetime(2000,1,1)).total_seconds()
+    i0 = np.searchsorted(sat_times,lo,side='left')
+    i1 = np.searchsorted(sat_times,hi,side='right')
+    sat_key = hashlib.sha1(sat_times[i0:i1].tobytes()).hexdigest()[:16]
+    return model_key, sat_key
+
+def pending_cells(keys,state,signatures=None):
+    """
+    keys of cells that are not in state or whose signature changed,
+    all keys if signatures is None
+    """
+    if signatures is None:
+        return list(keys)
+    return [key for key in keys
+            if (key not in state
+            or state[key]['signature'] != signatures[key])]
+
+def get_model2(sa_obj,model,init_date,fc_date,timewin=None,distlim=None,
+    expname=None,simmode=None,skipmasked=None):
+    """ 
+    Get model data.
+    skipmasked=True drops footprints at masked grid points (see collocate)
+    """
+    from model_specs import model_dict
+    from gridmod import get_grid_index
+    from fieldmod import read_model_coords, read_model_time, \
+                         read_model_field
+    from stationmod import matchtime
+    from utils import num2datetime
+    print ("Get model data according to date ....")
+    if timewin is None:
+        timewin = int(30)
+    if distlim is None:
+        distlim = int(6)
+    filestr = model_filestr(model,init_date,fc_date,expname=expname)
     print (filestr)
-    f = netCDF4.Dataset(filestr,'r')
-    model_lons = f.variables[model_dict[model]['lons']][:]
-    model_lats = f.variables[model_dict[model]['lats']][:]
-    model_time = f.variables[model_dict[model]['time']][:]
-    # Hs [time,lat,lon]
-    model_Hs = f.variables[model_dict[model]['Hs']][:].squeeze()
-    f.close()
+    model_lons, model_lats = read_model_coords(model,filestr)
+    model_time = read_model_time(model,filestr)
     model_basetime = model_dict[model]['basetime']
     model_time_dt=[]
     for element in model_time:
         model_time_dt.append(model_basetime
                         + timedelta(seconds=element))
-    ctime, cidx = matchtime(fc_date,fc_date,sa_obj.rTIME,sa_obj.basetime,timewin=30)
-    sat_time_dt=np.array(sa_obj.rtime)[cidx]
+    cidx = matchtime(fc_date,fc_date,sa_obj.rTIME,sa_obj.basetime,
+                    timewin=30,idxonly=True,issorted=True)
+    sat_time_dt=num2datetime(sa_obj.rTIME[cidx],sa_obj.basetime)
     if simmode is None:
         model_time_dt_valid=[model_time_dt[model_time_dt.index(fc_date)]]
         print ("date matches found:")
@@ -1233,175 +1706,109 @@ def get_model2(sa_obj,model,init_date,fc_date,timewin=None,distlim=None,
     get stellite time steps close to model time step in a given 
     time frame. 
     """
-    # Constrain to region
-    if ((model=='mwam8' or model=='mwam4' or model=='ARCMFC')
-    and (sa_obj.region!='Arctic' and sa_obj.region!='ARCMFC')):
-        model_rlats = model_lats[
-                    (model_lats
-                    >= sa_obj.regions_dict[sa_obj.region]["llcrnrlat"])
-                  & (model_lats
-                    <= sa_obj.regions_dict[sa_obj.region]["urcrnrlat"])
-                  & (model_lons
-                    >= sa_obj.regions_dict[sa_obj.region]["llcrnrlon"])
-                  & (model_lons
-                    <= sa_obj.regions_dict[sa_obj.region]["urcrnrlon"])
-                            ]
-        model_rlons = model_lons[
-                    (model_lats
-                    >= sa_obj.regions_dict[sa_obj.region]["llcrnrlat"])
-                  & (model_lats
-                    <= sa_obj.regions_dict[sa_obj.region]["urcrnrlat"])
-                  & (model_lons
-                    >= sa_obj.regions_dict[sa_obj.region]["llcrnrlon"])
-                  & (model_lons
-                    <= sa_obj.regions_dict[sa_obj.region]["urcrnrlon"])
-                            ]
-        model_rHs=[]
-        for i in range(len(model_Hs)):
-            tmpA = model_Hs[i,:]
-            tmpB = tmpA[
-                    (model_lats
-                    >= sa_obj.regions_dict[sa_obj.region]["llcrnrlat"])
-                  & (model_lats
-                    <= sa_obj.regions_dict[sa_obj.region]["urcrnrlat"])
-                  & (model_lons
-                    >= sa_obj.regions_dict[sa_obj.region]["llcrnrlon"])
-                  & (model_lons
-                    <= sa_obj.regions_dict[sa_obj.region]["urcrnrlon"])
-                            ]
-            model_rHs.append(tmpB)
-            del tmpA, tmpB
-    elif ((model=='mwam8' or model=='mwam4'
-    or model=='ARCMFC' or model=='ARCMFCnew')
-    and (sa_obj.region=='Arctic' or sa_obj.region=='ARCMFC')):
-        model_rlats = model_lats[
-                    (model_lats
-                    >= sa_obj.regions_dict[sa_obj.region]["boundinglat"])
-                            ]
-        model_rlons = model_lons[
-                    (model_lats
-                    >= sa_obj.regions_dict[sa_obj.region]["boundinglat"])
-                            ]
-        model_rHs=[]
-        for i in range(len(model_Hs)):
-            tmpA = model_Hs[i,:]
-            tmpB = tmpA[
-                    (model_lats
-                    >= sa_obj.regions_dict[sa_obj.region]["boundinglat"])
-                            ]
-            model_rHs.append(tmpB)
-            del tmpA, tmpB
+    # Constrain to region using the cached grid index
+    grid = get_grid_index(model,model_lons,model_lats)
+    ridx = grid.ridx(sa_obj.region)
+    model_rlats = grid.lats[ridx]
+    model_rlons = grid.lons[ridx]
+    model_rHs = read_model_field(model,filestr,
+                        model_time_dt.index(fc_date)).ravel()[ridx]
     # Compare wave heights of satellite with model with 
     # constraint on distance and time frame
-    nearest_all_date_matches=[]
-    nearest_all_dist_matches=[]
-    nearest_all_model_Hs_matches=[]
-    nearest_all_sat_Hs_matches=[]
-    nearest_all_sat_lons_matches=[]
-    nearest_all_sat_lats_matches=[]
-    nearest_all_model_lons_matches=[]
-    nearest_all_model_lats_matches=[]
-    # create local variables before loop
     sat_rlats=sa_obj.rloc[0][cidx]
     sat_rlons=sa_obj.rloc[1][cidx]
-    sat_rHs=np.array(sa_obj.rHs)[cidx]
-    # moving window compensating for increasing latitudes
-    try:
-        moving_win = round(
-                (distlim /
-                 haversine(0,
-                    np.max(sat_rlats),
-                    1,
-                    np.max(sat_rlats))
-                ),
-                2)
-    except (ValueError):
-        moving_win = .6
-    print ("Searching for matches with moving window of degree:",\
-            moving_win)
-    for j in range(len(sat_time_dt)):
-        progress(j,str(int(len(sat_time_dt))),'')
-        try:
-            resultlst=tmploop_get_model(
-                j,sat_time_dt,model_time_dt_valid,timewin,distlim,model,
-                sat_rlats,sat_rlons,sat_rHs,
-                model_rlats,model_rlons,model_rHs,moving_win)
-            nearest_all_date_matches.append(resultlst[0])
-            nearest_all_dist_matches.append(resultlst[1])
-            nearest_all_model_Hs_matches.append(resultlst[2])
-            nearest_all_sat_Hs_matches.append(resultlst[3])
-            nearest_all_sat_lons_matches.append(resultlst[4])
-            nearest_all_sat_lats_matches.append(resultlst[5])
-            nearest_all_model_lons_matches.append(resultlst[6])
-            nearest_all_model_lats_matches.append(resultlst[7])
-        except:
-            pass
-    results_dict = {
-        'valid_date':np.array(model_time_dt_valid),
-        'date_matches':np.array(nearest_all_date_matches),
-        'dist_matches':np.array(nearest_all_dist_matches),
-        'model_Hs_matches':np.array(nearest_all_model_Hs_matches),
-        'sat_Hs_matches':np.array(nearest_all_sat_Hs_matches),
-        'sat_lons_matches':np.array(nearest_all_sat_lons_matches),
-        'sat_lats_matches':np.array(nearest_all_sat_lats_matches),
-        'model_lons_matches':np.array(nearest_all_model_lons_matches),
-        'model_lats_matches':np.array(nearest_all_model_lats_matches)
-        }
+    sat_rHs=np.asarray(sa_obj.rHs)[cidx]
+    results_dict = collocate(sat_time_dt,sat_rlats,sat_rlons,sat_rHs,
+                    model_rlats,model_rlons,model_rHs,
+                    model_time_dt_valid,timewin=timewin,distlim=distlim,
+                    tree=grid.tree(sa_obj.region),
+                    skipmasked=skipmasked)
     return results_dict
 
-def validate(results_dict,boot=None):
+# altimeter object of the processes of validate_arcmfc.py
+worker_sa_obj = None
+
+def init_worker(obj):
+    """
+    set the altimeter object used by tmploop_validate in each
+    process, with the default fork start method the object is
+    inherited by the workers and not pickled
+    """
+    global worker_sa_obj
+    worker_sa_obj = obj
+
+def tmploop_validate(task):
+    """
+    collocation and validation for one (fc_date, init_date),
+    the altimeter object is set by init_worker
+    """
+    from fieldmod import cache_info
+    from utils import validation_stats
+    count1, count2, fc_date, init_date = task
+    print ("Validation for init_date: "
+    + str(init_date)
+    + "\n"
+    + " and fc_date: "
+    + str(fc_date))
+    try:
+        start_time = time.time()
+        results_dict = get_model2(worker_sa_obj,"ARCMFC",init_date,fc_date)
+        time1 = time.time() - start_time
+        print "Time used for get_model: ", time1, " seconds"
+        valid_dict=validate(results_dict)
+        stats = validation_stats().update(
+                            results_dict['model_Hs_matches'],
+                            results_dict['sat_Hs_matches'])
+    except (IOError, IndexError, ValueError) as error:
+        return count1, count2, fc_date, init_date, error, None, None, \
+               (os.getpid(), cache_info())
+    return count1, count2, fc_date, init_date, None, valid_dict, \
+           stats.to_dict(), (os.getpid(), cache_info())
+
+def validate(results_dict,boot=None,reps=None,seed=None):
     import numpy as np
-    from utils import rmsd, corr, mad, bias
     """
     produced metrics:
     mean of product --> mop
     mean of reference --> mor
     mean square difference --> msd
     number of data values --> nov
+    scatter index and regression slope --> SI, slope
+    mop, mor and nov are taken over all collocated pairs (nan model
+    Hs at masked grid points included in nov), the other metrics
+    over pairs without nans.
+    with boot=True rmsd, msd, mad, bias, corr are arrays of reps
+    bootstrap replicates and <metric>_ci the 95% confidence intervals
     """
     flatten = lambda l: [item for sublist in l for item in sublist]
     date_matches = np.array(results_dict['date_matches'])
     model_Hs_matches = np.array(results_dict['model_Hs_matches'])
     sat_Hs_matches = np.array(results_dict['sat_Hs_matches'])
     if (boot is None or boot ==  False):
-        mop = np.nanmean(model_Hs_matches)
-        mor = np.nanmean(sat_Hs_matches)
-        msd, rmsd = rmsd(model_Hs_matches,sat_Hs_matches)
-        nov = len(sat_Hs_matches)
-        mad = mad(model_Hs_matches,sat_Hs_matches)
-        corr = corr(model_Hs_matches,sat_Hs_matches)
-        bias = bias(model_Hs_matches,sat_Hs_matches)
-        arcmfc_validation_dict = {
-            'mop':mop,
-            'mor':mor,
-            'msd':msd,
-            'nov':nov,
-            'rmsd':rmsd,
-            'corr':corr,
-            'mad':mad,
-            'bias':bias}
+        from utils import metrics
+        # metrics of pairs without nans
+        arcmfc_validation_dict = metrics(model_Hs_matches,sat_Hs_matches,
+                                         dtype='float64')
+        # as for the monthly ARCMFC product
+        arcmfc_validation_dict['mop'] = np.nanmean(model_Hs_matches)
+        arcmfc_validation_dict['mor'] = np.nanmean(sat_Hs_matches)
+        arcmfc_validation_dict['nov'] = len(sat_Hs_matches)
     elif boot is True:
-        from utils import bootstr, marginalize
-        reps=1000
-        newmodel,newsat,newidx = marginalize(model_Hs_matches,sat_Hs_matches)
-        sat_boot,boot_idx=bootstr(newsat,reps)
-        print len(sat_boot[np.isnan(sat_boot)])
-        RMSD=np.zeros(reps)*np.nan
-        MSD=np.zeros(reps)*np.nan
-        BIAS=np.zeros(reps)*np.nan
-        CORR=np.zeros(reps)*np.nan
-        for i in range(reps):
-            results_dict = {'date_matches':date_matches[newidx[boot_idx[:,i]]],
-                        'model_Hs_matches':newmodel[boot_idx[:,i]],
-                        'sat_Hs_matches':newsat[boot_idx[:,i]]}
-            try:
-                RMSD[i]=validate(results_dict)['rmsd']
-                MSD[i]=validate(results_dict)['mad']
-                BIAS[i]=validate(results_dict)['bias']
-                CORR[i]=validate(results_dict)['corr']
-            except IndexError as e:
-                print (e)
-        arcmfc_validation_dict = {'rmsd':RMSD,'mad':MSD,'bias':BIAS,'corr':CORR}
+        from utils import bootstr_metrics
+        # all replicates are computed at once
+        boot_dict = bootstr_metrics(model_Hs_matches,sat_Hs_matches,
+                                    reps=reps,seed=seed)
+        arcmfc_validation_dict = {
+            'rmsd':boot_dict['rmsd'],
+            'msd':boot_dict['msd'],
+            'mad':boot_dict['mad'],
+            'bias':boot_dict['bias'],
+            'corr':boot_dict['corr'],
+            'rmsd_ci':boot_dict['rmsd_ci'],
+            'msd_ci':boot_dict['msd_ci'],
+            'mad_ci':boot_dict['mad_ci'],
+            'bias_ci':boot_dict['bias_ci'],
+            'corr_ci':boot_dict['corr_ci']}
     return arcmfc_validation_dict
 
 def get_pointsat(sa_obj,station=None,lat=None,lon=None,distlim=None):
@@ -1413,19 +1820,16 @@ def get_pointsat(sa_obj,station=None,lat=None,lon=None,distlim=None):
         lat=locations[station][0]
         lon=locations[station][1]
     proxim = 1
-    lats = sa_obj.rloc[0]
-    lons = sa_obj.rloc[1]
-    Hs = sa_obj.rHs
+    lats = np.array(sa_obj.rloc[0])
+    lons = np.array(sa_obj.rloc[1])
+    Hs = np.array(sa_obj.rHs)
     time = sa_obj.rtime
-    sample = []
-    dists = []
-    for i in range(len(lats)):
-        if ((lats[i] < lat+1) and (lats[i] > lat-1)):
-            if ((lons[i] < lon+1) and (lons[i] > lon-1)):
-                dist=haversine(lons[i],lats[i],lon,lat)
-                if (dist<=distlim):
-                    sample.append(Hs[i])
-                    dists.append(dist)
+    # constraints to reduce workload
+    idx = np.flatnonzero((lats < lat+proxim) & (lats > lat-proxim)
+                       & (lons < lon+proxim) & (lons > lon-proxim))
+    dists = haversine(lons[idx],lats[idx],lon,lat)
+    sample = list(Hs[idx][dists<=distlim])
+    dists = list(dists[dists<=distlim])
     return sample, dists
 
 # --- help ------------------------------------------------------------#
@@ -1455,6 +1859,10 @@ sa_obj = sa(sdate,edate=edate,timewin=timewin,
             region="ARCMFC",mode="ARCMFC")\n
 # possible to save data for region in netcdf
 sa_obj.dumptonc("outpath/")\n
+# long periods can be streamed in chunks of one day
+from satmod import stream_sentinel
+for sa_obj in stream_sentinel(sdate,edate,region="ARCMFC"):
+    sa_obj.dumptonc("outpath/",ncmode='auto')\n
 # possible to have a quick look at the swath
 sa_obj.quip("ARCMFC",show=True[,save=True])\n
 # model/sentinel collocation:
@@ -1464,7 +1872,7 @@ results = sa_obj.get_model('ARCMFC',init_date,fc_date,\
 # validate the model
 valid_dict = validate(results)
 # or with bootstrap
-valid_dict = validate(results, boot=True)
+valid_dict = validate(results, boot=True[, reps=1000, seed=1])
         """,
         formatter_class = RawTextHelpFormatter
         )
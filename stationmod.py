@@ -44,6 +44,9 @@ import netCDF4 as netCDF4
 # create_file
 import calendar
 
+# d22 cache
+import pickle
+
 # libraries for parallel computing
 from joblib import Parallel, delayed
 import multiprocessing as mp
@@ -57,16 +60,16 @@ import sys
 # get_remote
 from dateutil.relativedelta import relativedelta
 from copy import deepcopy
+from collections import OrderedDict
 
 import time
 
 # get d22 files
 from pathfinder import station_d22_starc, station_d22_opdate
 from pathfinder import stationpath_lustre_om, stationpath_lustre_hi
+from pathfinder import d22cache_path
 import pylab as pl
-from d22_var_dicts import dat,  WM1, WM2, WM3, \
-                                WL1, WL2, WL3, \
-                                WIA, WIB, WIC
+from d22_var_dicts import d22_sensors, d22_vars, d22_lines
 from datetime import datetime
 import scipy as sp
 
@@ -92,6 +95,8 @@ class station_class():
     This class offers the following added functionality:
      - get the closest time stamp(s)
      - get Hs value for this time
+    Only time steps within [sdate,edate] are read (see read_station),
+    time is a numeric array and timedt converts to datetime on access.
     '''
     #stationpath_lustre_om = '/lustre/storeA/project/fou/om/' + \
     #                        'waveverification/data/'
@@ -117,37 +122,83 @@ class station_class():
 
     def get_station(self,statname,sdate,edate,mode):
         if mode == 'nc':
-            basedate = self.basedate
-            tmpdate = sdate
-            hs = []
-            hs_obs = []
-            time = []
-            timedt = []
-            while (tmpdate <= edate):
-                filepath = stationpath_lustre_hi + statname + \
-                    tmpdate.strftime('_%Y%m') + '.nc'
-                nc = netCDF4.Dataset(filepath,'r')
-                #ncg = nc.groups['OBS_d22']
-                #var = np.mean(ncg.variables['Hs'][:],axis=0)
-                Hs_OBS = nc.variables['Hs_OBS'][:]
-                var = np.nanmean(Hs_OBS,axis=0)
-                hs.append(var)
-                hs_obs.append(Hs_OBS)
-                var = nc.variables['time'][:]
-                time.append(var)
-                for s in var:
-                    timedt.append(basedate + timedelta(seconds=s))
-                nc.close()
-                tmpdate = tmpdate + relativedelta(months = +1)
-            hs = flatten(hs)
-            time = flatten(time)
+            # only time steps within [sdate,edate] are read
+            from utils import lazy_datetimes
+            time, hs, hs_obs = read_station(statname,sdate,edate,
+                                            basedate=self.basedate)
+            timedt = lazy_datetimes(time,self.basedate)
         elif mode == 'd22':
             print ("no d22 fileformat included yet")
         return hs, hs_obs, time, timedt
 
-def parse_d22(statname,sdate,edate):
-    # Read all lines in file and append to searchlines
-    searchlines=[]
+# opened monthly station files, see station_file
+station_maxopen = 24
+_station_files = OrderedDict()
+
+def station_file(filepath):
+    '''
+    opened netcdf file and its numeric time steps, files are kept
+    open for later calls and opened again if they changed
+    '''
+    from fieldmod import file_key
+    key = file_key(filepath)
+    if filepath in _station_files:
+        entry = _station_files.pop(filepath)
+        if entry[0] == key:
+            _station_files[filepath] = entry
+            return entry[1], entry[2]
+        entry[1].close()
+    nc = netCDF4.Dataset(filepath,'r')
+    time = np.ma.getdata(nc.variables['time'][:])
+    _station_files[filepath] = (key,nc,time)
+    while len(_station_files) > station_maxopen:
+        oldkey, oldentry = _station_files.popitem(last=False)
+        oldentry[1].close()
+    return nc, time
+
+def read_station(statname,sdate,edate,basedate=None,skipmissing=None):
+    '''
+    time steps within [sdate,edate] of the monthly station files,
+    sorted time steps are found by binary search and only this
+    hyperslab of Hs_OBS[sensor,time] is read
+    skipmissing=True skips missing month files instead of IOError
+    returns time (seconds since basedate), hs (mean of sensors),
+    hs_obs (list of Hs_OBS for each month)
+    '''
+    if basedate is None:
+        basedate = datetime(1970,1,1)
+    start = (sdate - basedate).total_seconds()
+    stop = (edate - basedate).total_seconds()
+    time = []
+    hs = []
+    hs_obs = []
+    tmpdate = datetime(sdate.year,sdate.month,1)
+    while (tmpdate <= edate):
+        filepath = stationpath_lustre_hi + statname + \
+            tmpdate.strftime('_%Y%m') + '.nc'
+        tmpdate = tmpdate + relativedelta(months = +1)
+        try:
+            nc, ftime = station_file(filepath)
+        except IOError:
+            if skipmissing == True:
+                continue
+            raise
+        i0 = np.searchsorted(ftime,start,side='left')
+        i1 = np.searchsorted(ftime,stop,side='right')
+        Hs_OBS = nc.variables['Hs_OBS'][:,i0:i1]
+        hs.append(np.nanmean(Hs_OBS,axis=0))
+        hs_obs.append(Hs_OBS)
+        time.append(ftime[i0:i1])
+    time = np.concatenate([np.array([])] + time)
+    hs = np.concatenate([np.array([])] + [np.ma.filled(x,np.nan)
+                                          for x in hs])
+    return time, hs, hs_obs
+
+def d22_filelst(statname,sdate,edate):
+    '''
+    daily d22 files of statname, opdata files are used if available
+    '''
+    filelst = []
     for d in range(int(pl.date2num(sdate)),int(pl.date2num(edate))+1): 
         dy = pl.num2date(d).strftime("%Y%m%d")
         YY = pl.num2date(d).strftime("%Y")
@@ -156,13 +207,18 @@ def parse_d22(statname,sdate,edate):
         ifile_opdata = (station_d22_opdate + statname 
                         + "/d22/" + dy + ".d22")
         if os.path.isfile(ifile_opdata):
-            f = open(ifile_opdata, "r")
-            searchlines = searchlines + f.readlines()
-            f.close()
+            filelst.append(ifile_opdata)
         elif os.path.isfile(ifile_starc):
-            f = open(ifile_starc, "r")
-            searchlines = searchlines + f.readlines()
-            f.close()
+            filelst.append(ifile_starc)
+    return filelst
+
+def parse_d22(statname,sdate,edate):
+    # Read all lines in files and append to searchlines
+    searchlines=[]
+    for filestr in d22_filelst(statname,sdate,edate):
+        f = open(filestr, "r")
+        searchlines.extend(f.readlines())
+        f.close()
     return searchlines
 
 # Function that converts 's' to float32 or nan if floater throws exception 
@@ -173,127 +229,319 @@ def floater(s):
         x = np.nan
     return x
 
+def floaters(strlst):
+    '''
+    floater for a list of strings, values are float32 precision
+    '''
+    strlst = [s.strip() for s in strlst]
+    try:
+        return np.array(strlst).astype('float32').astype('float64')
+    except ValueError:
+        return np.array([floater(s) for s in strlst],dtype='float64')
+
+def tokenize_d22(searchlines):
+    '''
+    10 min records of d22 lines in one pass, returns the time of
+    each record and a dict of preallocated arrays for each sensor.
+    A record starts with a line containing !!!!, values are found
+    at fixed lines after the line with the sensor name (d22_lines),
+    the last occurence of a sensor in a record is used.
+    '''
+    import re
+    names = flatten([d22_sensors[kind] for kind in sorted(d22_sensors)])
+    pattern = re.compile('|'.join(['!!!!'] + names))
+    # lines are joined such that matches never span lines
+    text = '\n'.join(searchlines)
+    starts = np.cumsum([0] + [len(l)+1 for l in searchlines])
+    found = {}
+    for match in pattern.finditer(text):
+        found.setdefault(match.group(),[]).append(match.start())
+    def line_idx(key):
+        return np.unique(np.searchsorted(starts,found.get(key,[]),
+                                         side='right')-1)
+    rec = line_idx('!!!!')
+    time = np.array([datetime.strptime(
+                ' '.join([l.strip() for l in searchlines[i+3:i+5]]),
+                '%d-%m-%Y %H:%M') for i in rec])
+    sensors = {}
+    for kind in d22_sensors:
+        for name in d22_sensors[kind]:
+            sensor = {'name':name}
+            for var in d22_vars[kind]:
+                sensor[var] = np.full(len(rec),np.nan)
+            idx = line_idx(name)
+            # record of each sensor line
+            ridx = np.searchsorted(rec,idx,side='right')-1
+            idx, ridx = idx[ridx>=0], ridx[ridx>=0]
+            for var, offset in d22_lines[kind].items():
+                lidx = idx + offset
+                valid = lidx < len(searchlines)
+                lidx, vridx = lidx[valid], ridx[valid]
+                # last line of each record
+                last = len(vridx) - 1 - np.unique(vridx[::-1],
+                                            return_index=True)[1]
+                sensor[var][vridx[last]] = floaters(
+                            [searchlines[i] for i in lidx[last]])
+            sensors[name] = sensor
+    return time, sensors
+
+def d22_1hr(var):
+    '''
+    1 hour averages of 10 min values as in OJ's plotd22v5.py,
+    series shorter than 6 values are nan
+    '''
+    if len(var) < 6:
+        return np.full(len(var),np.nan)
+    WINDOW = 3
+    wmt = np.power(var,2)
+    weights = np.ones((WINDOW))/WINDOW
+    wmt[2:-2:2] = np.convolve(wmt[0::2], weights,mode='valid')
+    wmt[3:-2:2] = np.convolve(wmt[1::2], weights,mode='valid')
+    wmt[[0,1,-2,-1]]= np.nan
+    return np.sqrt(wmt)
+
+def aggregate_d22(sensors):
+    '''
+    adds 1 hour averages of Hs and Tm to the WM sensors
+    '''
+    for name in d22_sensors['WM']:
+        sensors[name]['Hs_1hr'] = d22_1hr(sensors[name]['Hs_10min'])
+        sensors[name]['Tm_1hr'] = d22_1hr(sensors[name]['Tm_10min'])
+    return sensors
+
+def read_d22_file(filestr):
+    '''
+    time and sensors of one d22 file, see tokenize_d22
+    '''
+    f = open(filestr, "r")
+    searchlines = f.readlines()
+    f.close()
+    return tokenize_d22(searchlines)
+
+def read_d22(statname,sdate,edate,corenum=None,cache=None):
+    '''
+    time and sensors with 10 min and 1 hour values of statname,
+    daily files are read in parallel using corenum processes.
+    Records are not continued across files.
+    cache -> True to read through the d22_cache of statname
+    '''
+    if corenum is None:
+        corenum = 1
+    if cache == True:
+        return d22_cache(statname).read(sdate,edate,corenum=corenum)
+    filelst = d22_filelst(statname,sdate,edate)
+    results = Parallel(n_jobs=corenum)(
+                    delayed(read_d22_file)(filestr)
+                    for filestr in filelst)
+    time = np.concatenate([np.array([],dtype='object')]
+                          + [r[0] for r in results])
+    sensors = {}
+    for kind in d22_sensors:
+        for name in d22_sensors[kind]:
+            sensors[name] = {'name':name}
+            for var in d22_vars[kind]:
+                sensors[name][var] = np.concatenate([np.array([])]
+                                    + [r[1][name][var] for r in results])
+    return time, aggregate_d22(sensors)
+
+class d22_cache():
+    '''
+    class to handle the columnar cache of parsed d22 files of a
+    station, one directory per month in cachepath/<statname>/<YYYYMM>/:
+     - key.pkl (path, size and mtime of each source file and its
+                number of records)
+     - time.npy (seconds since basedate, memory-mapped when loaded)
+     - <sensor>_<var>.npy (values read from the d22 files,
+                           memory-mapped when loaded)
+    A month is renewed if its source files change e.g. opdata files
+    that are still written, only changed files are parsed again.
+    '''
+    d22cache_path = d22cache_path
+    basedate = datetime(1970,1,1)
+
+    def __init__(self,statname,cachepath=None):
+        if cachepath is None:
+            cachepath = self.d22cache_path
+        self.statname = statname
+        self.path = os.path.join(cachepath,statname)
+        self.columns = [(name,var) for kind in sorted(d22_sensors)
+                        for name in d22_sensors[kind]
+                        for var in sorted(d22_lines[kind])]
+
+    def read(self,sdate,edate,corenum=None):
+        '''
+        time and sensors as returned by read_d22
+        '''
+        from utils import num2datetime
+        first = datetime(sdate.year,sdate.month,sdate.day)
+        last = datetime(edate.year,edate.month,edate.day)
+        pieces = []
+        tmpdate = datetime(sdate.year,sdate.month,1)
+        while tmpdate <= last:
+            month = self.month(tmpdate,corenum=corenum)
+            days = [datetime.strptime(os.path.basename(key[0])[:8],
+                    '%Y%m%d') for key in month['key']['files']]
+            offsets = np.cumsum([0] + month['key']['nrec'])
+            sel = [i for i in range(len(days))
+                   if (days[i] >= first and days[i] <= last)]
+            if len(sel) > 0:
+                pieces.append((month,offsets[sel[0]],offsets[sel[-1]+1]))
+            tmpdate = tmpdate + relativedelta(months = +1)
+        def column(name):
+            # memory-mapped slice if only one month is used
+            parts = [month[name][start:stop]
+                     for month, start, stop in pieces]
+            if len(parts) == 1:
+                return parts[0]
+            return np.concatenate([np.array([])] + parts)
+        time = np.array(num2datetime(column('time'),self.basedate))
+        sensors = {}
+        for kind in d22_sensors:
+            for name in d22_sensors[kind]:
+                sensors[name] = {'name':name}
+                for var in d22_vars[kind]:
+                    if var in d22_lines[kind]:
+                        sensors[name][var] = column((name,var))
+                    else:
+                        sensors[name][var] = np.full(len(time),np.nan)
+        return time, aggregate_d22(sensors)
+
+    def month(self,date,corenum=None):
+        '''
+        cached columns of the month of date, renewed if the
+        source files changed
+        '''
+        from fieldmod import file_key
+        first = datetime(date.year,date.month,1)
+        last = first + relativedelta(months = +1) - timedelta(days=1)
+        filelst = d22_filelst(self.statname,first,last)
+        keys = [file_key(filestr) for filestr in filelst]
+        path = os.path.join(self.path,first.strftime('%Y%m'))
+        old = self._load(path)
+        if (old is None or old['key']['files'] != keys):
+            self._build(path,keys,old,corenum=corenum)
+            old = self._load(path)
+        return old
+
+    def _load(self,path):
+        '''
+        key and memory-mapped columns of a month or None
+        '''
+        if not os.path.isfile(os.path.join(path,'key.pkl')):
+            return None
+        with open(os.path.join(path,'key.pkl'),'rb') as f:
+            month = {'key':pickle.load(f)}
+        month['time'] = np.load(os.path.join(path,'time.npy'),
+                                mmap_mode='r')
+        for name, var in self.columns:
+            month[(name,var)] = np.load(os.path.join(path,
+                                        name + '_' + var + '.npy'),
+                                        mmap_mode='r')
+        return month
+
+    def _build(self,path,keys,old=None,corenum=None):
+        '''
+        parse new or changed files and write the month, records of
+        unchanged files are taken from the old cache. The directory
+        is renamed in place when complete.
+        '''
+        import tempfile, shutil
+        if corenum is None:
+            corenum = 1
+        print ("Update d22 cache for " + self.statname + " in: " + path)
+        # records of unchanged files
+        reuse = {}
+        if old is not None:
+            offsets = np.cumsum([0] + old['key']['nrec'])
+            for i, key in enumerate(old['key']['files']):
+                reuse[key] = (offsets[i],offsets[i+1])
+        missing = [key for key in keys if key not in reuse]
+        results = Parallel(n_jobs=corenum)(
+                        delayed(read_d22_file)(key[0])
+                        for key in missing)
+        parsed = dict(zip(missing,results))
+        columns = dict([(col,[]) for col in ['time'] + self.columns])
+        nrec = []
+        for key in keys:
+            if key in parsed:
+                time, sensors = parsed[key]
+                columns['time'].append(np.array(
+                        [(t - self.basedate).total_seconds() for t in time]))
+                for name, var in self.columns:
+                    columns[(name,var)].append(sensors[name][var])
+                nrec.append(len(time))
+            else:
+                start, stop = reuse[key]
+                for col in columns:
+                    columns[col].append(np.array(old[col][start:stop]))
+                nrec.append(int(stop-start))
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+        tmppath = tempfile.mkdtemp(dir=self.path)
+        for col in columns:
+            if col == 'time':
+                fname = 'time.npy'
+            else:
+                fname = col[0] + '_' + col[1] + '.npy'
+            np.save(os.path.join(tmppath,fname),
+                    np.concatenate([np.array([])] + columns[col]))
+        with open(os.path.join(tmppath,'key.pkl'),'wb') as f:
+            pickle.dump({'files':keys,'nrec':nrec},f,protocol=2)
+        if os.path.isdir(path):
+            shutil.rmtree(path,ignore_errors=True)
+        try:
+            os.rename(tmppath,path)
+        except OSError:
+            # other process was faster
+            shutil.rmtree(tmppath)
+
 def extract_d22(searchlines):
-    #Extract data of choice - reading searchlines
-    tseries=[]
-    for i, line in enumerate(searchlines):
-        if "!!!!" in line: 
-            tseriesl = []
-            for l in searchlines[i+3:i+5]:
-                tseriesl.append(l.strip())
-            tseries.append(' '.join(tseriesl))
-            date_object = datetime.strptime(' '.join(tseriesl),'%d-%m-%Y %H:%M')
-            dat['10min'].append(date_object)
-            #legger inn nan for alle variable
-            for WM in [WM1,WM2,WM3,WIA,WIB,WIC,WL1,WL2,WL3]:
-                for var in WM.keys():
-                    if var != 'name':
-                        WM[var].append(sp.nan)
-        for WM in [WM1,WM2,WM3]:  
-            if str(WM['name']) in line:
-                for l in searchlines[i+2:i+3]:
-                    WM['Hs_10min'][-1]=floater(l.strip())
-                for l in searchlines[i+4:i+5]:
-                    WM['Hmax_10min'][-1]=floater(l.strip())
-                for l in searchlines[i+5:i+6]:
-                    WM['Tp_10min'][-1]=floater(l.strip())  
-                for l in searchlines[i+11:i+12]:
-                    WM['Tm_10min'][-1]=floater(l.strip())
-        for WI in [WIA,WIB,WIC]:
-            if str(WI['name']) in line:
-                for l in searchlines[i+10:i+11]:
-                    WI['FF_10min'][-1]=floater(l.strip())
-                for l in searchlines[i+13:i+14]:
-                    WI['DD_10min'][-1]=floater(l.strip()) 
-        for WL in [WL1,WL2,WL3]:
-            if str(WL['name']) in line:
-                for l in searchlines[i+2:i+3]:
-                    WL['Hlat'][-1]=floater(l.strip())
-    # From here ....
-    N = len(dat['10min'])
-    #Convert data to arrays
-    dat['10min']=sp.array(dat['10min'])
-    for WM in [WM1,WM2,WM3,WIA,WIB,WIC,WL1,WL2,WL3]:
-        for var in WM.keys():
-            if var != 'name':
-                WM[var] = sp.array(WM[var])
-                #Set all negative values to nan
-                #WM[var][WM[var]<0] = sp.nan
-                #If variable does not exist
-                #if len(sp.array(WM[var]))==0:
-                #print len(dat['10min'])
-                if len(sp.array(WM[var]))!=N:
-                    WM[var] = np.empty(len(dat['10min']))
-                    WM[var][:] = sp.nan
-                    os.system("pause")  
-                #Create 1 hour averages
-                if var == 'Hs_10min':
-                    WINDOW = 3
-                    wmt = sp.power(WM[var],2)
-                    weights = sp.ones((WINDOW))/WINDOW
-                    wmt[2:-2:2] = np.convolve(wmt[0::2], weights,mode='valid')
-                    wmt[3:-2:2] = np.convolve(wmt[1::2], weights,mode='valid')
-                    wmt[[0,1,-2,-1]]= sp.nan
-                    WM['Hs_1hr'] = sp.sqrt(wmt)
-                if var == 'Tm_10min':
-                    WINDOW = 3
-                    wmt = sp.power(WM[var],2)
-                    weights = sp.ones((WINDOW))/WINDOW
-                    wmt[2:-2:2] = np.convolve(wmt[0::2], weights,mode='valid')
-                    wmt[3:-2:2] = np.convolve(wmt[1::2], weights,mode='valid')
-                    wmt[[0,1,-2,-1]]= sp.nan
-                    WM['Tm_1hr'] = sp.sqrt(wmt)
+    '''
+    returns WM, WI, WL -> dicts of sensors by name
+            dat -> time of the 10 min records
+    '''
+    time, sensors = tokenize_d22(searchlines)
+    sensors = aggregate_d22(sensors)
+    WM, WI, WL = [dict([(name,sensors[name]) for name in d22_sensors[kind]])
+                  for kind in ['WM','WI','WL']]
+    dat = {'10min':time,'1hr':[]}
     return WM, WI, WL, dat
 
-def matchtime(sdate,edate,time,basetime,timewin=None):
+def matchtime(sdate,edate,time,basetime,timewin=None,idxonly=None,
+    issorted=None):
     '''
     fct to obtain the index of the time step closest to the 
     requested time including the respective time stamp(s). 
     Similarily, indices are chosen for the time and defined region.
+    Sorted time steps are matched by binary search and only the 
+    matches are converted to datetime.
+    idxonly=True returns only the indices without datetime objects.
+    issorted=True skips the check whether time is sorted.
     '''
+    from utils import timewin_idx, num2datetime
     if timewin is None:
         timewin = 0
-    # create list of datetime instances
-    timelst=[]
-    ctime=[]
-    cidx=[]
-    idx=0
     print ('Time window is: ', timewin)
     if (edate is None or sdate==edate):
-        for element in time:
-            tmp=basetime + timedelta(seconds=element)
-            timelst.append(tmp)
-            # choose closest match within window of win[minutes]
-            if (tmp >= sdate-timedelta(minutes=timewin)
-            and tmp <= sdate+timedelta(minutes=timewin)):
-                ctime.append(tmp)
-                cidx.append(idx)
-            del tmp
-            idx=idx+1
-    if (edate is not None and edate!=sdate):
-        for element in time:
-            tmp=basetime + timedelta(seconds=element)
-            timelst.append(tmp)
-            if (tmp >= sdate-timedelta(minutes=timewin)
-            and tmp < edate+timedelta(minutes=timewin)):
-                ctime.append(tmp)
-                cidx.append(idx)
-            del tmp
-            idx=idx+1
-    return ctime, cidx
+        # choose closest match within window of win[minutes]
+        cidx = timewin_idx(time,sdate-timedelta(minutes=timewin),
+                            sdate+timedelta(minutes=timewin),basetime,
+                            right_closed=True,issorted=issorted)
+    else:
+        cidx = timewin_idx(time,sdate-timedelta(minutes=timewin),
+                            edate+timedelta(minutes=timewin),basetime,
+                            issorted=issorted)
+    if idxonly == True:
+        return cidx
+    ctime = num2datetime(np.asarray(time)[cidx],basetime)
+    return ctime, list(cidx)
 
 def get_loc_idx(init_lats,init_lons,target_lat,target_lon,mask=None):
-    from misc import haversine
-    distM = np.zeros(init_lats.shape)*np.nan
-    for i in range(init_lats.shape[0]):
-        for j in range(init_lats.shape[1]):
-            if mask is None:
-                distM[i,j] = haversine(init_lons[i,j],init_lats[i,j],
-                                    target_lon,target_lat)
-            else:
-                if isinstance(mask[i,j],(np.float32)):
-                    distM[i,j] = haversine(init_lons[i,j],init_lats[i,j],
-                                    target_lon,target_lat)
+    from utils import haversine
+    distM = haversine(init_lons,init_lats,target_lon,target_lat)
+    if mask is not None:
+        # only grid points with valid values
+        distM[np.ma.getmaskarray(mask)] = np.nan
     idx,idy = np.where(distM==np.nanmin(distM))
     return idx, idy, distM, init_lats[idx,idy], init_lons[idx,idy]
 
@@ -304,8 +552,9 @@ def get_model(model,fc_date,init_date=None,leadtime=None):
     if model ARCMFC you need fc_date, init_date
     if model mwam4 you need fc_date, leadtime
     """
-    from misc import haversine
     from model_specs import model_dict
+    from fieldmod import read_model_coords, read_model_time, \
+                         read_model_field
     print ("Get model data according to selected date ....")
     if init_date is None:
         print ("leadtime:",leadtime,"h")
@@ -332,22 +581,224 @@ def get_model(model,fc_date,init_date=None,leadtime=None):
                     + filedate.strftime(model_dict[model]['file_template']))
             del tmpdate
     print (filestr)
-    f = netCDF4.Dataset(filestr,'r')
-    model_lons = f.variables[model_dict[model]['lons']][:]
-    model_lats = f.variables[model_dict[model]['lats']][:]
-    model_time = f.variables[model_dict[model]['time']][:]
-    # Hs [time,lat,lon]
-    model_Hs = f.variables[model_dict[model]['Hs']][:].squeeze()
-    f.close()
+    model_lons, model_lats = read_model_coords(model,filestr)
+    model_time = read_model_time(model,filestr)
     model_basetime = model_dict[model]['basetime']
     model_time_dt=[]
     for element in model_time:
         model_time_dt.append(model_basetime
                     + timedelta(seconds=element))
     model_time_dt_valid = [model_time_dt[model_time_dt.index(fc_date)]]
-    model_hs_valid = model_Hs[model_time_dt.index(fc_date),:,:]
+    model_hs_valid = read_model_field(model,filestr,
+                                      model_time_dt.index(fc_date))
     return model_time_dt, model_hs_valid, model_lons, model_lats
 
+def station_coords(stations=None,model=None):
+    '''
+    names, lats, lons of the stations (dict name:[lat,lon]), default
+    are ARCMFClocations for ARCMFC models and locations otherwise
+    '''
+    if stations is None:
+        import stationlist
+        if (model is not None and model.startswith('ARCMFC')):
+            stations = stationlist.ARCMFClocations
+        else:
+            stations = stationlist.locations
+    names = sorted([name for name in stations.keys()
+                    if len(stations[name])==2])
+    lats = np.array([stations[name][0] for name in names],dtype='float64')
+    lons = np.array([stations[name][1] for name in names],dtype='float64')
+    return names, lats, lons
+
+# grid points of station sets already looked up in this process
+_station_idx_memo = {}
+
+def station_lookup(model,model_lons,model_lats,stations=None,knear=None):
+    '''
+    dict name:{'idx','dists','weights'} of the knear nearest grid
+    points of each station with inverse distance weights, from the
+    persisted station table of the grid index (see gridmod)
+    '''
+    from gridmod import get_grid_index
+    names, lats, lons = station_coords(stations=stations,model=model)
+    grid = get_grid_index(model,model_lons,model_lats)
+    table = grid.station_table(lats,lons,knear=knear)
+    return dict([(names[j],{'idx':table['idx'][j],
+                            'dists':table['dists'][j],
+                            'weights':table['weights'][j]})
+                 for j in range(len(names))])
+
+def station_grid_idx(model,model_lons,model_lats,lats,lons,mask=None,
+    knear=None):
+    '''
+    flat grid indices of the grid points closest to all stations
+    from the persisted station table of the model grid
+    mask -> model field, the closest unmasked grid point is chosen,
+            stations with only masked points among the knear
+            (default 8) nearest are searched again in the KD-tree
+    returns idx (model_lons.size if no valid point is found) and
+    dists in km
+    '''
+    import hashlib
+    from gridmod import get_grid_index
+    from utils import lonlat2xyz, chord2km
+    if knear is None:
+        knear = 8
+    grid = get_grid_index(model,model_lons,model_lats)
+    maskflat = None
+    mhash = None
+    if mask is not None:
+        maskflat = np.ma.getmaskarray(mask).ravel()
+        mhash = hashlib.sha1(maskflat.tobytes()).hexdigest()[:16]
+    key = (model,grid.hash,mhash,knear,
+           tuple(np.asarray(lats,dtype='float64')),
+           tuple(np.asarray(lons,dtype='float64')))
+    if key in _station_idx_memo:
+        return _station_idx_memo[key]
+    table = grid.station_table(lats,lons,knear=knear)
+    idx = np.full(len(table['idx']),grid.lons.size,dtype='int')
+    dists = np.full(len(table['idx']),np.inf)
+    todo = np.arange(len(idx))
+    cand = table['idx']
+    cdists = table['dists']
+    k = cand.shape[1]
+    tree = None
+    while True:
+        if maskflat is None:
+            valid = np.ones(cand.shape,dtype='bool')
+        else:
+            valid = ~maskflat[cand]
+        first = np.argmax(valid,axis=1)
+        rows = np.arange(len(todo))
+        found = valid[rows,first]
+        idx[todo[found]] = cand[rows,first][found]
+        dists[todo[found]] = cdists[rows,first][found]
+        todo = todo[~found]
+        if tree is None and len(todo)>0:
+            tree = grid.tree('Global')
+        if (len(todo)==0 or k >= tree.n):
+            break
+        # more neighbours for stations surrounded by masked points
+        k = min(2*k,tree.n)
+        chord, j = tree.query(lonlat2xyz(np.asarray(lons)[todo],
+                                         np.asarray(lats)[todo]),k=k)
+        cand = grid.ridx('Global')[j.reshape(len(todo),-1)]
+        cdists = chord2km(chord.reshape(len(todo),-1))
+    _station_idx_memo[key] = (idx,dists)
+    return idx, dists
+
+def match_station_time(time,target,timewin=None):
+    '''
+    index of the closest time step for each of the sorted numeric
+    target times, -1 if none is within timewin minutes
+    '''
+    if timewin is None:
+        timewin = 0
+    time = np.asarray(time)
+    target = np.asarray(target,dtype='float64')
+    if len(time)==0:
+        return np.full(len(target),-1,dtype='int')
+    right = np.clip(np.searchsorted(time,target),0,len(time)-1)
+    left = np.clip(right-1,0,len(time)-1)
+    closer = np.abs(time[left]-target) <= np.abs(time[right]-target)
+    idx = np.where(closer,left,right)
+    idx[np.abs(time[idx]-target) > timewin*60.] = -1
+    return idx
+
+def validate_stations(model,fc_dates,init_dates=None,stations=None,
+    timewin=None,knear=None):
+    """
+    validation of all stations in one pass, each model file is read
+    once for all its forecast dates and the model values of all
+    stations are extracted by one fancy index of the fields
+    fc_dates -> list of forecast dates
+    init_dates -> list of initialization dates, default fc_dates
+    stations -> dict name:[lat,lon], see station_coords
+    timewin -> tolerance in minutes for the closest observation
+    returns dict with names, fc_dates, model_Hs and obs_Hs
+    [fc_dates,stations], grid idx and dists, station_metrics,
+    pooled_metrics and errors
+    """
+    from model_specs import model_dict
+    from satmod import model_filestr
+    from fieldmod import read_model_coords, read_model_time, \
+                         read_model_fields
+    from utils import validation_stats
+    if init_dates is None:
+        init_dates = fc_dates
+    if timewin is None:
+        timewin = 0
+    names, lats, lons = station_coords(stations=stations,model=model)
+    basetime = model_dict[model]['basetime']
+    model_Hs = np.full((len(fc_dates),len(names)),np.nan)
+    obs_Hs = np.full((len(fc_dates),len(names)),np.nan)
+    idx, dists = None, None
+    errors = []
+    # group forecast dates by model file
+    files = OrderedDict()
+    for i in range(len(fc_dates)):
+        filestr = model_filestr(model,init_dates[i],fc_dates[i])
+        files.setdefault(filestr,[]).append(i)
+    for filestr in files.keys():
+        try:
+            model_lons, model_lats = read_model_coords(model,filestr)
+            model_time = read_model_time(model,filestr)
+        except IOError as e:
+            errors.append((filestr,str(e)))
+            continue
+        rows, tidx = [], []
+        for i in files[filestr]:
+            t = (fc_dates[i] - basetime).total_seconds()
+            hit = np.flatnonzero(np.ma.getdata(model_time)==t)
+            if len(hit)==0:
+                errors.append((filestr,'no time step ' + str(fc_dates[i])))
+                continue
+            rows.append(i)
+            tidx.append(hit[0])
+        if len(rows)==0:
+            continue
+        fields = read_model_fields(model,filestr,tidx)
+        idx, dists = station_grid_idx(model,model_lons,model_lats,
+                                      lats,lons,mask=fields[0],
+                                      knear=knear)
+        found = idx < model_lons.size
+        vals = fields.reshape(len(tidx),-1)[:,idx[found]]
+        model_Hs[np.ix_(rows,np.flatnonzero(found))] = \
+                                        np.ma.filled(vals,np.nan)
+    # observations of each station for the whole period
+    fc_time = np.array([(d - basetime).total_seconds() for d in fc_dates])
+    order = np.argsort(fc_time)
+    sdate = min(fc_dates) - timedelta(minutes=timewin)
+    edate = max(fc_dates) + timedelta(minutes=timewin)
+    for j in range(len(names)):
+        try:
+            time, hs, hs_obs = read_station(names[j],sdate,edate,
+                                            basedate=basetime,
+                                            skipmissing=True)
+        except IOError as e:
+            errors.append((names[j],str(e)))
+            continue
+        if len(hs_obs)==0:
+            errors.append((names[j],'no station files'))
+            continue
+        tidx = match_station_time(time,fc_time[order],timewin=timewin)
+        obs_Hs[order[tidx>=0],j] = hs[tidx[tidx>=0]]
+    # metrics
+    station_stats = [validation_stats(dtype='float64').update(
+                        model_Hs[:,j],obs_Hs[:,j])
+                     for j in range(len(names))]
+    pooled = validation_stats(dtype='float64')
+    for stats in station_stats:
+        pooled.merge(stats)
+    station_metrics = dict([(names[j],station_stats[j].metrics())
+                            for j in range(len(names))])
+    return {'names':names,'fc_dates':fc_dates,
+            'model_Hs':model_Hs,'obs_Hs':obs_Hs,
+            'idx':idx,'dists':dists,
+            'station_metrics':station_metrics,
+            'pooled_metrics':pooled.metrics(),
+            'errors':errors}
+
 def dumptonc(time,model,obs,outpath,filename):
     """
     create a simple netcdf
@@ -0,0 +1,78 @@
+"""
+checks of the buffered collocation writer of custom_nc
+"""
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from datetime import datetime, timedelta
+
+sys.path.insert(0,os.path.join(os.path.dirname(
+                    os.path.abspath(__file__)),'..'))
+
+import netCDF4
+from custom_nc import ts_writer
+
+class test_ts_writer(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.basetime = datetime(2000,1,1)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def results_dict(self,n,seed):
+        rs = np.random.RandomState(seed)
+        model_Hs = rs.uniform(0,10,n)
+        model_Hs[rs.rand(n)<0.1] = np.nan
+        return {'date_matches':[datetime(2018,8,1)
+                                + timedelta(seconds=int(s))
+                                for s in np.sort(rs.randint(0,86400,n))],
+                'model_lats_matches':rs.uniform(60,80,n),
+                'model_lons_matches':rs.uniform(-20,40,n),
+                'model_Hs_matches':model_Hs,
+                'sat_lats_matches':rs.uniform(60,80,n),
+                'sat_lons_matches':rs.uniform(-20,40,n),
+                'sat_Hs_matches':rs.uniform(0,10,n),
+                # beyond the range of int16 with scale_factor 0.01
+                'dist_matches':rs.uniform(0,1000,n)}
+
+    def test_packed(self):
+        fullpath = os.path.join(self.tmpdir,'ts.nc')
+        dicts = [self.results_dict(n,n) for n in [5,300,0,40]]
+        # flushed several times and on close
+        writer = ts_writer(fullpath,'test',self.basetime,packed=True,
+                           chunksize=16,flushsize=64)
+        for results_dict in dicts:
+            writer.append(results_dict)
+        writer.close()
+        nc = netCDF4.Dataset(fullpath)
+        self.assertEqual(nc.variables['dists'].dtype,np.float32)
+        np.testing.assert_allclose(nc.variables['dists'][:],
+                np.concatenate([d['dist_matches'] for d in dicts]),
+                rtol=1e-6)
+        mHs = nc.variables['mHs'][:]
+        ref = np.concatenate([d['model_Hs_matches'] for d in dicts])
+        np.testing.assert_array_equal(np.ma.getmaskarray(mHs),
+                                      np.isnan(ref))
+        np.testing.assert_allclose(mHs.compressed(),ref[~np.isnan(ref)],
+                                   atol=0.0005)
+        np.testing.assert_allclose(nc.variables['time'][:],
+                [(t-self.basetime).total_seconds()
+                 for d in dicts for t in d['date_matches']])
+        nc.close()
+
+    def test_range(self):
+        fullpath = os.path.join(self.tmpdir,'ts.nc')
+        results_dict = self.results_dict(10,1)
+        results_dict['sat_Hs_matches'][3] = 40.
+        writer = ts_writer(fullpath,'test',self.basetime,packed=True)
+        writer.append(results_dict)
+        self.assertRaises(ValueError,writer.flush)
+        writer.nc.close()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,135 @@
+"""
+checks of the reading and the LRU cache of model fields in fieldmod
+on a synthetic model file
+"""
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+import numpy as np
+
+sys.path.insert(0,os.path.join(os.path.dirname(
+                    os.path.abspath(__file__)),'..'))
+
+import netCDF4
+import fieldmod
+from fieldmod import field_cache, get_fields, read_model_fields, \
+                     cache_info, set_cache_size
+
+class recording_netCDF4():
+    '''
+    netCDF4 for fieldmod that records the slices read of the
+    model variables
+    '''
+    def __init__(self):
+        self.slices = []
+
+    def Dataset(self,filestr,mode='r'):
+        return recording_dataset(netCDF4.Dataset(filestr,mode),self.slices)
+
+class recording_dataset():
+
+    def __init__(self,nc,slices):
+        self.nc = nc
+        self.variables = dict([(name,recording_variable(var,slices))
+                               for name, var in nc.variables.items()])
+
+    def close(self):
+        self.nc.close()
+
+class recording_variable():
+
+    def __init__(self,var,slices):
+        self.var = var
+        self.slices = slices
+
+    def __getitem__(self,key):
+        self.slices.append(key)
+        return self.var[key]
+
+class test_get_fields(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filestr = os.path.join(self.tmpdir,'model.nc')
+        rs = np.random.RandomState(8)
+        self.Hs = rs.uniform(0,8,(48,12,15))
+        nc = netCDF4.Dataset(self.filestr,'w')
+        nc.createDimension('time',None)
+        nc.createDimension('rlat',12)
+        nc.createDimension('rlon',15)
+        nc.createVariable('VHM0','f8',('time','rlat','rlon'))[:] = self.Hs
+        nc.close()
+        self.cache = fieldmod.cache
+        fieldmod.cache = field_cache()
+        self.netCDF4 = fieldmod.netCDF4
+        fieldmod.netCDF4 = recording_netCDF4()
+
+    def tearDown(self):
+        fieldmod.cache = self.cache
+        fieldmod.netCDF4 = self.netCDF4
+        shutil.rmtree(self.tmpdir)
+
+    def test_sparse(self):
+        tidx = [40,3,4,5,17,3]
+        fields = read_model_fields('ARCMFC',self.filestr,tidx)
+        np.testing.assert_array_equal(fields,self.Hs[tidx])
+        # one hyperslab for each run of consecutive time steps
+        self.assertEqual(fieldmod.netCDF4.slices,
+                         [slice(3,6),slice(17,18),slice(40,41)])
+        del fieldmod.netCDF4.slices[:]
+        # only time steps not cached are read
+        fields = read_model_fields('ARCMFC',self.filestr,[4,6,7,40])
+        np.testing.assert_array_equal(fields,self.Hs[[4,6,7,40]])
+        self.assertEqual(fieldmod.netCDF4.slices,[slice(6,8)])
+
+    def test_cache_info(self):
+        fields = get_fields('ARCMFC',self.filestr,[0,1])
+        info = cache_info()
+        self.assertEqual((info['hits'],info['misses']),(0,2))
+        self.assertEqual(info['entries'],2)
+        self.assertEqual(info['nbytes'],fieldmod.nbytes(fields))
+        get_fields('ARCMFC',self.filestr,[1,0,2])
+        info = cache_info()
+        self.assertEqual((info['hits'],info['misses']),(2,3))
+        # cached fields are shared and read-only
+        field = get_fields('ARCMFC',self.filestr,[2])[0]
+        self.assertTrue(field is get_fields('ARCMFC',self.filestr,[2])[0])
+        self.assertFalse(field.flags.writeable)
+
+    def test_eviction(self):
+        # budget of three fields
+        size = fieldmod.nbytes(get_fields('ARCMFC',self.filestr,[0]))
+        set_cache_size(3*size)
+        get_fields('ARCMFC',self.filestr,[0,1,2])
+        # 0 is used again, 1 is the least recently used
+        get_fields('ARCMFC',self.filestr,[0])
+        get_fields('ARCMFC',self.filestr,[3])
+        key = fieldmod.file_key(self.filestr)
+        self.assertEqual([i for i in range(4)
+                          if ('Hs',i) + key in fieldmod.cache],[0,2,3])
+        self.assertEqual(cache_info()['nbytes'],3*size)
+        del fieldmod.netCDF4.slices[:]
+        np.testing.assert_array_equal(
+                read_model_fields('ARCMFC',self.filestr,[1]),self.Hs[[1]])
+        self.assertEqual(fieldmod.netCDF4.slices,[slice(1,2)])
+        # the newest entry is kept even if it exceeds the budget
+        set_cache_size(1)
+        self.assertEqual(cache_info()['entries'],1)
+        self.assertTrue(('Hs',1) + key in fieldmod.cache)
+
+    def test_changed_file(self):
+        get_fields('ARCMFC',self.filestr,[0])
+        # new version of the file with another size
+        nc = self.netCDF4.Dataset(self.filestr,'a')
+        nc.variables['VHM0'][48] = self.Hs[0] + 1.
+        nc.close()
+        del fieldmod.netCDF4.slices[:]
+        fields = read_model_fields('ARCMFC',self.filestr,[0,48])
+        np.testing.assert_array_equal(fields[0],self.Hs[0])
+        np.testing.assert_array_equal(fields[1],self.Hs[0] + 1.)
+        self.assertEqual(fieldmod.netCDF4.slices,[slice(0,1),slice(48,49)])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,241 @@
+"""
+checks of the persistent grid index of gridmod on synthetic grids
+"""
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+import numpy as np
+
+sys.path.insert(0,os.path.join(os.path.dirname(
+                    os.path.abspath(__file__)),'..'))
+
+import gridmod
+from gridmod import grid_index
+
+def build_index(args):
+    """
+    index of the same grid in another process
+    """
+    cachepath, lons, lats = args
+    grid = grid_index('test_grid',lons,lats,cachepath=cachepath)
+    return grid.path, grid.ridx('ARCMFC').tolist()
+
+class test_grid_index(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.lons, self.lats = np.meshgrid(np.linspace(-30,60,91),
+                                           np.linspace(50,85,36))
+        rs = np.random.RandomState(11)
+        self.qlons = rs.uniform(-30,60,50)
+        self.qlats = rs.uniform(50,85,50)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def query(self,grid):
+        from utils import query_tree
+        return query_tree(grid.tree('ARCMFC'),self.qlons,self.qlats)
+
+    def test_reload(self):
+        grid = grid_index('test_grid',self.lons,self.lats,
+                          cachepath=self.tmpdir)
+        dists, idx = self.query(grid)
+        table = grid.station_table(self.qlats[:5],self.qlons[:5])
+        # files of the index
+        from scipy import __version__ as scipy_version
+        files = os.listdir(grid.path)
+        self.assertTrue(any(f.startswith('tree_ARCMFC_')
+                            and f.endswith('_scipy' + scipy_version
+                                           + '.pkl') for f in files))
+        reloaded = grid_index('test_grid',self.lons,self.lats,
+                              cachepath=self.tmpdir)
+        self.assertEqual(reloaded.path,grid.path)
+        np.testing.assert_array_equal(reloaded.lons,self.lons.ravel())
+        np.testing.assert_array_equal(reloaded.lats,self.lats.ravel())
+        np.testing.assert_array_equal(reloaded.mask('ARCMFC'),
+                gridmod.region_mask(self.lats,self.lons,
+                                    'ARCMFC').ravel())
+        dists2, idx2 = self.query(reloaded)
+        np.testing.assert_array_equal(idx2,idx)
+        np.testing.assert_array_equal(dists2,dists)
+        table2 = reloaded.station_table(self.qlats[:5],self.qlons[:5])
+        for key in table.keys():
+            np.testing.assert_array_equal(table2[key],table[key])
+
+    def test_unreadable_tree(self):
+        grid = grid_index('test_grid',self.lons,self.lats,
+                          cachepath=self.tmpdir)
+        dists, idx = self.query(grid)
+        # e.g. pickled with another scipy version
+        fname = os.path.join(grid.path,grid._fname('tree','ARCMFC'))
+        with open(fname,'wb') as f:
+            f.write(b'not a pickle')
+        reloaded = grid_index('test_grid',self.lons,self.lats,
+                              cachepath=self.tmpdir)
+        dists2, idx2 = self.query(reloaded)
+        np.testing.assert_array_equal(idx2,idx)
+        # rebuilt tree is stored again
+        self.assertTrue(reloaded._load(fname) is not None)
+
+    def test_unwritable_cache(self):
+        # cache directory below a file cannot be created
+        blocker = os.path.join(self.tmpdir,'file')
+        open(blocker,'w').close()
+        grid = grid_index('test_grid',self.lons,self.lats,
+                          cachepath=os.path.join(blocker,'cache'))
+        self.assertTrue(grid.path is None)
+        ref = grid_index('test_grid',self.lons,self.lats,
+                         cachepath=self.tmpdir)
+        np.testing.assert_array_equal(grid.ridx('ARCMFC'),
+                                      ref.ridx('ARCMFC'))
+        np.testing.assert_array_equal(self.query(grid)[1],
+                                      self.query(ref)[1])
+        table = grid.station_table(self.qlats[:5],self.qlons[:5])
+        np.testing.assert_array_equal(table['idx'],
+                ref.station_table(self.qlats[:5],self.qlons[:5])['idx'])
+
+    def loc_idx(self,lats,lons):
+        """
+        flat index and distance of the nearest grid point of each
+        station by get_loc_idx
+        """
+        from stationmod import get_loc_idx
+        idx, dists = [], []
+        for lat, lon in zip(lats,lons):
+            i, j, distM, glats, glons = get_loc_idx(self.lats,self.lons,
+                                                    lat,lon)
+            idx.append(i[0]*self.lons.shape[1] + j[0])
+            dists.append(distM[i[0],j[0]])
+        return np.array(idx), np.array(dists)
+
+    def test_station_table(self):
+        grid = grid_index('test_grid',self.lons,self.lats,
+                          cachepath=self.tmpdir)
+        # one station on a grid point
+        lats = np.append(self.qlats[:10],self.lats[3,7])
+        lons = np.append(self.qlons[:10],self.lons[3,7])
+        table = grid.station_table(lats,lons)
+        self.assertEqual(table['idx'].shape,(11,8))
+        idx, dists = self.loc_idx(lats,lons)
+        np.testing.assert_array_equal(table['idx'][:,0],idx)
+        np.testing.assert_allclose(table['dists'][:,0],dists,atol=1e-6)
+        np.testing.assert_allclose(np.sum(table['weights'],axis=1),1.)
+        np.testing.assert_array_equal(table['weights'][-1],
+                                      [1.] + [0.]*7)
+
+    def test_changed_stations(self):
+        grid = grid_index('test_grid',self.lons,self.lats,
+                          cachepath=self.tmpdir)
+        lats, lons = self.qlats[:10].copy(), self.qlons[:10].copy()
+        table = grid.station_table(lats,lons)
+        # a station moved and a new station
+        lats[4], lons[4] = self.qlats[20], self.qlons[20]
+        lats, lons = np.append(lats,self.qlats[21]), \
+                     np.append(lons,self.qlons[21])
+        reloaded = grid_index('test_grid',self.lons,self.lats,
+                              cachepath=self.tmpdir)
+        changed = reloaded.station_table(lats,lons)
+        idx, dists = self.loc_idx(lats,lons)
+        np.testing.assert_array_equal(changed['idx'][:,0],idx)
+        self.assertNotEqual(changed['idx'][4,0],table['idx'][4,0])
+        self.assertEqual(len([f for f in os.listdir(grid.path)
+                              if f.startswith('stations_')]),2)
+        # the table of the old list is still valid
+        np.testing.assert_array_equal(
+                reloaded.station_table(self.qlats[:10],
+                                       self.qlons[:10])['idx'],
+                table['idx'])
+
+    def test_concurrent_build(self):
+        import multiprocessing as mp
+        pool = mp.Pool(processes=4)
+        results = pool.map(build_index,
+                           [(self.tmpdir,self.lons,self.lats)]*8)
+        pool.close()
+        pool.join()
+        # one complete index, temporary directories are removed
+        self.assertEqual(os.listdir(self.tmpdir),
+                         [os.path.basename(results[0][0])])
+        ref = gridmod.region_mask(self.lats,self.lons,'ARCMFC').ravel()
+        for path, ridx in results:
+            self.assertEqual(path,results[0][0])
+            self.assertEqual(ridx,np.flatnonzero(ref).tolist())
+        # a build that loses the rename leaves the index unchanged
+        grid = grid_index('test_grid',self.lons,self.lats,
+                          cachepath=self.tmpdir)
+        grid.build(self.lons,self.lats)
+        self.assertEqual(os.listdir(self.tmpdir),
+                         [os.path.basename(grid.path)])
+        np.testing.assert_array_equal(grid.ridx('ARCMFC'),
+                                      np.flatnonzero(ref))
+
+class test_polygon(unittest.TestCase):
+
+    box = [(0.,0.),(10.,0.),(10.,10.),(0.,10.)]
+
+    def test_box(self):
+        from gridmod import points_in_polygon
+        lons = np.array([5.,15.,5.,-0.1])
+        lats = np.array([5.,5.,-1.,5.])
+        np.testing.assert_array_equal(points_in_polygon(lons,lats,self.box),
+                                      [True,False,False,False])
+
+    def test_edges(self):
+        from gridmod import points_in_polygon
+        # west and south edges inside, east and north edges outside
+        lons = np.array([0.,5.,10.,5.,0.,10.,10.,0.])
+        lats = np.array([5.,0.,5.,10.,0.,0.,10.,10.])
+        np.testing.assert_array_equal(points_in_polygon(lons,lats,self.box),
+                        [True,True,False,False,True,False,False,False])
+        # the same points with the region mask
+        np.testing.assert_array_equal(
+                gridmod.region_mask(lats,lons,{'polygon':self.box}),
+                points_in_polygon(lons,lats,self.box))
+
+    def test_concave(self):
+        from gridmod import points_in_polygon
+        # L-shape, the upper right quarter is outside
+        polygon = [(0.,0.),(10.,0.),(10.,5.),(5.,5.),(5.,10.),(0.,10.)]
+        lons = np.array([2.,8.,2.,8.])
+        lats = np.array([2.,2.,8.,8.])
+        np.testing.assert_array_equal(points_in_polygon(lons,lats,polygon),
+                                      [True,True,True,False])
+
+    def test_dateline(self):
+        from gridmod import points_in_polygon
+        lons = np.array([175.,-175.,180.,-180.,0.,165.,-165.,-170.,170.])
+        lats = np.array([65.,65.,65.,65.,65.,65.,65.,65.,65.])
+        ref = [True,True,True,True,False,False,False,False,True]
+        for polygon in [[(170.,60.),(-170.,60.),(-170.,70.),(170.,70.)],
+                        [(170.,60.),(190.,60.),(190.,70.),(170.,70.)],
+                        [(-190.,60.),(-170.,60.),(-170.,70.),(-190.,70.)]]:
+            np.testing.assert_array_equal(
+                    points_in_polygon(lons,lats,polygon),ref)
+            np.testing.assert_array_equal(
+                    gridmod.region_mask(lats,lons,{'polygon':polygon}),ref)
+        # grid of -180 to 180 degrees
+        glons, glats = np.meshgrid(np.arange(-180.,180.,2.5),
+                                   np.arange(50.,80.,2.5))
+        mask = gridmod.region_mask(glats,glons,{'polygon':
+                    [(170.,60.),(-170.,60.),(-170.,70.),(170.,70.)]})
+        self.assertEqual(mask.shape,glons.shape)
+        np.testing.assert_array_equal(mask,(glats >= 60.) & (glats < 70.)
+                        & ((glons >= 170.) | (glons < -170.)))
+
+    def test_prefilter(self):
+        from gridmod import points_in_polygon
+        rs = np.random.RandomState(12)
+        lons = rs.uniform(-180,180,2000)
+        lats = rs.uniform(-90,90,2000)
+        polygon = [(-20.,40.),(30.,35.),(45.,60.),(10.,75.),(0.,55.),
+                   (-25.,70.)]
+        mask = gridmod.region_mask(lats,lons,{'polygon':polygon})
+        self.assertTrue(np.sum(mask) > 0)
+        np.testing.assert_array_equal(mask,
+                                      points_in_polygon(lons,lats,polygon))
+
+if __name__ == "__main__":
+    unittest.main()
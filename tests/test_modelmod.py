@@ -0,0 +1,63 @@
+"""
+checks of the collocation of modelmod on synthetic data
+"""
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from datetime import datetime, timedelta
+
+sys.path.insert(0,os.path.join(os.path.dirname(
+                    os.path.abspath(__file__)),'..'))
+
+import gridmod
+from satmod import sentinel_altimeter
+from modelmod import colocate
+
+class test_colocate(unittest.TestCase):
+
+    def setUp(self):
+        self.gridcache_path = gridmod.grid_index.gridcache_path
+        self.tmpdir = tempfile.mkdtemp()
+        gridmod.grid_index.gridcache_path = self.tmpdir
+
+    def tearDown(self):
+        gridmod.grid_index.gridcache_path = self.gridcache_path
+        gridmod._grid_memo.clear()
+        shutil.rmtree(self.tmpdir)
+
+    def test_masked_cells(self):
+        # grid of 0.1 degree, one masked and one negative (land) cell
+        lons, lats = np.meshgrid(np.arange(10.,10.5,0.1),
+                                 np.arange(70.,70.5,0.1))
+        Hs = np.ma.array(np.arange(25.).reshape(1,5,5)/10. + 1.)
+        Hs[0,1,1] = np.ma.masked
+        Hs[0,3,3] = -999.
+        fc_date = datetime(2018,8,1,12)
+        basetime = datetime(2000,1,1)
+        # footprints next to the masked, the negative and a valid cell
+        # and one beyond distlim
+        sat_lats = np.array([70.101,70.299,70.2,71.])
+        sat_lons = np.array([10.101,10.301,10.4,10.])
+        time = (np.array([-60.,0.,60.,120.])
+                + (fc_date-basetime).total_seconds())
+        Hs_sat = np.array([1.,2.,3.,4.])
+        sa_obj = sentinel_altimeter(fc_date-timedelta(hours=1),
+                    edate=fc_date+timedelta(hours=1),timewin=30,
+                    region='Global',
+                    cols=(sat_lats,sat_lons,time,Hs_sat,[4.],Hs_sat))
+        results_dict = colocate('test_colocate',Hs,lats,lons,[fc_date],
+                                sa_obj,fc_date)
+        # as in the original loop only the valid cell is matched
+        np.testing.assert_array_equal(results_dict['sat_Hs_matches'],[3.])
+        np.testing.assert_allclose(results_dict['model_Hs_matches'],
+                                   [Hs[0,2,4]])
+        np.testing.assert_allclose(results_dict['model_lats_matches'],
+                                   [lats[2,4]])
+        np.testing.assert_allclose(results_dict['model_lons_matches'],
+                                   [lons[2,4]])
+
+if __name__ == "__main__":
+    unittest.main()
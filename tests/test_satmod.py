@@ -0,0 +1,718 @@
+"""
+checks of the collocation and streaming of satmod against the
+per-footprint loop and a single read, on synthetic data
+"""
+import os
+import sys
+import unittest
+import numpy as np
+from datetime import datetime, timedelta
+
+sys.path.insert(0,os.path.join(os.path.dirname(
+                    os.path.abspath(__file__)),'..'))
+
+from utils import haversine
+from satmod import collocate, validate
+
+def collocate_loop(sat_time_dt,sat_rlats,sat_rlons,sat_rHs,
+    model_rlats,model_rlons,model_rHs,valid_date,timewin,distlim):
+    """
+    nearest grid point of each footprint by brute force as in the
+    original loop, masked grid points are matched with nan
+    """
+    model_rHs = np.ma.filled(np.ma.array(model_rHs,dtype='float64'),
+                             np.nan)
+    matches = []
+    for j in range(len(sat_time_dt)):
+        if (sat_time_dt[j] >= valid_date - timedelta(minutes=timewin)
+        and sat_time_dt[j] <= valid_date + timedelta(minutes=timewin)):
+            dists = haversine(sat_rlons[j],sat_rlats[j],
+                              model_rlons,model_rlats)
+            i = np.argmin(dists)
+            if dists[i] <= distlim:
+                matches.append((j,i,dists[i]))
+    return matches
+
+def write_arcmfc(path,day,lons,lats,rs):
+    """
+    ARCMFC model file of day initialized at day with hourly Hs,
+    negative values are masked
+    """
+    import netCDF4
+    nc = netCDF4.Dataset(path + day.strftime(
+                '/%Y%m%d_MyWaveWam8r625_b%Y%m%d.nc'),'w')
+    nc.createDimension('time',None)
+    nc.createDimension('rlat',lons.shape[0])
+    nc.createDimension('rlon',lons.shape[1])
+    nc.createVariable('time','f8',('time',))[:] = \
+        (day - datetime(1970,1,1)).total_seconds() + 3600.*np.arange(24)
+    nc.createVariable('lon','f4',('rlat','rlon'))[:] = lons
+    nc.createVariable('lat','f4',('rlat','rlon'))[:] = lats
+    nc.createVariable('VHM0','f4',('time','rlat','rlon'),
+                      fill_value=-999.)[:] = np.ma.masked_less(
+                      rs.uniform(-1,8,(24,)+lons.shape),0)
+    nc.close()
+
+class test_collocate(unittest.TestCase):
+
+    def setUp(self):
+        rs = np.random.RandomState(1)
+        lons, lats = np.meshgrid(np.linspace(10,12,41),
+                                 np.linspace(70,71,21))
+        self.model_rlats = lats.ravel()
+        self.model_rlons = lons.ravel()
+        Hs = rs.uniform(0.5,5,lats.size)
+        # land points
+        mask = rs.rand(lats.size) < 0.2
+        self.model_rHs = np.ma.array(Hs,mask=mask)
+        n = 500
+        self.valid_date = datetime(2018,8,1,12)
+        self.sat_time_dt = [self.valid_date + timedelta(seconds=s)
+                            for s in np.sort(rs.uniform(-3600,3600,n))]
+        self.sat_rlats = rs.uniform(69.9,71.1,n)
+        self.sat_rlons = rs.uniform(9.8,12.2,n)
+        self.sat_rHs = rs.uniform(0.5,5,n)
+
+    def run_collocate(self,skipmasked=None):
+        return collocate(self.sat_time_dt,self.sat_rlats,self.sat_rlons,
+                         self.sat_rHs,self.model_rlats,self.model_rlons,
+                         self.model_rHs,[self.valid_date],
+                         timewin=30,distlim=6,skipmasked=skipmasked)
+
+    def test_loop(self):
+        results_dict = self.run_collocate()
+        matches = collocate_loop(self.sat_time_dt,self.sat_rlats,
+                        self.sat_rlons,self.sat_rHs,self.model_rlats,
+                        self.model_rlons,self.model_rHs,self.valid_date,
+                        30,6)
+        sidx = np.array([m[0] for m in matches])
+        midx = np.array([m[1] for m in matches])
+        model_Hs = np.ma.filled(self.model_rHs,np.nan)[midx]
+        # masked grid points are among the matches
+        self.assertTrue(np.any(np.isnan(model_Hs)))
+        self.assertEqual(len(results_dict['sat_Hs_matches']),len(sidx))
+        np.testing.assert_array_equal(results_dict['sat_Hs_matches'],
+                                      self.sat_rHs[sidx])
+        np.testing.assert_array_equal(results_dict['date_matches'],
+                                      np.array(self.sat_time_dt)[sidx])
+        np.testing.assert_array_equal(results_dict['model_Hs_matches'],
+                                      model_Hs)
+        np.testing.assert_array_equal(results_dict['model_lats_matches'],
+                                      self.model_rlats[midx])
+        np.testing.assert_array_equal(results_dict['model_lons_matches'],
+                                      self.model_rlons[midx])
+        np.testing.assert_allclose(results_dict['dist_matches'],
+                                   [m[2] for m in matches],rtol=1e-6)
+
+    def test_skipmasked(self):
+        results_dict = self.run_collocate()
+        skipped = self.run_collocate(skipmasked=True)
+        valid = ~np.isnan(results_dict['model_Hs_matches'])
+        for key in ['sat_Hs_matches','model_Hs_matches','dist_matches']:
+            np.testing.assert_array_equal(skipped[key],
+                                          results_dict[key][valid])
+
+class test_validate(unittest.TestCase):
+
+    def test_masked_matches(self):
+        # nan model Hs of masked grid points
+        model_Hs = np.array([1.,np.nan,2.,3.,np.nan,1.5])
+        sat_Hs = np.array([1.2,0.5,1.8,3.3,4.,1.4])
+        valid = ~np.isnan(model_Hs)
+        valid_dict = validate({'date_matches':np.arange(6),
+                               'model_Hs_matches':model_Hs,
+                               'sat_Hs_matches':sat_Hs})
+        # as for the monthly ARCMFC product
+        self.assertEqual(valid_dict['nov'],6)
+        self.assertAlmostEqual(valid_dict['mor'],np.mean(sat_Hs))
+        self.assertAlmostEqual(valid_dict['mop'],np.mean(model_Hs[valid]))
+        diff = model_Hs[valid]-sat_Hs[valid]
+        self.assertAlmostEqual(valid_dict['msd'],np.mean(diff**2))
+        self.assertAlmostEqual(valid_dict['bias'],np.mean(diff))
+
+    def test_original(self):
+        # same matches as input, the formulas of the original validate
+        # with pairs containing nan marginalized
+        rs = np.random.RandomState(3)
+        model_Hs = rs.uniform(0.5,6,200)
+        model_Hs[rs.rand(200)<0.15] = np.nan
+        sat_Hs = model_Hs + rs.normal(0.1,0.4,200)
+        sat_Hs[np.isnan(sat_Hs)] = rs.uniform(0.5,6,np.isnan(sat_Hs).sum())
+        valid_dict = validate({'date_matches':np.arange(200),
+                               'model_Hs_matches':model_Hs,
+                               'sat_Hs_matches':sat_Hs})
+        idx = np.array(range(len(sat_Hs)))[~np.isnan(model_Hs + sat_Hs)]
+        a1, b1 = model_Hs[idx], sat_Hs[idx]
+        n = len(a1)
+        msd = ((a1-b1)**2).sum()/n
+        ref = {'mop':np.nanmean(model_Hs),
+               'mor':np.nanmean(sat_Hs),
+               'msd':msd,
+               'rmsd':np.sqrt(msd),
+               'nov':len(sat_Hs),
+               'mad':np.sum(np.abs(a1-b1))/n,
+               'corr':np.corrcoef(a1,b1)[1,0],
+               'bias':np.sum(a1-b1)/n}
+        for key in ref.keys():
+            self.assertAlmostEqual(valid_dict[key],ref[key],places=12)
+
+class test_read_localfiles(unittest.TestCase):
+
+    def setUp(self):
+        import tempfile
+        import netCDF4
+        self.tmpdir = tempfile.mkdtemp()
+        rs = np.random.RandomState(13)
+        start = (datetime(2018,8,1) - datetime(2000,1,1)).total_seconds()
+        self.pathlst = []
+        self.data = []
+        # overlapping files of one hour, listed in reverse time order
+        for i in range(6)[::-1]:
+            path = os.path.join(self.tmpdir,'file' + str(i) + '.nc')
+            n = 0 if i == 4 else 200
+            time = start + 3000.*i + np.sort(rs.uniform(0,3600,n))
+            if i == 2:
+                # footprints also in file 3
+                time[:20] = self.data[-1][0][-20:]
+            lats = rs.uniform(-80,85,n)
+            lons = rs.uniform(0,360,n)
+            Hs = rs.uniform(0,6,n)
+            Hs[rs.rand(n)<0.05] = -9999.
+            nc = netCDF4.Dataset(path,'w')
+            nc.createDimension('time',None)
+            nc.createVariable('time','f8',('time',))[:] = time
+            nc.createVariable('latitude','f4',('time',))[:] = lats
+            nc.createVariable('longitude','f4',('time',))[:] = lons
+            nc.createVariable('VAVH','f4',('time',),
+                              fill_value=-9999.)[:] = Hs
+            nc.close()
+            self.pathlst.append(path)
+            self.data.append((time,lats,lons,Hs))
+        # corrupt file between the others
+        self.corrupt = os.path.join(self.tmpdir,'corrupt.nc')
+        with open(self.corrupt,'w') as f:
+            f.write('not netcdf')
+        self.pathlst.insert(2,self.corrupt)
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.tmpdir)
+
+    def test_parallel(self):
+        from satmod import read_localfiles
+        from utils import runmean
+        # single file read in order
+        time, lats, lons, Hs = [np.concatenate([np.asarray(d[i],
+                    dtype='float32').astype('float64') if i > 0 else d[i]
+                    for d in self.data]) for i in range(4)]
+        Hs[Hs==-9999.] = np.nan
+        time, first = np.unique(time,return_index=True)
+        lats, lons, Hs = lats[first], lons[first], Hs[first]
+        lons = ((lons - 180) % 360) - 180
+        for corenum in [1,3]:
+            cache = {}
+            fLATS, fLONS, fTIME, fVAVHS, fMAXS, fVAVHS_smooth = \
+                read_localfiles(self.pathlst,'Global',corenum=corenum,
+                                cache=cache)
+            np.testing.assert_array_equal(fTIME,time)
+            np.testing.assert_array_equal(fLATS,lats)
+            np.testing.assert_array_equal(fLONS,lons)
+            np.testing.assert_array_equal(fVAVHS,Hs)
+            np.testing.assert_array_equal(fVAVHS_smooth,
+                                          runmean(Hs,5,'centered')[0])
+            # per-file maxima in the order of pathlst, the corrupt file
+            # is skipped and the empty file has no maximum
+            self.assertTrue(cache[self.corrupt] is None)
+            self.assertEqual(len(cache[self.pathlst[1]][0]),0)
+            ref = [np.nanmax(np.where(d[3]==-9999.,np.nan,
+                   np.asarray(d[3],dtype='float32'))) if len(d[3]) > 0
+                   else np.nan for d in self.data]
+            np.testing.assert_array_equal(fMAXS,ref)
+
+class test_sentinel_altimeter(unittest.TestCase):
+
+    def setUp(self):
+        rs = np.random.RandomState(9)
+        n = 3000
+        self.basetime = datetime(2000,1,1)
+        start = (datetime(2018,8,1) - self.basetime).total_seconds()
+        self.time = start + np.sort(rs.uniform(0,86400,n))
+        self.lats = rs.uniform(40,85,n)
+        self.lons = rs.uniform(-30,60,n)
+        self.Hs = rs.uniform(0,8,n)
+        self.Hs[rs.rand(n)<0.05] = np.nan
+        self.sdate = datetime(2018,8,1,6)
+        self.edate = datetime(2018,8,1,18)
+
+    def sentinel(self,region):
+        from satmod import sentinel_altimeter
+        return sentinel_altimeter(self.sdate,edate=self.edate,timewin=30,
+                    region=region,
+                    cols=(self.lats,self.lons,self.time,self.Hs,
+                          [np.nanmax(self.Hs)],self.Hs))
+
+    def reference(self,region):
+        """
+        footprints within time frame and region selected directly
+        """
+        valid = ~np.isnan(self.Hs)
+        lo = (self.sdate - timedelta(minutes=30)
+              - self.basetime).total_seconds()
+        hi = (self.edate + timedelta(minutes=30)
+              - self.basetime).total_seconds()
+        sel = valid & (self.time >= lo) & (self.time < hi)
+        if region == 'ARCMFC':
+            sel = sel & (self.lats >= 50)
+        return sel
+
+    def test_rsel(self):
+        for region in ['ARCMFC','Global']:
+            sa_obj = self.sentinel(region)
+            sel = self.reference(region)
+            np.testing.assert_array_equal(sa_obj.rTIME,self.time[sel])
+            np.testing.assert_array_equal(sa_obj.rHs,self.Hs[sel])
+            np.testing.assert_array_equal(sa_obj.rloc[0],self.lats[sel])
+            np.testing.assert_array_equal(sa_obj.rloc[1],self.lons[sel])
+        # contiguous selection as view of the footprint store
+        self.assertTrue(isinstance(sa_obj._rsel,slice))
+        self.assertTrue(np.may_share_memory(sa_obj.rTIME,
+                                            sa_obj._cols['time']))
+        self.assertFalse(isinstance(self.sentinel('ARCMFC')._rsel,slice))
+
+    def test_lazy(self):
+        from utils import lazy_datetimes, num2datetime
+        sa_obj = self.sentinel('ARCMFC')
+        # only Hs is selected during initialization
+        self.assertEqual(sorted(sa_obj._rcols.keys()),['Hs'])
+        rtime = sa_obj.rtime
+        self.assertTrue(isinstance(rtime,lazy_datetimes))
+        sel = self.reference('ARCMFC')
+        self.assertEqual(len(rtime),np.sum(sel))
+        self.assertEqual(rtime[5],num2datetime(self.time[sel][5:6],
+                                               self.basetime)[0])
+        self.assertEqual(list(sa_obj.ctime[:3]),num2datetime(
+                                sa_obj.cTIME[:3],self.basetime))
+        self.assertTrue(sa_obj.rTIME is sa_obj.rTIME)
+        sa_obj.materialize()
+        self.assertEqual(sorted(sa_obj._rcols.keys()),
+                         sorted(sa_obj._cols.keys()))
+        np.testing.assert_array_equal(sa_obj.rHs_smooth,self.Hs[sel])
+
+    def test_get_model(self):
+        import shutil
+        import tempfile
+        import gridmod
+        from model_specs import model_dict
+        from satmod import get_model2
+        from utils import num2datetime
+        tmpdir = tempfile.mkdtemp()
+        model_path = model_dict['ARCMFC']['path']
+        gridcache_path = gridmod.grid_index.gridcache_path
+        model_dict['ARCMFC']['path'] = tmpdir + '/'
+        gridmod.grid_index.gridcache_path = tmpdir
+        try:
+            lons, lats = np.meshgrid(np.arange(-30,60.1,0.5),
+                                     np.arange(45,85.1,0.5))
+            write_arcmfc(tmpdir,datetime(2018,8,1),lons,lats,
+                         np.random.RandomState(10))
+            sa_obj = self.sentinel('ARCMFC')
+            fc_date = datetime(2018,8,1,12)
+            results_dict = sa_obj.get_model('ARCMFC',datetime(2018,8,1),
+                                            fc_date,distlim=30)
+            ref = get_model2(sa_obj,'ARCMFC',datetime(2018,8,1),fc_date,
+                             distlim=30)
+            # collocation of all footprints converted to datetime
+            grid = gridmod._grid_memo.values()[0]
+            ridx = grid.ridx('ARCMFC')
+            from fieldmod import read_model_field
+            field = read_model_field('ARCMFC',tmpdir
+                        + '/20180801_MyWaveWam8r625_b20180801.nc',12)
+            full = collocate(num2datetime(sa_obj.rTIME,sa_obj.basetime),
+                        sa_obj.rloc[0],sa_obj.rloc[1],sa_obj.rHs,
+                        grid.lats[ridx],grid.lons[ridx],
+                        field.ravel()[ridx],[fc_date],timewin=30,
+                        distlim=30)
+        finally:
+            model_dict['ARCMFC']['path'] = model_path
+            gridmod.grid_index.gridcache_path = gridcache_path
+            gridmod._grid_memo.clear()
+            shutil.rmtree(tmpdir)
+        self.assertTrue(len(full['sat_Hs_matches']) > 0)
+        for other in [ref,full]:
+            self.assertEqual(sorted(results_dict.keys()),
+                             sorted(other.keys()))
+            for key in results_dict.keys():
+                np.testing.assert_array_equal(results_dict[key],other[key])
+
+class test_validate_worker(unittest.TestCase):
+
+    def setUp(self):
+        import tempfile
+        import gridmod
+        import fieldmod
+        from model_specs import model_dict
+        from satmod import sentinel_altimeter
+        self.tmpdir = tempfile.mkdtemp()
+        self.model_path = model_dict['ARCMFC']['path']
+        self.gridcache_path = gridmod.grid_index.gridcache_path
+        model_dict['ARCMFC']['path'] = self.tmpdir + '/'
+        gridmod.grid_index.gridcache_path = self.tmpdir
+        lons, lats = np.meshgrid(np.arange(0,20.01,0.2),
+                                 np.arange(60,75.01,0.1))
+        rs = np.random.RandomState(14)
+        write_arcmfc(self.tmpdir,datetime(2018,8,1),lons,lats,rs)
+        n = 5000
+        time = ((datetime(2018,8,1) - datetime(2000,1,1)).total_seconds()
+                + np.sort(rs.uniform(0,86400,n)))
+        Hs = rs.uniform(0,8,n)
+        self.sa_obj = sentinel_altimeter(datetime(2018,8,1),
+                    edate=datetime(2018,8,1,23),timewin=30,region='ARCMFC',
+                    cols=(rs.uniform(60,75,n),rs.uniform(0,20,n),time,Hs,
+                          [np.max(Hs)],Hs))
+        # cells of validate_arcmfc.py, the model file of the last two
+        # is missing and fc_date 2018-08-01 00:30 is not in the file
+        fc_dates = [datetime(2018,8,1,h) for h in range(0,24,3)]
+        self.tasks = [(i,0,fc_dates[i],datetime(2018,8,1))
+                      for i in range(len(fc_dates))]
+        self.tasks += [(8,0,datetime(2018,8,1,0,30),datetime(2018,8,1)),
+                       (9,0,datetime(2018,8,2,6),datetime(2018,8,2)),
+                       (9,1,datetime(2018,8,2,6),datetime(2018,8,1))]
+
+    def tearDown(self):
+        import shutil
+        import gridmod
+        import satmod
+        from model_specs import model_dict
+        model_dict['ARCMFC']['path'] = self.model_path
+        gridmod.grid_index.gridcache_path = self.gridcache_path
+        gridmod._grid_memo.clear()
+        satmod.worker_sa_obj = None
+        shutil.rmtree(self.tmpdir)
+
+    def test_pool(self):
+        import multiprocessing as mp
+        from satmod import init_worker, tmploop_validate
+        # as in validate_arcmfc.py
+        self.sa_obj.materialize()
+        pool = mp.Pool(processes=2,initializer=init_worker,
+                       initargs=(self.sa_obj,))
+        results = list(pool.imap(tmploop_validate,self.tasks,chunksize=4))
+        pool.close()
+        pool.join()
+        init_worker(self.sa_obj)
+        serial = map(tmploop_validate,self.tasks)
+        # results in order of the tasks
+        self.assertEqual([r[:4] for r in results],self.tasks)
+        self.assertTrue(all([r[-1][0] != os.getpid() for r in results]))
+        for r, ref in zip(results,serial):
+            self.assertEqual(type(r[4]),type(ref[4]))
+            np.testing.assert_equal(r[5],ref[5])
+            np.testing.assert_equal(r[6],ref[6])
+        self.assertEqual([type(r[4]) for r in results[-3:]],
+                         [ValueError,IOError,IOError])
+        self.assertTrue(all([r[4] is None for r in results[:8]]))
+        self.assertTrue(sum([r[5]['nov'] for r in results[:8]]) > 0)
+
+class test_stream_sentinel(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        import tempfile
+        import netCDF4
+        from satmod import sentinel_altimeter
+        cls.satpath_lustre = sentinel_altimeter.satpath_lustre
+        cls.tmpdir = tempfile.mkdtemp()
+        sentinel_altimeter.satpath_lustre = cls.tmpdir + '/'
+        # files of 6 hours with time stamps of their own day only,
+        # footprints at the start of a day are smoothed with the last
+        # footprints of the file of the day before, a few missing values
+        rs = np.random.RandomState(2)
+        basetime = datetime(2000,1,1)
+        dur = timedelta(hours=6)
+        npts = 300
+        t = datetime(2018,7,31)
+        while t < datetime(2018,8,3,6):
+            path = cls.tmpdir + t.strftime('/%Y/%m/')
+            if not os.path.isdir(path):
+                os.makedirs(path)
+            last = t + dur - timedelta(minutes=1)
+            nc = netCDF4.Dataset(path
+                    + 'global_vavh_l3_rt_s3a_C0028_P0624_'
+                    + t.strftime('%Y%m%dT%H%M%S') + '_'
+                    + last.strftime('%Y%m%dT%H%M%S') + '_'
+                    + last.strftime('%Y%m%dT%H%M%S')
+                    + '.nc','w')
+            nc.createDimension('time',None)
+            start = (t-basetime).total_seconds()
+            nc.createVariable('time','f8',('time',))[:] = \
+                start + np.linspace(0,(last-t).total_seconds(),npts)
+            nc.createVariable('latitude','f4',('time',))[:] = \
+                rs.uniform(-80,85,npts)
+            nc.createVariable('longitude','f4',('time',))[:] = \
+                rs.uniform(0,360,npts)
+            Hs = rs.uniform(0,6,npts)
+            Hs[rs.rand(npts)<0.01] = -9999.
+            nc.createVariable('VAVH','f4',('time',),
+                              fill_value=-9999.)[:] = Hs
+            nc.close()
+            t = t + dur
+
+    @classmethod
+    def tearDownClass(cls):
+        import shutil
+        from satmod import sentinel_altimeter
+        sentinel_altimeter.satpath_lustre = cls.satpath_lustre
+        shutil.rmtree(cls.tmpdir)
+
+    def test_single_read(self):
+        from satmod import sentinel_altimeter, stream_sentinel, \
+                           merge_sentinel
+        sdate = datetime(2018,8,1,3,17)
+        edate = datetime(2018,8,2,20)
+        for region in ['Global',[40,70,-10,40]]:
+            sa_obj = sentinel_altimeter(sdate,edate=edate,timewin=30,
+                                        region=region)
+            for chunk in [None,timedelta(hours=5),700]:
+                chunks = list(stream_sentinel(sdate,edate,timewin=30,
+                                              region=region,chunk=chunk))
+                self.assertTrue(len(chunks) > 1)
+                for name in ['rTIME','rHs','rHs_smooth']:
+                    np.testing.assert_array_equal(
+                        np.concatenate([getattr(c,name) for c in chunks]),
+                        getattr(sa_obj,name))
+                for i in range(2):
+                    np.testing.assert_array_equal(
+                        np.concatenate([c.rloc[i] for c in chunks]),
+                        sa_obj.rloc[i])
+                # per-file maxima of files shared by chunks once
+                merged = merge_sentinel(chunks)
+                self.assertEqual(merged.gfiles,sa_obj.gfiles)
+                np.testing.assert_array_equal(merged.gHsMax,sa_obj.gHsMax)
+                for c in chunks:
+                    self.assertEqual(len(c.gHsMax),len(c.gfiles))
+
+class test_altimeter_archive(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        import tempfile
+        import netCDF4
+        from satmod import sentinel_altimeter
+        cls.satpath_lustre = sentinel_altimeter.satpath_lustre
+        cls.tmpdir = tempfile.mkdtemp()
+        sentinel_altimeter.satpath_lustre = cls.tmpdir + '/'
+        # files of 6 hours, no files on 2018-08-02
+        rs = np.random.RandomState(6)
+        basetime = datetime(2000,1,1)
+        dur = timedelta(hours=6)
+        npts = 200
+        t = datetime(2018,7,30)
+        while t < datetime(2018,8,5):
+            if t.day == 2:
+                t = t + dur
+                continue
+            path = cls.tmpdir + t.strftime('/%Y/%m/')
+            if not os.path.isdir(path):
+                os.makedirs(path)
+            last = t + dur - timedelta(minutes=1)
+            nc = netCDF4.Dataset(path
+                    + 'global_vavh_l3_rt_s3a_C0028_P0624_'
+                    + t.strftime('%Y%m%dT%H%M%S') + '_'
+                    + last.strftime('%Y%m%dT%H%M%S') + '_'
+                    + last.strftime('%Y%m%dT%H%M%S')
+                    + '.nc','w')
+            nc.createDimension('time',None)
+            start = (t-basetime).total_seconds()
+            nc.createVariable('time','f8',('time',))[:] = \
+                start + np.linspace(0,(last-t).total_seconds(),npts)
+            nc.createVariable('latitude','f4',('time',))[:] = \
+                rs.uniform(-80,85,npts)
+            nc.createVariable('longitude','f4',('time',))[:] = \
+                rs.uniform(0,360,npts)
+            nc.createVariable('VAVH','f4',('time',),
+                              fill_value=-9999.)[:] = rs.uniform(0,6,npts)
+            nc.close()
+            t = t + dur
+
+    @classmethod
+    def tearDownClass(cls):
+        import shutil
+        from satmod import sentinel_altimeter
+        sentinel_altimeter.satpath_lustre = cls.satpath_lustre
+        shutil.rmtree(cls.tmpdir)
+
+    def setUp(self):
+        import tempfile
+        from satmod import sentinel_altimeter, altimeter_archive
+        self.outpath = tempfile.mkdtemp(dir=self.tmpdir)
+        # overlapping time frames, footprints of 2018-08-01 before
+        # noon in both
+        self.sa1 = sentinel_altimeter(datetime(2018,7,30),
+                            edate=datetime(2018,8,1,12),timewin=0)
+        self.sa2 = sentinel_altimeter(datetime(2018,8,1),
+                            edate=datetime(2018,8,4,23,59),timewin=0)
+        archive = altimeter_archive(self.outpath,'Global',chunksize=64,
+                                    flushsize=100)
+        for sa_obj in [self.sa1,self.sa2]:
+            sa_obj.dumptonc(self.outpath,archive=archive)
+        archive.close()
+        # footprints already written by an earlier run
+        self.sa2.dumptonc(self.outpath,ncmode='auto')
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.outpath)
+
+    def monthly(self,month):
+        import netCDF4
+        return netCDF4.Dataset(os.path.join(self.outpath,
+                    'global_vavh_l3_rt_s3a_Global_' + month + '.nc'))
+
+    def test_unique(self):
+        time = np.union1d(self.sa1.rTIME,self.sa2.rTIME)
+        Hs = np.concatenate([self.sa1.rHs,self.sa2.rHs])[np.unique(
+                np.concatenate([self.sa1.rTIME,self.sa2.rTIME]),
+                return_index=True)[1]]
+        self.assertTrue(len(time) < len(self.sa1.rTIME)
+                        + len(self.sa2.rTIME))
+        rtime, rHs = [], []
+        for month in ['201807','201808']:
+            nc = self.monthly(month)
+            self.assertEqual(nc.rtime_sorted,1)
+            rtime.append(nc.variables['rtime'][:])
+            rHs.append(nc.variables['rHs'][:])
+            nc.close()
+        np.testing.assert_array_equal(np.concatenate(rtime),time)
+        np.testing.assert_array_equal(np.concatenate(rHs),Hs)
+
+    def test_coverage(self):
+        for month in ['201807','201808']:
+            nc = self.monthly(month)
+            rtime = nc.variables['rtime'][:]
+            day = nc.variables['day'][:]
+            count = nc.variables['day_count'][:]
+            start = nc.variables['day_start'][:]
+            nc.close()
+            self.assertEqual(len(day),31)
+            ref = np.histogram(rtime,np.append(day,day[-1]+86400.))[0]
+            np.testing.assert_array_equal(count,ref)
+            for i in np.flatnonzero(count>0):
+                self.assertTrue(rtime[start[i]] >= day[i])
+                self.assertTrue(rtime[start[i]+count[i]-1] < day[i]+86400.)
+            # gaps
+            np.testing.assert_array_equal(start[count==0],-1)
+        # days without footprints: August 2 and after August 4
+        np.testing.assert_array_equal(np.flatnonzero(count==0),
+                                      [1] + range(4,31))
+
+    def test_archive_slice(self):
+        from satmod import sentinel_altimeter, read_localfiles
+        sdate = datetime(2018,8,3,6)
+        edate = datetime(2018,8,3,18)
+        path = self.tmpdir + '/monthly'
+        os.rename(self.outpath,path)
+        try:
+            # only the days around the time frame are read
+            sa_obj = sentinel_altimeter(sdate,edate=edate,timewin=30,
+                                        mode='ARCMFC')
+            self.assertTrue(len(sa_obj.fTIME) < len(self.sa2.rTIME))
+            cols = read_localfiles([path + '/'
+                        + 'global_vavh_l3_rt_s3a_Global_201808.nc'],
+                        'ARCMFC')
+            ref = sentinel_altimeter(sdate,edate=edate,timewin=30,
+                                     cols=cols)
+        finally:
+            os.rename(path,self.outpath)
+        self.assertTrue(len(ref.rTIME) > 0)
+        for name in ['rTIME','rHs','rHs_smooth']:
+            np.testing.assert_array_equal(getattr(sa_obj,name),
+                                          getattr(ref,name))
+        for i in range(2):
+            np.testing.assert_array_equal(sa_obj.rloc[i],ref.rloc[i])
+
+class test_resume(unittest.TestCase):
+
+    def setUp(self):
+        import tempfile
+        from model_specs import model_dict
+        self.tmpdir = tempfile.mkdtemp()
+        self.model_path = model_dict['ARCMFC']['path']
+        model_dict['ARCMFC']['path'] = self.tmpdir + '/'
+        self.statefile = os.path.join(self.tmpdir,'state.pkl')
+        # one model file per cell
+        fc_dates = [datetime(2018,8,1,12) + timedelta(days=i)
+                    for i in range(4)]
+        self.leads = [12,36]
+        self.keys = [(fc_date,lead) for fc_date in fc_dates
+                     for lead in self.leads]
+        # footprints every 10 minutes
+        self.sat_times = ((fc_dates[0] - datetime(2000,1,1)).total_seconds()
+                          + 600.*np.arange(-100,500))
+        # model file of the last cell is missing
+        for key in self.keys[:-1]:
+            self.write_model(key)
+
+    def tearDown(self):
+        import shutil
+        from model_specs import model_dict
+        model_dict['ARCMFC']['path'] = self.model_path
+        shutil.rmtree(self.tmpdir)
+
+    def write_model(self,key,content='model'):
+        from satmod import model_filestr
+        with open(model_filestr('ARCMFC',key[0]-timedelta(hours=key[1]),
+                                key[0]),'w') as f:
+            f.write(content)
+
+    def run_cells(self,interrupt=None):
+        """
+        cells computed as in validate_arcmfc.py, saved every two
+        cells, interrupt -> number of cells after which the run stops
+        """
+        from satmod import load_state, save_state, cell_signature, \
+                           pending_cells
+        state = load_state(self.statefile)
+        signatures = dict([(key,cell_signature(key[0],
+                                    key[0]-timedelta(hours=key[1]),
+                                    self.sat_times,timewin=30))
+                           for key in self.keys])
+        computed = []
+        for key in pending_cells(self.keys,state,signatures):
+            if len(computed) == interrupt:
+                raise KeyboardInterrupt
+            computed.append(key)
+            state[key] = {'signature':signatures[key],
+                          'valid_dict':{'nov':len(computed)}}
+            if len(computed) % 2 == 0:
+                save_state(self.statefile,state)
+        save_state(self.statefile,state)
+        return computed
+
+    def test_resume(self):
+        from satmod import load_state
+        self.assertRaises(KeyboardInterrupt,self.run_cells,interrupt=5)
+        # cells of the last checkpoint, no partial files
+        self.assertEqual(sorted(load_state(self.statefile).keys()),
+                         self.keys[:4])
+        self.assertEqual(os.listdir(self.tmpdir).count('state.pkl'),1)
+        self.assertEqual(len([f for f in os.listdir(self.tmpdir)
+                              if f.startswith('tmp')]),0)
+        self.assertEqual(self.run_cells(),self.keys[4:])
+        self.assertEqual(self.run_cells(),[])
+        self.assertEqual(sorted(load_state(self.statefile).keys()),
+                         self.keys)
+
+    def test_signature(self):
+        self.run_cells()
+        # new model file version, new model file
+        self.write_model(self.keys[2],content='new model run')
+        self.write_model(self.keys[-1])
+        self.assertEqual(self.run_cells(),[self.keys[2],self.keys[-1]])
+        # new footprint within 30 minutes of the third fc_date
+        t = (self.keys[4][0] - datetime(2000,1,1)).total_seconds() + 60.
+        self.sat_times = np.sort(np.append(self.sat_times,t))
+        self.assertEqual(self.run_cells(),self.keys[4:6])
+        self.assertEqual(self.run_cells(),[])
+
+if __name__ == "__main__":
+    unittest.main()
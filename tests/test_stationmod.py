@@ -0,0 +1,542 @@
+"""
+checks of the d22 parser of stationmod against the original parser,
+on synthetic d22 files
+"""
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+import warnings
+import numpy as np
+from datetime import datetime, timedelta
+
+sys.path.insert(0,os.path.join(os.path.dirname(
+                    os.path.abspath(__file__)),'..'))
+
+import stationmod
+from stationmod import floater, tokenize_d22, extract_d22, read_d22, \
+                       parse_d22
+from d22_var_dicts import d22_sensors, d22_vars
+
+def extract_d22_orig(searchlines):
+    '''
+    original parser, the module-global dicts of d22_var_dicts are
+    created anew for each call
+    '''
+    dat = {'10min':[],'1hr':[]}
+    state = {}
+    for kind in d22_sensors:
+        for name in d22_sensors[kind]:
+            state[name] = dict([('name',name)] + [(var,[])
+                               for var in d22_vars[kind]])
+    WM1, WM2, WM3 = [state[name] for name in d22_sensors['WM']]
+    WIA, WIB, WIC = [state[name] for name in d22_sensors['WI']]
+    WL1, WL2, WL3 = [state[name] for name in d22_sensors['WL']]
+    tseries=[]
+    for i, line in enumerate(searchlines):
+        if "!!!!" in line:
+            tseriesl = []
+            for l in searchlines[i+3:i+5]:
+                tseriesl.append(l.strip())
+            tseries.append(' '.join(tseriesl))
+            date_object = datetime.strptime(' '.join(tseriesl),
+                                            '%d-%m-%Y %H:%M')
+            dat['10min'].append(date_object)
+            for WM in [WM1,WM2,WM3,WIA,WIB,WIC,WL1,WL2,WL3]:
+                for var in WM.keys():
+                    if var != 'name':
+                        WM[var].append(np.nan)
+        for WM in [WM1,WM2,WM3]:
+            if str(WM['name']) in line:
+                for l in searchlines[i+2:i+3]:
+                    WM['Hs_10min'][-1]=floater(l.strip())
+                for l in searchlines[i+4:i+5]:
+                    WM['Hmax_10min'][-1]=floater(l.strip())
+                for l in searchlines[i+5:i+6]:
+                    WM['Tp_10min'][-1]=floater(l.strip())
+                for l in searchlines[i+11:i+12]:
+                    WM['Tm_10min'][-1]=floater(l.strip())
+        for WI in [WIA,WIB,WIC]:
+            if str(WI['name']) in line:
+                for l in searchlines[i+10:i+11]:
+                    WI['FF_10min'][-1]=floater(l.strip())
+                for l in searchlines[i+13:i+14]:
+                    WI['DD_10min'][-1]=floater(l.strip())
+        for WL in [WL1,WL2,WL3]:
+            if str(WL['name']) in line:
+                for l in searchlines[i+2:i+3]:
+                    WL['Hlat'][-1]=floater(l.strip())
+    dat['10min']=np.array(dat['10min'])
+    for WM in [WM1,WM2,WM3,WIA,WIB,WIC,WL1,WL2,WL3]:
+        for var in WM.keys():
+            if var != 'name':
+                WM[var] = np.array(WM[var])
+                # scipy.power and scipy.sqrt of the original
+                if var in ['Hs_10min','Tm_10min']:
+                    WINDOW = 3
+                    wmt = np.lib.scimath.power(WM[var],2)
+                    weights = np.ones((WINDOW))/WINDOW
+                    wmt[2:-2:2] = np.convolve(wmt[0::2],weights,
+                                              mode='valid')
+                    wmt[3:-2:2] = np.convolve(wmt[1::2],weights,
+                                              mode='valid')
+                    wmt[[0,1,-2,-1]]= np.nan
+                    WM[var.replace('10min','1hr')] = \
+                                np.lib.scimath.sqrt(wmt)
+    return state, dat
+
+def d22_record(rs,date,names,junk=None):
+    '''
+    lines of one 10 min record with blocks of the given sensors
+    '''
+    lines = ['!!!!\n','Ekofisk\n','OK\n',date.strftime('%d-%m-%Y\n'),
+             date.strftime('%H:%M\n')]
+    for name in names:
+        values = ['%.2f\n' % v for v in rs.uniform(0,15,14)]
+        if junk is not None:
+            values[1] = junk
+        lines.extend([name + '\n'] + values)
+    return lines
+
+def d22_day(rs,day,nrec,malformed=None):
+    '''
+    lines of a daily file, malformed=True adds records with missing,
+    duplicated and invalid sensor blocks and a truncated last record
+    '''
+    names = [name for kind in sorted(d22_sensors)
+             for name in d22_sensors[kind]]
+    lines = []
+    for i in range(nrec):
+        date = day + timedelta(minutes=10*i)
+        if malformed and i % 4 == 1:
+            # sensors missing
+            lines.extend(d22_record(rs,date,names[::3]))
+        elif malformed and i % 4 == 2:
+            # a sensor twice, the last block counts
+            lines.extend(d22_record(rs,date,names + ['WM2']))
+        elif malformed and i % 4 == 3:
+            lines.extend(d22_record(rs,date,names,junk='///\n'))
+        else:
+            lines.extend(d22_record(rs,date,names))
+    if malformed:
+        # record cut off within the block of WIA
+        date = day + timedelta(minutes=10*nrec)
+        lines.extend(d22_record(rs,date,['WM1','WIA'])[:-9])
+    return lines
+
+class test_d22(unittest.TestCase):
+
+    def setUp(self):
+        self.rs = np.random.RandomState(4)
+        self.tmpdir = tempfile.mkdtemp()
+        self.station_d22_opdate = stationmod.station_d22_opdate
+        self.station_d22_starc = stationmod.station_d22_starc
+        stationmod.station_d22_opdate = self.tmpdir + '/opdata/'
+        stationmod.station_d22_starc = self.tmpdir + '/starc/'
+
+    def tearDown(self):
+        stationmod.station_d22_opdate = self.station_d22_opdate
+        stationmod.station_d22_starc = self.station_d22_starc
+        shutil.rmtree(self.tmpdir)
+
+    def write_day(self,statname,day,lines):
+        path = os.path.join(stationmod.station_d22_opdate,statname,'d22')
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        with open(os.path.join(path,day.strftime('%Y%m%d.d22')),'w') as f:
+            f.writelines(lines)
+
+    def assert_orig(self,time,sensors,state,dat):
+        np.testing.assert_array_equal(time,dat['10min'])
+        for kind in d22_sensors:
+            for name in d22_sensors[kind]:
+                for var in d22_vars[kind]:
+                    ref = state[name][var]
+                    if var.endswith('1hr'):
+                        # complex with nan and float32 without nan in
+                        # the original
+                        np.testing.assert_allclose(sensors[name][var],
+                                                   ref.real,rtol=1e-6)
+                    else:
+                        np.testing.assert_array_equal(sensors[name][var],
+                                                      ref)
+
+    def test_tokenize(self):
+        lines = d22_day(self.rs,datetime(2018,8,1),30,malformed=True)
+        state, dat = extract_d22_orig(lines)
+        # missing, invalid and truncated values are nan
+        self.assertTrue(np.isnan(state['WM2']['Hs_10min'][1]))
+        self.assertTrue(np.isnan(state['WM1']['Hs_10min'][3]))
+        self.assertTrue(np.isnan(state['WIA']['DD_10min'][-1]))
+        self.assertFalse(np.isnan(state['WM1']['Tm_10min'][-1]))
+        time, sensors = tokenize_d22(lines)
+        self.assertEqual(len(time),31)
+        for kind in d22_sensors:
+            for name in d22_sensors[kind]:
+                for var in state[name]:
+                    if var.endswith('10min') or var == 'Hlat':
+                        np.testing.assert_array_equal(sensors[name][var],
+                                                      state[name][var])
+        WM, WI, WL, dat2 = extract_d22(lines)
+        self.assertEqual(sorted(WM.keys()),d22_sensors['WM'])
+        self.assert_orig(dat2['10min'],dict(WM.items() + WI.items()
+                                            + WL.items()),state,dat)
+
+    def test_read_d22(self):
+        sdate, edate = datetime(2018,8,1), datetime(2018,8,3)
+        # complete records at the end of the first days
+        self.write_day('test',sdate,d22_day(self.rs,sdate,20))
+        self.write_day('test',sdate+timedelta(days=1),
+                       d22_day(self.rs,sdate+timedelta(days=1),20))
+        self.write_day('test',edate,d22_day(self.rs,edate,25,
+                                            malformed=True))
+        state, dat = extract_d22_orig(parse_d22('test',sdate,edate))
+        for corenum in [1,2]:
+            time, sensors = read_d22('test',sdate,edate,corenum=corenum)
+            self.assertEqual(len(time),66)
+            self.assert_orig(time,sensors,state,dat)
+
+class test_d22_cache(unittest.TestCase):
+
+    def setUp(self):
+        self.rs = np.random.RandomState(5)
+        self.tmpdir = tempfile.mkdtemp()
+        self.station_d22_opdate = stationmod.station_d22_opdate
+        self.station_d22_starc = stationmod.station_d22_starc
+        self.d22cache_path = stationmod.d22_cache.d22cache_path
+        self.read_d22_file = stationmod.read_d22_file
+        stationmod.station_d22_opdate = self.tmpdir + '/opdata/'
+        stationmod.station_d22_starc = self.tmpdir + '/starc/'
+        stationmod.d22_cache.d22cache_path = self.tmpdir + '/cache/'
+        # parsed files
+        self.parsed = []
+        def read_d22_file(filestr):
+            self.parsed.append(os.path.basename(filestr))
+            return self.read_d22_file(filestr)
+        stationmod.read_d22_file = read_d22_file
+        self.sdate, self.edate = datetime(2018,7,31), datetime(2018,8,2)
+        for i in range(3):
+            self.write_day(self.sdate + timedelta(days=i),20)
+
+    def tearDown(self):
+        stationmod.station_d22_opdate = self.station_d22_opdate
+        stationmod.station_d22_starc = self.station_d22_starc
+        stationmod.d22_cache.d22cache_path = self.d22cache_path
+        stationmod.read_d22_file = self.read_d22_file
+        shutil.rmtree(self.tmpdir)
+
+    def write_day(self,day,nrec):
+        path = os.path.join(stationmod.station_d22_opdate,'test','d22')
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        filestr = os.path.join(path,day.strftime('%Y%m%d.d22'))
+        with open(filestr,'w') as f:
+            f.writelines(d22_day(self.rs,day,nrec))
+        return filestr
+
+    def assert_read_d22(self,time,sensors):
+        ref_time, ref_sensors = read_d22('test',self.sdate,self.edate)
+        np.testing.assert_array_equal(time,ref_time)
+        for name in ref_sensors:
+            for var in ref_sensors[name]:
+                if var != 'name':
+                    np.testing.assert_array_equal(sensors[name][var],
+                                                  ref_sensors[name][var])
+
+    def test_read(self):
+        # months July and August
+        time, sensors = read_d22('test',self.sdate,self.edate,cache=True)
+        self.assertEqual(sorted(os.listdir(os.path.join(
+                            stationmod.d22_cache.d22cache_path,'test'))),
+                         ['201807','201808'])
+        self.assertEqual(len(time),60)
+        self.assert_read_d22(time,sensors)
+        # days within one month
+        time, sensors = stationmod.d22_cache('test').read(
+                self.sdate+timedelta(days=1),self.edate)
+        self.assertEqual(len(time),40)
+        self.assertEqual(time[0],datetime(2018,8,1))
+
+    def test_hit(self):
+        cache = stationmod.d22_cache('test')
+        cache.read(self.sdate,self.edate)
+        self.assertEqual(sorted(self.parsed),['20180731.d22',
+                                '20180801.d22','20180802.d22'])
+        del self.parsed[:]
+        time, sensors = cache.read(self.sdate,self.edate)
+        self.assertEqual(self.parsed,[])
+        self.assert_read_d22(time,sensors)
+        # memory-mapped columns of the cached month
+        month = cache.month(self.edate)
+        self.assertTrue(isinstance(month['time'],np.memmap))
+
+    def test_changed(self):
+        cache = stationmod.d22_cache('test')
+        cache.read(self.sdate,self.edate)
+        del self.parsed[:]
+        # size changes, e.g. an opdata file that is still written
+        self.write_day(self.sdate+timedelta(days=1),25)
+        time, sensors = cache.read(self.sdate,self.edate)
+        self.assertEqual(self.parsed,['20180801.d22'])
+        self.assertEqual(len(time),65)
+        self.assert_read_d22(time,sensors)
+        del self.parsed[:]
+        # same size, new values and mtime
+        filestr = os.path.join(stationmod.station_d22_opdate,'test',
+                               'd22','20180802.d22')
+        st = os.stat(filestr)
+        with open(filestr) as f:
+            lines = f.readlines()
+        # FF_10min of WIA in the first record and an unused line
+        lines[15], lines[17] = lines[17], lines[15]
+        with open(filestr,'w') as f:
+            f.writelines(lines)
+        self.assertEqual(os.stat(filestr).st_size,st.st_size)
+        os.utime(filestr,(st.st_atime,st.st_mtime+10))
+        time, sensors = cache.read(self.sdate,self.edate)
+        self.assertEqual(self.parsed,['20180802.d22'])
+        self.assert_read_d22(time,sensors)
+        # July is unchanged
+        self.assertEqual(cache.month(self.sdate)['key']['nrec'],[20])
+
+class test_read_station(unittest.TestCase):
+
+    def setUp(self):
+        import netCDF4
+        self.tmpdir = tempfile.mkdtemp()
+        self.stationpath_lustre_hi = stationmod.stationpath_lustre_hi
+        stationmod.stationpath_lustre_hi = self.tmpdir + '/'
+        rs = np.random.RandomState(15)
+        self.basedate = datetime(1970,1,1)
+        # hourly observations of two sensors in July and September,
+        # August is missing
+        self.time, self.Hs_OBS = [], []
+        for month in [datetime(2018,7,1),datetime(2018,9,1)]:
+            end = datetime(month.year,month.month+1,1)
+            time = np.arange((month-self.basedate).total_seconds(),
+                             (end-self.basedate).total_seconds(),3600.)
+            Hs_OBS = rs.uniform(0,8,(2,len(time)))
+            Hs_OBS[rs.rand(2,len(time))<0.1] = np.nan
+            nc = netCDF4.Dataset(self.tmpdir + '/test'
+                                 + month.strftime('_%Y%m.nc'),'w')
+            nc.createDimension('time',None)
+            nc.createDimension('sensor',2)
+            nc.createVariable('time','f8',('time',))[:] = time
+            nc.createVariable('Hs_OBS','f4',('sensor','time'))[:] = Hs_OBS
+            nc.close()
+            self.time.append(time)
+            self.Hs_OBS.append(np.asarray(Hs_OBS,dtype='float32'))
+
+    def tearDown(self):
+        stationmod.stationpath_lustre_hi = self.stationpath_lustre_hi
+        for entry in stationmod._station_files.values():
+            entry[1].close()
+        stationmod._station_files.clear()
+        shutil.rmtree(self.tmpdir)
+
+    def reference(self,sdate,edate):
+        """
+        time steps within [sdate,edate] of all observations
+        """
+        time = np.concatenate(self.time)
+        Hs_OBS = np.concatenate(self.Hs_OBS,axis=1)
+        sel = ((time >= (sdate-self.basedate).total_seconds())
+               & (time <= (edate-self.basedate).total_seconds()))
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            return time[sel], np.nanmean(Hs_OBS[:,sel],axis=0)
+
+    def test_month_boundary(self):
+        from stationmod import read_station
+        for sdate, edate in [
+                # last and first time steps of the months included
+                (datetime(2018,6,30,23),datetime(2018,7,1,0)),
+                (datetime(2018,7,31,23),datetime(2018,7,31,23)),
+                (datetime(2018,7,31,22,30),datetime(2018,8,1,1)),
+                (datetime(2018,7,15),datetime(2018,9,1,0)),
+                (datetime(2018,8,31,23),datetime(2018,9,2,0,30)),
+                (datetime(2018,9,30,23,30),datetime(2018,10,1))]:
+            time, hs, hs_obs = read_station('test',sdate,edate,
+                                            skipmissing=True)
+            ref_time, ref_hs = self.reference(sdate,edate)
+            np.testing.assert_array_equal(time,ref_time)
+            np.testing.assert_array_equal(hs,ref_hs)
+            self.assertEqual(sum([x.shape[1] for x in hs_obs]),len(time))
+        # the missing month
+        self.assertRaises(IOError,read_station,'test',
+                          datetime(2018,7,31),datetime(2018,8,1))
+        time, hs, hs_obs = read_station('test',datetime(2018,8,10),
+                                        datetime(2018,8,11),
+                                        skipmissing=True)
+        self.assertEqual((len(time),len(hs),len(hs_obs)),(0,0,0))
+
+    def test_changed_file(self):
+        import netCDF4
+        from stationmod import read_station
+        sdate, edate = datetime(2018,7,31,20), datetime(2018,7,31,23)
+        read_station('test',sdate,edate)
+        # new version of the open file of July with another time step
+        t = (datetime(2018,7,31,23,30) - self.basedate).total_seconds()
+        nc = netCDF4.Dataset(self.tmpdir + '/new.nc','w')
+        nc.createDimension('time',None)
+        nc.createDimension('sensor',2)
+        nc.createVariable('time','f8',('time',))[:] = \
+                np.append(self.time[0],t)
+        nc.createVariable('Hs_OBS','f4',('sensor','time'))[:] = \
+                np.append(self.Hs_OBS[0],[[1.],[3.]],axis=1)
+        nc.close()
+        os.rename(self.tmpdir + '/new.nc',self.tmpdir + '/test_201807.nc')
+        time, hs, hs_obs = read_station('test',sdate,
+                                        datetime(2018,7,31,23,59))
+        np.testing.assert_array_equal(time[-2:],[self.time[0][-1],t])
+        self.assertEqual(hs[-1],2.)
+
+class test_validate_stations(unittest.TestCase):
+
+    def setUp(self):
+        import netCDF4
+        import gridmod
+        from model_specs import model_dict
+        self.tmpdir = tempfile.mkdtemp()
+        self.model_path = model_dict['ARCMFC']['path']
+        self.gridcache_path = gridmod.grid_index.gridcache_path
+        self.stationpath_lustre_hi = stationmod.stationpath_lustre_hi
+        model_dict['ARCMFC']['path'] = self.tmpdir + '/model/'
+        gridmod.grid_index.gridcache_path = self.tmpdir + '/grids'
+        stationmod.stationpath_lustre_hi = self.tmpdir + '/stations/'
+        os.makedirs(self.tmpdir + '/model')
+        os.makedirs(self.tmpdir + '/stations')
+        rs = np.random.RandomState(7)
+        # model files of two days, hourly Hs with land points
+        lons, lats = np.meshgrid(np.linspace(0,6,31),
+                                 np.linspace(55,62,36))
+        land = np.zeros(lons.shape,dtype='bool')
+        land[10:15,10:15] = True
+        land[30:,:3] = True
+        for day in [datetime(2018,8,1),datetime(2018,8,2)]:
+            nc = netCDF4.Dataset(self.tmpdir + '/model/'
+                        + day.strftime('%Y%m%d_MyWaveWam8r625_b%Y%m%d.nc'),
+                        'w')
+            nc.createDimension('time',None)
+            nc.createDimension('rlat',lons.shape[0])
+            nc.createDimension('rlon',lons.shape[1])
+            nc.createVariable('time','f8',('time',))[:] = \
+                (day - datetime(1970,1,1)).total_seconds() \
+                + 3600.*np.arange(24)
+            nc.createVariable('lon','f4',('rlat','rlon'))[:] = lons
+            nc.createVariable('lat','f4',('rlat','rlon'))[:] = lats
+            Hs = np.ma.array(rs.uniform(0,8,(24,) + lons.shape),
+                             mask=np.broadcast_to(land,(24,)+lons.shape))
+            nc.createVariable('VHM0','f4',('time','rlat','rlon'),
+                              fill_value=-999.)[:] = Hs
+            nc.close()
+        # the nearest grid points of st_land are land points
+        self.stations = {'st_a':[56.13,1.37],'st_b':[58.71,3.04],
+                         'st_land':[57.41,2.37],'st_corner':[61.83,0.21],
+                         'st_missing':[59.4,5.1]}
+        # observations every 10 minutes of three sensors
+        for name in ['st_a','st_b','st_land','st_corner']:
+            nc = netCDF4.Dataset(self.tmpdir + '/stations/'
+                                 + name + '_201808.nc','w')
+            nc.createDimension('time',None)
+            nc.createDimension('sensor',3)
+            time = ((datetime(2018,8,1) - datetime(1970,1,1)).total_seconds()
+                    + 120. + 600.*np.arange(6*24*3))
+            nc.createVariable('time','f8',('time',))[:] = time
+            Hs_OBS = rs.uniform(0,8,(3,len(time)))
+            Hs_OBS[rs.rand(3,len(time))<0.2] = np.nan
+            nc.createVariable('Hs_OBS','f4',('sensor','time'))[:] = Hs_OBS
+            nc.close()
+        # the model file of the last fc_date is missing
+        self.fc_dates = ([datetime(2018,8,1,1) + timedelta(hours=5*i)
+                          for i in range(9)] + [datetime(2018,8,3,6)])
+        self.init_dates = [datetime(d.year,d.month,d.day)
+                           for d in self.fc_dates]
+
+    def tearDown(self):
+        import gridmod
+        from model_specs import model_dict
+        model_dict['ARCMFC']['path'] = self.model_path
+        gridmod.grid_index.gridcache_path = self.gridcache_path
+        stationmod.stationpath_lustre_hi = self.stationpath_lustre_hi
+        gridmod._grid_memo.clear()
+        stationmod._station_idx_memo.clear()
+        for entry in stationmod._station_files.values():
+            entry[1].close()
+        stationmod._station_files.clear()
+        shutil.rmtree(self.tmpdir)
+
+    def single_station(self,name):
+        """
+        model and observed Hs of one station with get_model,
+        get_loc_idx and station_class
+        """
+        from stationmod import get_model, get_loc_idx, station_class, \
+                               matchtime
+        lat, lon = self.stations[name]
+        model_Hs = np.full(len(self.fc_dates),np.nan)
+        obs_Hs = np.full(len(self.fc_dates),np.nan)
+        for i in range(len(self.fc_dates)):
+            try:
+                model_time_dt, model_hs, model_lons, model_lats = \
+                        get_model('ARCMFC',self.fc_dates[i],
+                                  init_date=self.init_dates[i])
+            except IOError:
+                continue
+            idx, idy, distM, lats, lons = get_loc_idx(model_lats,
+                            model_lons,lat,lon,mask=model_hs)
+            model_Hs[i] = model_hs[idx[0],idy[0]]
+        station_class.locations[name] = self.stations[name]
+        try:
+            sc = station_class(name,min(self.fc_dates)-timedelta(minutes=10),
+                               max(self.fc_dates)+timedelta(minutes=10))
+        finally:
+            del station_class.locations[name]
+        for i in range(len(self.fc_dates)):
+            cidx = matchtime(self.fc_dates[i],self.fc_dates[i],sc.time,
+                             sc.basedate,timewin=10,idxonly=True)
+            if len(cidx)>0:
+                t = (self.fc_dates[i] - sc.basedate).total_seconds()
+                j = cidx[np.argmin(np.abs(sc.time[cidx]-t))]
+                obs_Hs[i] = sc.hs[j]
+        return model_Hs, obs_Hs
+
+    def test_single_station(self):
+        from stationmod import validate_stations
+        from utils import metrics
+        results = validate_stations('ARCMFC',self.fc_dates,
+                                    init_dates=self.init_dates,
+                                    stations=self.stations,timewin=10)
+        self.assertEqual(results['names'],sorted(self.stations.keys()))
+        refs = {}
+        for name in ['st_a','st_b','st_land','st_corner']:
+            j = results['names'].index(name)
+            refs[name] = self.single_station(name)
+            np.testing.assert_allclose(results['model_Hs'][:,j],
+                                       refs[name][0],rtol=1e-6)
+            np.testing.assert_array_equal(results['obs_Hs'][:,j],
+                                          refs[name][1])
+            ref = metrics(refs[name][0],refs[name][1],dtype='float64')
+            self.assertEqual(results['station_metrics'][name]['nov'],
+                             ref['nov'])
+            for key in ['mop','mor','rmsd','bias','corr','mad']:
+                self.assertAlmostEqual(
+                        results['station_metrics'][name][key],ref[key])
+        pooled = metrics(np.concatenate([r[0] for r in refs.values()]),
+                         np.concatenate([r[1] for r in refs.values()]),
+                         dtype='float64')
+        self.assertEqual(results['pooled_metrics']['nov'],pooled['nov'])
+        for key in ['mop','mor','rmsd','bias','corr','mad']:
+            self.assertAlmostEqual(results['pooled_metrics'][key],
+                                   pooled[key])
+        # station without files and the missing model file
+        j = results['names'].index('st_missing')
+        self.assertTrue(np.all(np.isnan(results['obs_Hs'][:,j])))
+        self.assertTrue(np.all(np.isnan(results['model_Hs'][-1])))
+        self.assertEqual(sorted([e[0] for e in results['errors']]),
+                         sorted(['st_missing',self.tmpdir + '/model/'
+                                 + '20180803_MyWaveWam8r625_b20180803.nc']))
+
+if __name__ == "__main__":
+    unittest.main()
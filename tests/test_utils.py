@@ -0,0 +1,410 @@
+"""
+checks of the vectorized kernels of utils against direct numpy
+computations and the loops they replace, on synthetic data
+"""
+import os
+import sys
+import unittest
+import numpy as np
+
+sys.path.insert(0,os.path.join(os.path.dirname(
+                    os.path.abspath(__file__)),'..'))
+
+import utils
+
+def synthetic_pairs(n,seed,nans=None):
+    """
+    model a and reference b with nans in both
+    """
+    rs = np.random.RandomState(seed)
+    b = rs.gamma(2.,1.,n)
+    a = 0.9*b + 0.2 + rs.normal(0,0.3,n)
+    if nans is not None:
+        a[rs.rand(n)<nans] = np.nan
+        b[rs.rand(n)<nans] = np.nan
+    return a, b
+
+def haversine_scalar(lon1, lat1, lon2, lat2):
+    """
+    original scalar haversine
+    """
+    from math import radians, sin, cos, asin, sqrt
+    lon1, lat1, lon2, lat2 = map(radians, [lon1, lat1, lon2, lat2])
+    dlon = lon2 - lon1
+    dlat = lat2 - lat1
+    a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
+    return 6367 * 2 * asin(sqrt(a))
+
+def block_detection_loop(time,deltalim):
+    """
+    original block_detection
+    """
+    idx_a = [i for i in range(1,len(time))
+             if time[i]-time[i-1]>deltalim]
+    idx_b = [i for i in range(0,len(time)-1)
+             if time[i+1]-time[i]>deltalim]
+    blocklst = []
+    for i in range(len(idx_a)):
+        if i == 0:
+            blocklst.append([0,idx_b[i]])
+        if i < len(idx_a)-1:
+            blocklst.append([idx_a[i],idx_b[i+1]])
+        if i == len(idx_a)-1:
+            blocklst.append([idx_a[i],len(time)-1])
+    return idx_a, idx_b, blocklst
+
+def runmean_loop(vec,win,mode):
+    """
+    original runmean
+    """
+    out = np.zeros(len(vec))*np.nan
+    std = np.zeros(len(vec))*np.nan
+    if mode == 'left':
+        offset = win-1
+    elif mode == 'centered':
+        offset = win//2
+    else:
+        offset = 0
+    for i in range(len(vec)-win+1):
+        out[i+offset] = np.mean(vec[i:i+win])
+        std[i+offset] = np.std(vec[i:i+win])
+    return out, std
+
+def zscores_loop(ts):
+    """
+    z-scores of the moving window in the original identify_outliers,
+    index n-12 matches no window and keeps the z of the index before
+    """
+    n = len(ts)
+    z = np.zeros(n)
+    for i in range(n):
+        if n<25:
+            z[i] = (ts[i] - np.nanmean(ts[:]))/np.nanstd(ts[:])
+        elif i<13:
+            z[i] = (ts[i] - np.nanmean(ts[0:25]))/np.nanstd(ts[0:25])
+        elif (i>=13 and i<n-12):
+            z[i] = ((ts[i] - np.nanmean(ts[i-12:i+12]))
+                    /np.nanstd(ts[i-12:i+12]))
+        elif i>n-12:
+            z[i] = ((ts[i] - np.nanmean(ts[n-25:-1]))
+                    /np.nanstd(ts[n-25:-1]))
+        else:
+            z[i] = z[i-1]
+    return z
+
+def outliers_loop(time,ts,hs_ll,hs_ul):
+    """
+    forward, backward and upper limit checks of the original
+    identify_outliers
+    """
+    z = zscores_loop(ts)
+    idx = []
+    for i in range(1,len(ts)):
+        if time[i]-time[i-1]<2:
+            if (ts[i] > hs_ll and ((ts[i-1] >= 3. * ts[i]) or (z[i]>2))):
+                idx.append(i)
+        elif (ts[i] > hs_ll and z[i]>2):
+            idx.append(i)
+    for i in range(0,len(ts)-1):
+        if time[i+1]-time[i]<2:
+            if (ts[i] > hs_ll and ((ts[i+1] <= 1/3. * ts[i]) or (z[i]>2))):
+                idx.append(i)
+        elif (ts[i] > hs_ll and z[i]>2):
+            idx.append(i)
+    for i in range(len(ts)):
+        if ts[i]>hs_ul:
+            idx.append(i)
+    return np.unique(np.array(idx,dtype='int'))
+
+class test_haversine(unittest.TestCase):
+
+    def setUp(self):
+        rs = np.random.RandomState(4)
+        self.lons1 = rs.uniform(-180,180,23)
+        self.lats1 = rs.uniform(-90,90,23)
+        self.lons2 = rs.uniform(0,360,31)
+        self.lats2 = rs.uniform(-90,90,31)
+        self.ref = np.array([[haversine_scalar(lo1,la1,lo2,la2)
+                              for lo2, la2 in zip(self.lons2,self.lats2)]
+                             for lo1, la1 in zip(self.lons1,self.lats1)])
+
+    def test_broadcast(self):
+        self.assertAlmostEqual(utils.haversine(self.lons1[0],
+                    self.lats1[0],self.lons2[0],self.lats2[0]),
+                    self.ref[0,0],places=8)
+        np.testing.assert_allclose(utils.haversine(self.lons1[0],
+                    self.lats1[0],self.lons2,self.lats2),
+                    self.ref[0],rtol=1e-10)
+        np.testing.assert_allclose(utils.haversine(self.lons1[:20],
+                    self.lats1[:20],self.lons2[:20],self.lats2[:20]),
+                    np.diag(self.ref[:20,:20]),rtol=1e-10)
+
+    def test_matrix(self):
+        for chunksize in [1,5,None]:
+            np.testing.assert_allclose(utils.haversine_matrix(
+                    self.lons1,self.lats1,self.lons2,self.lats2,
+                    chunksize=chunksize),self.ref,rtol=1e-10)
+            dists, idx = utils.haversine_nearest(self.lons1,self.lats1,
+                    self.lons2,self.lats2,chunksize=chunksize)
+            np.testing.assert_array_equal(idx,np.argmin(self.ref,axis=1))
+            np.testing.assert_allclose(dists,np.min(self.ref,axis=1),
+                                       rtol=1e-10)
+
+class test_timewin_idx(unittest.TestCase):
+
+    def test_mask(self):
+        from datetime import datetime, timedelta
+        basetime = datetime(2000,1,1)
+        rs = np.random.RandomState(5)
+        # sorted with repeated time steps
+        time = np.sort(rs.randint(0,100,300)).astype('float64')*60.
+        for lo, hi in [(10,20),(0,99),(30,30),(-5,3),(95,200),(50,40)]:
+            sdate = basetime + timedelta(minutes=lo)
+            edate = basetime + timedelta(minutes=hi)
+            tmin, tmax = lo*60., hi*60.
+            np.testing.assert_array_equal(
+                utils.timewin_idx(time,sdate,edate,basetime),
+                np.flatnonzero((time>=tmin) & (time<tmax)))
+            np.testing.assert_array_equal(
+                utils.timewin_idx(time,sdate,edate,basetime,
+                                  right_closed=True),
+                np.flatnonzero((time>=tmin) & (time<=tmax)))
+            # unsorted time steps
+            perm = rs.permutation(len(time))
+            np.testing.assert_array_equal(
+                utils.timewin_idx(time[perm],sdate,edate,basetime),
+                np.flatnonzero((time[perm]>=tmin) & (time[perm]<tmax)))
+
+class test_GP(unittest.TestCase):
+
+    def test_segments(self):
+        for n, maxsize, overlap in [(5,10,2),(10,10,2),(11,10,2),
+                                    (100,10,0),(101,10,3),(1000,500,100)]:
+            segments = utils.GP_segments(n,maxsize,overlap)
+            # used ranges [lo,hi) cover [0,n) once
+            self.assertEqual(segments[0][2],0)
+            self.assertEqual(segments[-1][3],n)
+            for k in range(len(segments)):
+                start, stop, lo, hi = segments[k]
+                self.assertTrue(stop-start <= maxsize)
+                self.assertTrue(start <= lo < hi <= stop)
+                if k > 0:
+                    self.assertEqual(segments[k-1][3],lo)
+
+    def test_blocks(self):
+        rs = np.random.RandomState(6)
+        x = np.concatenate([np.arange(40.),np.arange(60.,65.),
+                            np.arange(80.,130.)])
+        y = np.sin(x/5.) + rs.normal(0,0.1,len(x))
+        y[[10,70]] += 3.
+        blocklst = utils.block_detection(x)[2]
+        idx, x_pred, y_pred, sigma = utils.identify_outliers_GP_blocks(
+                                            x,y,3.,blocklst=blocklst)
+        # each block on its own
+        ref = []
+        for first, last in blocklst:
+            block_idx, block_x, block_y, block_sigma = \
+                utils.identify_outliers_GP(x[first:last+1],
+                                           y[first:last+1],3.)
+            ref.extend([first + i for i in block_idx])
+            if last+1-first >= 11:
+                np.testing.assert_allclose(y_pred[first:last+1],
+                                           block_y,rtol=1e-10)
+                np.testing.assert_allclose(sigma[first:last+1],
+                                           block_sigma,rtol=1e-10)
+        np.testing.assert_array_equal(idx,np.unique(ref))
+        self.assertTrue(10 in idx and 70 in idx)
+
+class test_block_detection(unittest.TestCase):
+
+    def test_loop(self):
+        rs = np.random.RandomState(8)
+        for n in [50,1000]:
+            time = np.cumsum(rs.choice([1.,1.,1.,1.,2.5,20.],n))
+            for deltalim in [None,2,10]:
+                ref = block_detection_loop(time,
+                        1 if deltalim is None else deltalim)
+                # the original gives no blocks for series without gaps
+                self.assertTrue(len(ref[0]) > 0)
+                self.assertEqual(utils.block_detection(time,
+                                    deltalim=deltalim),ref)
+
+    def test_no_gap(self):
+        # a single block instead of an empty blocklst
+        idx_a, idx_b, blocklst = utils.block_detection(np.arange(10.))
+        self.assertEqual((idx_a,idx_b,blocklst),([],[],[[0,9]]))
+        start, stop = utils.block_bounds([])
+        self.assertEqual((len(start),len(stop)),(0,0))
+
+class test_runmean(unittest.TestCase):
+
+    def setUp(self):
+        rs = np.random.RandomState(9)
+        self.vec = rs.gamma(2.,1.,200)
+        self.vec[[3,50,51]] = np.nan
+
+    def test_loop(self):
+        for mode in ['left','centered','right']:
+            for win in [1,3,5]:
+                out, std = utils.runmean(self.vec,win,mode)
+                ref_out, ref_std = runmean_loop(self.vec,win,mode)
+                # bit for bit
+                np.testing.assert_array_equal(out,ref_out)
+                np.testing.assert_array_equal(std,ref_std)
+        out, std = utils.runmean(self.vec[:3],5,'centered')
+        self.assertTrue(np.all(np.isnan(out)))
+
+    def test_chunks(self):
+        ref = utils.runstats(self.vec,5)
+        for chunksize in [1,7]:
+            res = utils.runstats(self.vec,5,chunksize=chunksize)
+            np.testing.assert_array_equal(res[0],ref[0])
+            np.testing.assert_array_equal(res[1],ref[1])
+
+    def test_skipnan_bounds(self):
+        import warnings
+        start, stop = np.array([0,40,43,120]), np.array([40,43,120,200])
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore",RuntimeWarning)
+            out, std = utils.runmean(self.vec,5,'centered',skipnan=True,
+                                     bounds=(start,stop))
+            ref = np.full(len(self.vec),np.nan)
+            for i0, i1 in zip(start,stop):
+                for i in range(i0+2,i1-2):
+                    ref[i] = np.nanmean(self.vec[i-2:i+3])
+        # windows do not straddle blocks, nans are skipped
+        np.testing.assert_allclose(out,ref,rtol=1e-12)
+        self.assertFalse(np.isnan(out[3]))
+
+class test_datetime2num(unittest.TestCase):
+
+    def test_timedelta(self):
+        from datetime import datetime, timedelta
+        basetime = datetime(2000,1,1)
+        rs = np.random.RandomState(10)
+        dates = [datetime(1999,12,31,23,59,59,999999)] + \
+                [basetime + timedelta(microseconds=int(us)) for us in
+                 rs.randint(0,2**62,50) % (30*365*86400*10**6)]
+        np.testing.assert_array_equal(utils.datetime2num(dates,basetime),
+                [(d-basetime).total_seconds() for d in dates])
+        self.assertEqual(utils.num2datetime(
+                utils.datetime2num(dates,basetime),basetime),dates)
+
+class test_outliers(unittest.TestCase):
+
+    def synthetic_ts(self,n,seed):
+        rs = np.random.RandomState(seed)
+        ts = rs.gamma(2.,1.,n)
+        ts[rs.rand(n)<0.05] = np.nan
+        # spikes, drops and values above the upper limit
+        ts[rs.rand(n)<0.03] *= 8.
+        ts[rs.rand(n)<0.03] /= 5.
+        ts[rs.rand(n)<0.01] = 35.
+        time = np.cumsum(rs.choice([1.,1.,1.,3.],n))
+        return time, ts
+
+    def test_zscores(self):
+        import warnings
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore",RuntimeWarning)
+            for n in [10,24,25,26,37,500]:
+                time, ts = self.synthetic_ts(n,n)
+                ref = zscores_loop(ts)
+                for chunksize in [1,7,None]:
+                    np.testing.assert_allclose(
+                        utils.outlier_zscores(ts,chunksize=chunksize),
+                        ref,rtol=1e-12)
+
+    def test_identify_outliers(self):
+        import warnings
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore",RuntimeWarning)
+            for n in [10,37,500]:
+                time, ts = self.synthetic_ts(n,n+1)
+                ref = outliers_loop(time,ts,1.,30.)
+                self.assertTrue(len(ref) > 0)
+                np.testing.assert_array_equal(
+                    utils.identify_outliers(time,ts,hs_ll=1.,hs_ul=30.),
+                    ref)
+
+class test_bootstr_metrics(unittest.TestCase):
+
+    def test_chunks(self):
+        a, b = synthetic_pairs(150,1,nans=0.05)
+        valid = ~(np.isnan(a) | np.isnan(b))
+        av, bv = a[valid], b[valid]
+        n = len(av)
+        reps = 200
+        # all draws at once
+        bidx = np.random.RandomState(7).randint(0,n,(reps,n))
+        A, B = av[bidx], bv[bidx]
+        diff = A-B
+        ref = {'msd':np.mean(diff**2,axis=1),
+               'bias':np.mean(diff,axis=1),
+               'mad':np.mean(np.abs(diff),axis=1),
+               'corr':np.array([np.corrcoef(A[i],B[i])[0,1]
+                                for i in range(reps)])}
+        ref['rmsd'] = np.sqrt(ref['msd'])
+        for chunksize in [1,7*n,13*n+5,reps*n,None]:
+            boot_dict = utils.bootstr_metrics(a,b,reps=reps,seed=7,
+                                              chunksize=chunksize)
+            for name in ['msd','rmsd','bias','mad']:
+                np.testing.assert_allclose(boot_dict[name],ref[name],
+                                           rtol=1e-12)
+            np.testing.assert_allclose(boot_dict['corr'],ref['corr'],
+                                       rtol=1e-10)
+            np.testing.assert_allclose(boot_dict['rmsd_ci'],
+                        np.percentile(ref['rmsd'],[2.5,97.5]),rtol=1e-12)
+
+class test_metrics(unittest.TestCase):
+
+    def test_numpy(self):
+        a, b = synthetic_pairs(1000,2,nans=0.05)
+        valid = ~(np.isnan(a) | np.isnan(b))
+        av, bv = a[valid], b[valid]
+        diff = av-bv
+        ref = {'mop':np.mean(av),'mor':np.mean(bv),
+               'msd':np.mean(diff**2),'rmsd':np.sqrt(np.mean(diff**2)),
+               'mad':np.mean(np.abs(diff)),'bias':np.mean(diff),
+               'corr':np.corrcoef(av,bv)[0,1],
+               'slope':np.polyfit(bv,av,1)[0],
+               'SI':np.sqrt(np.mean(diff**2))/np.mean(bv)*100.}
+        for dtype in ['float64','float32']:
+            m = utils.metrics(a.astype(dtype),b.astype(dtype),
+                              dtype='float64')
+            self.assertEqual(m['nov'],np.sum(valid))
+            for name in ref.keys():
+                np.testing.assert_allclose(m[name],ref[name],
+                    rtol=(1e-12 if dtype=='float64' else 1e-6))
+
+class test_validation_stats(unittest.TestCase):
+
+    def test_merge(self):
+        a, b = synthetic_pairs(2000,3,nans=0.05)
+        # large offset to check for cancellation
+        for offset in [0.,1e6]:
+            A, B = a+offset, b+offset
+            # uneven chunks including an empty and an all nan chunk
+            bounds = [0,1,1,17,500,502,1999,2000]
+            A[502:1000] = np.nan
+            pooled = utils.metrics(A,B)
+            stats = []
+            for i0, i1 in zip(bounds[:-1],bounds[1:]):
+                chunk = utils.validation_stats().update(A[i0:i1],B[i0:i1])
+                # e.g. returned from worker processes
+                stats.append(utils.validation_stats(chunk.to_dict()))
+            merged = utils.validation_stats()
+            for chunk in stats[::-1]:
+                merged.merge(chunk)
+            added = stats[0]
+            for chunk in stats[1:]:
+                added = added + chunk
+            for m in [merged.metrics(),added.metrics()]:
+                self.assertEqual(m['nov'],pooled['nov'])
+                for name in ['mop','mor','msd','rmsd','mad','bias',
+                             'corr','SI','slope']:
+                    np.testing.assert_allclose(m[name],pooled[name],
+                                               rtol=1e-9)
+
+if __name__ == "__main__":
+    unittest.main()
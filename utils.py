@@ -3,42 +3,110 @@ utility fcts for the verification
 """
 import numpy as np
 from datetime import datetime, timedelta
-from math import radians, cos, sin, asin, sqrt
 import sys
 from sklearn import gaussian_process
 from sklearn.gaussian_process.kernels import RBF, ConstantKernel, WhiteKernel
 
-def block_detection(time,deltalim=None):
+def block_bounds(time,deltalim=None):
+    """
+    start and stop (exclusive) indices of blocks of sorted time
+    steps that are not separated by gaps larger than deltalim
+    """
     if deltalim is None:
         deltalim = 1
-    # forward check
-    idx_a = []
-    for i in range(1,len(time)):
-        delta_t = time[i]-time[i-1]
-        if delta_t>deltalim:
-            idx_a.append(i)
-    # backward check
-    idx_b = []
-    for i in range(0,len(time)-1):
-        delta_t = time[i+1]-time[i]
-        if delta_t>deltalim:
-            idx_b.append(i)
-    blocklst = []
-    for i in range(len(idx_a)):
-        if i == 0:
-            tmp = [0,idx_b[i]]
-            blocklst.append(tmp)
-        if i < len(idx_a)-1:
-            tmp = [idx_a[i],idx_b[i+1]]
-            blocklst.append(tmp)
-        if i == len(idx_a)-1:
-            tmp = [idx_a[i],len(time)-1]
-            blocklst.append(tmp)
+    time = np.asarray(time)
+    if len(time)==0:
+        return np.array([],dtype='int'), np.array([],dtype='int')
+    gaps = np.flatnonzero(np.diff(time) > deltalim) + 1
+    start = np.concatenate([[0],gaps]).astype('int')
+    stop = np.concatenate([gaps,[len(time)]]).astype('int')
+    return start, stop
+
+def block_detection(time,deltalim=None):
+    """
+    idx_a -> first index after each gap
+    idx_b -> last index before each gap
+    blocklst -> [first,last] index of each block
+    """
+    start, stop = block_bounds(time,deltalim=deltalim)
+    idx_a = start[1:].tolist()
+    idx_b = (stop[:-1]-1).tolist()
+    blocklst = [[first,last] for first, last
+                in zip(start.tolist(),(stop-1).tolist())]
     return idx_a, idx_b, blocklst
 
-def identify_outliers_GP(x,y,mag):
+def tmploop_fit_GP(x,y):
+    """
+    exact GP fit of one segment, returns y_pred[n,1], sigma[n] at x
+    """
+    kernel = 1* RBF(length_scale=1) + WhiteKernel(noise_level=1)
+    gp = gaussian_process.GaussianProcessRegressor(kernel=kernel)
+    gp.fit(x.reshape(-1,1), y.reshape(-1,1))
+    y_pred, sigma = gp.predict(x.reshape(-1,1), return_std=True)
+    return y_pred.reshape(-1,1), np.ravel(sigma)
+
+def GP_segments(n,maxsize,overlap):
+    """
+    overlapping segments [start,stop) of at most maxsize values,
+    prediction of segment k is used in [lo,hi) i.e. up to the
+    middle of the overlap with the neighbouring segments
+    """
+    if n <= maxsize:
+        return [(0,n,0,n)]
+    step = maxsize - overlap
+    starts = range(0,n-maxsize,step) + [n-maxsize]
+    segments = []
+    for k in range(len(starts)):
+        start, stop = starts[k], starts[k]+maxsize
+        if k == 0:
+            lo = 0
+        else:
+            lo = (start + starts[k-1] + maxsize)//2
+        if k == len(starts)-1:
+            hi = n
+        else:
+            hi = (starts[k+1] + stop)//2
+        segments.append((start,stop,lo,hi))
+    return segments
+
+def predict_GP(x,y,blocklst,maxsize=None,overlap=None,corenum=None):
+    """
+    GP prediction for blocks [start,stop) of x, y. Blocks longer
+    than maxsize are fitted by local GPs of overlapping segments
+    (sliding window), all fits are independent and run on corenum
+    processes. Returns y_pred[n,1], sigma[n] with nan outside blocks
+    """
+    from joblib import Parallel, delayed
+    if maxsize is None:
+        maxsize = 500
+    if overlap is None:
+        overlap = maxsize//5
+    if corenum is None:
+        corenum = 1
+    if not (0 <= overlap < maxsize):
+        raise ValueError("overlap must be smaller than maxsize")
+    tasks = []
+    for bstart, bstop in blocklst:
+        for start, stop, lo, hi in GP_segments(bstop-bstart,
+                                               maxsize,overlap):
+            tasks.append((bstart+start,bstart+stop,bstart+lo,bstart+hi))
+    results = Parallel(n_jobs=corenum)(
+                    delayed(tmploop_fit_GP)(x[start:stop],y[start:stop])
+                    for start, stop, lo, hi in tasks)
+    y_pred = np.full((len(y),1),np.nan)
+    sigma = np.full(len(y),np.nan)
+    for (start,stop,lo,hi), (seg_pred,seg_sigma) in zip(tasks,results):
+        y_pred[lo:hi] = seg_pred[lo-start:hi-start]
+        sigma[lo:hi] = seg_sigma[lo-start:hi-start]
+    return y_pred, sigma
+
+def identify_outliers_GP(x,y,mag,maxsize=None,overlap=None,corenum=None):
     # mag -> magnitude in units std
     # if len(y)<11 flag all
+    # maxsize, overlap -> values per GP fit and overlap of fits
+    #                     for long blocks, see predict_GP
+    x = np.asarray(x)
+    y = np.asarray(y)
     idx = []
     if len(y)<11:
         print ("block too short with length " + str(int(len(y))) + ", values flagged")
@@ -51,17 +119,77 @@ def identify_outliers_GP(x,y,mag):
             y_pred.append(np.nan)
             sigma.append(np.nan)
     else:
-        kernel = 1* RBF(length_scale=1) + WhiteKernel(noise_level=1)
-        gp = gaussian_process.GaussianProcessRegressor(kernel=kernel)
-        gp.fit(x.reshape(-1,1), y.reshape(-1,1))
-        print gp.kernel_
         x_pred = x.reshape(-1,1)
-        y_pred, sigma = gp.predict(x_pred, return_std=True)
-        for i in range(len(y)):
-            if ((y[i]>(y_pred[i]+(mag*sigma[i]))[0]) or (y[i]<(y_pred[i]-(mag*sigma[i]))[0])):
-                idx.append(i)
+        y_pred, sigma = predict_GP(x,y,[(0,len(y))],maxsize=maxsize,
+                                   overlap=overlap,corenum=corenum)
+        idx = np.flatnonzero((y > y_pred[:,0] + mag*sigma)
+                           | (y < y_pred[:,0] - mag*sigma)).tolist()
     return idx,x_pred,y_pred,sigma
 
+def identify_outliers_GP_blocks(x,y,mag,blocklst=None,maxsize=None,
+    overlap=None,corenum=None):
+    """
+    identify_outliers_GP for all blocks of x, y at once such that
+    the fits of all blocks run in parallel
+    blocklst -> [first,last] index of each block as returned by
+                block_detection, default are the blocks of x
+    returns idx, x_pred[n,1], y_pred[n,1], sigma[n] with indices
+    of x, values of blocks shorter than 11 are flagged and nan
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+    if blocklst is None:
+        start, stop = block_bounds(x)
+    else:
+        start = np.array([b[0] for b in blocklst],dtype='int')
+        stop = np.array([b[1]+1 for b in blocklst],dtype='int')
+    blocks = [(b0,b1) for b0, b1 in zip(start,stop) if b1-b0 >= 11]
+    short = [np.arange(b0,b1) for b0, b1 in zip(start,stop)
+             if b1-b0 < 11]
+    for b in short:
+        print ("block too short with length " + str(int(len(b)))
+                + ", values flagged")
+    y_pred, sigma = predict_GP(x,y,blocks,maxsize=maxsize,
+                               overlap=overlap,corenum=corenum)
+    with np.errstate(invalid='ignore'):
+        flagged = ((y > y_pred[:,0] + mag*sigma)
+                 | (y < y_pred[:,0] - mag*sigma))
+    idx = np.unique(np.concatenate([np.flatnonzero(flagged)]
+                                   + short).astype('int'))
+    return idx,x.reshape(-1,1),y_pred,sigma
+
+def outlier_zscores(ts,chunksize=None):
+    """
+    z-scores of ts with respect to the moving window of
+    identify_outliers i.e. ts[0:25] at the start, ts[i-12:i+12]
+    in the middle and ts[n-25:n-1] at the end, index n-12 takes
+    the value of index n-13, for n<25 the entire series is used
+    """
+    import warnings
+    from numpy.lib.stride_tricks import as_strided
+    if chunksize is None:
+        chunksize = 2**16
+    ts = np.ascontiguousarray(ts,dtype='float64')
+    n = len(ts)
+    with warnings.catch_warnings():
+        # windows without values result in nan
+        warnings.simplefilter("ignore",RuntimeWarning)
+        if n<25:
+            return (ts - np.nanmean(ts))/np.nanstd(ts)
+        z = np.empty(n)
+        z[:13] = (ts[:13] - np.nanmean(ts[0:25]))/np.nanstd(ts[0:25])
+        z[n-11:] = ((ts[n-11:] - np.nanmean(ts[n-25:n-1]))
+                    /np.nanstd(ts[n-25:n-1]))
+        # all windows of length 24, window k starts at ts[k]
+        win = as_strided(ts,shape=(n-23,24),
+                         strides=(ts.strides[0],ts.strides[0]))
+        for i in range(13,n-12,chunksize):
+            j = min(i+chunksize,n-12)
+            w = win[i-12:j-12]
+            z[i:j] = (ts[i:j] - np.nanmean(w,axis=1))/np.nanstd(w,axis=1)
+        z[n-12] = z[n-13]
+    return z
+
 def identify_outliers(time,ts,ts_ref=None,hs_ll=None,hs_ul=None,dt=None):
     """
     time -> time series to check neighbour values
@@ -74,65 +202,29 @@ def identify_outliers(time,ts,ts_ref=None,hs_ll=None,hs_ul=None,dt=None):
         hs_ll = 1.
     if hs_ul is None:
         hs_ul = 30.
-    std_ts = np.nanstd(ts)
-    mean_ts = np.nanmean(ts)
-    # forward check
-    idx_a = []
-    for i in range(1,len(ts)):
-        # transform to z
-        if len(ts)<25:
-            z = (ts[i] - np.nanmean(ts[:]))/np.nanstd(ts[:])
-        elif i<13:
-            z = (ts[i] - np.nanmean(ts[0:25]))/np.nanstd(ts[0:25])
-        elif (i>=13 and i<(len(ts)-12)):
-            z = (ts[i] - np.nanmean(ts[i-12:i+12]))/np.nanstd(ts[i-12:i+12])
-        elif i>len(ts)-12:
-            z = ((ts[i] - np.nanmean(ts[(len(ts-1)-25):-1]))
-                /np.nanstd(ts[(len(ts-1)-25):-1]))
-        if dt == True:
-            delta_t = (time[i]-time[i-1]).total_seconds()
-        else:
-            delta_t = time[i]-time[i-1]
-        if delta_t<2:
-            #reject if value triples compared to neighbor
-            # reject if greater than twice std (>2z)
-            if ( ts[i] > hs_ll and ((ts[i-1] >= 3. * ts[i]) or (z>2)) ):
-                idx_a.append(i)
-        elif (ts[i] > hs_ll and z>2):
-            idx_a.append(i)
-    print len(idx_a)
-    # backward check
-    idx_b = []
-    for i in range(0,len(ts)-1):
-        # transform to z
-        if len(ts)<25:
-            z = (ts[i] - np.nanmean(ts[:]))/np.nanstd(ts[:])
-        elif i<13:
-            z = (ts[i] - np.nanmean(ts[0:25]))/np.nanstd(ts[0:25])
-        elif (i>=13 and i<len(ts)-12):
-            z = (ts[i] - np.nanmean(ts[i-12:i+12]))/np.nanstd(ts[i-12:i+12])
-        elif i>len(ts)-12:
-            z = ((ts[i] - np.nanmean(ts[(len(ts-1)-25):-1]))
-                /np.nanstd(ts[(len(ts-1)-25):-1]))
-        if dt == True:
-            delta_t = (time[i+1]-time[i]).total_seconds()
-        else:
-            delta_t = time[i+1]-time[i]
-        if delta_t<2:
-            #reject if value triples compared to neighbor
-            # reject if greater than twice std (>2z)
-            if ( ts[i] > hs_ll and ((ts[i+1] <= 1/3. * ts[i]) or (z>2)) ):
-                idx_b.append(i)
-        elif (ts[i] > hs_ll and z>2):
-            idx_b.append(i)
-    print len(idx_b)
-    idx_c = []
-    for i in range(len(ts)):
+    ts = np.asarray(ts,dtype='float64')
+    z = outlier_zscores(ts)
+    # time steps to previous value
+    if dt == True:
+        time = np.array(time,dtype='datetime64[us]')
+        delta_t = np.diff(time).astype('float64')/1e6
+    else:
+        delta_t = np.diff(np.asarray(time,dtype='float64'))
+    with np.errstate(invalid='ignore'):
+        checked = (ts > hs_ll)
+        zflag = (z > 2)
+        close = (delta_t < 2)
+        # forward check
+        # reject if value triples compared to neighbor
+        # reject if greater than twice std (>2z)
+        triple_a = close & (ts[:-1] >= 3. * ts[1:])
+        idx_a = np.flatnonzero(checked[1:] & (triple_a | zflag[1:])) + 1
+        # backward check
+        triple_b = close & (ts[1:] <= 1/3. * ts[:-1])
+        idx_b = np.flatnonzero(checked[:-1] & (triple_b | zflag[:-1]))
         # reject if hs>hs_ul
-        if ts[i]>hs_ul:
-            print "here1"
-            idx_c.append(i)
-    idx = np.unique(np.array(idx_a + idx_b + idx_c))
+        idx_c = np.flatnonzero(ts > hs_ul)
+    idx = np.unique(np.concatenate([idx_a,idx_b,idx_c]))
     if len(idx)>0:
         print(str(len(idx)) 
                 + ' outliers detected of ' 
@@ -157,87 +249,395 @@ def grab_PID():
     print ("\n")
     return
 
-def haversine(lon1, lat1, lon2, lat2):
+def timewin_bounds(time,tmin,tmax,right_closed=None):
+    """
+    index range [start,stop) of the sorted numeric time steps within
+    [tmin,tmax), or [tmin,tmax] if right_closed, by binary search
+    """
+    start = int(np.searchsorted(time,tmin,side='left'))
+    if right_closed == True:
+        stop = int(np.searchsorted(time,tmax,side='right'))
+    else:
+        stop = int(np.searchsorted(time,tmax,side='left'))
+    return start, max(start,stop)
+
+def timewin_idx(time,sdate,edate,basetime,right_closed=None,
+    issorted=None):
+    """
+    indices of numeric time steps (seconds since basetime) within
+    [sdate,edate), or [sdate,edate] if right_closed
+    time -> numeric time steps, binary search is used if sorted
+    issorted -> True skips the check whether time is sorted
+    """
+    time = np.asarray(time)
+    tmin = (sdate-basetime).total_seconds()
+    tmax = (edate-basetime).total_seconds()
+    if issorted is None:
+        issorted = (len(time)<2 or bool(np.all(time[1:]>=time[:-1])))
+    if issorted == True:
+        start, stop = timewin_bounds(time,tmin,tmax,right_closed)
+        return np.arange(start,stop)
+    if right_closed == True:
+        return np.flatnonzero((time>=tmin) & (time<=tmax))
+    return np.flatnonzero((time>=tmin) & (time<tmax))
+
+def num2datetime(time,basetime):
+    """
+    list of datetime objects from numeric time steps
+    (seconds since basetime)
+    """
+    return [basetime + timedelta(seconds=float(s)) for s in time]
+
+def datetime2num(dates,basetime):
+    """
+    numeric time steps (seconds since basetime) of datetime objects,
+    converted at once with microsecond precision
+    """
+    dates = np.array(dates,dtype='datetime64[us]')
+    delta = dates - np.datetime64(basetime,'us')
+    return delta.astype('int64')/1e6
+
+class lazy_datetimes():
+    """
+    sequence of datetime objects that converts numeric time steps
+    (seconds since basetime) only for elements that are accessed
+    """
+    def __init__(self,time,basetime):
+        self.time = time
+        self.basetime = basetime
+
+    def __len__(self):
+        return len(self.time)
+
+    def __getitem__(self,i):
+        if isinstance(i,slice):
+            return num2datetime(self.time[i],self.basetime)
+        return self.basetime + timedelta(seconds=float(self.time[i]))
+
+    def __iter__(self):
+        for s in self.time:
+            yield self.basetime + timedelta(seconds=float(s))
+
+def haversine(lon1, lat1, lon2, lat2, dtype=None):
     """
-    Calculate the great circle distance between two points 
+    Calculate the great circle distance between two points
     on the earth (specified in decimal degrees)
+    Works on scalars and arrays, inputs are broadcasted i.e.:
+     - one to one: all scalars
+     - many to one: arrays for point 1, scalars for point 2
+     - pairwise: arrays of same shape for point 1 and 2
+    For many to many see haversine_matrix and haversine_nearest.
+    dtype='float32' can be chosen to save memory for large grids.
     """
-    # convert decimal degrees to radians 
-    lon1, lat1, lon2, lat2 = map(radians, [lon1, lat1, lon2, lat2])
-    # haversine formula 
+    if dtype is None:
+        dtype = 'float64'
+    # convert decimal degrees to radians
+    lon1, lat1, lon2, lat2 = [np.radians(np.asarray(x,dtype=dtype))
+                                for x in [lon1, lat1, lon2, lat2]]
+    # haversine formula
     dlon = lon2 - lon1
     dlat = lat2 - lat1
-    a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-    c = 2 * asin(sqrt(a))
-    km = 6367 * c
+    a = np.sin(dlat/2)**2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon/2)**2
+    c = 2 * np.arcsin(np.sqrt(np.clip(a,0,1)))
+    km = np.asarray(6367 * c, dtype=dtype)
+    if km.ndim == 0:
+        return km[()]
     return km
 
+def haversine_matrix(lons1, lats1, lons2, lats2, chunksize=None,
+    dtype=None):
+    """
+    many to many distances, returns array of shape (n1,n2)
+    computed in chunks of chunksize rows to bound temporary memory
+    """
+    if dtype is None:
+        dtype = 'float64'
+    lons1, lats1 = np.ravel(lons1), np.ravel(lats1)
+    lons2, lats2 = np.ravel(lons2), np.ravel(lats2)
+    if chunksize is None:
+        # about 10^7 elements per chunk
+        chunksize = max(1,int(1e7/max(1,len(lons2))))
+    distM = np.empty((len(lons1),len(lons2)),dtype=dtype)
+    for i in range(0,len(lons1),chunksize):
+        distM[i:i+chunksize,:] = haversine(lons1[i:i+chunksize,None],
+                                           lats1[i:i+chunksize,None],
+                                           lons2[None,:],lats2[None,:],
+                                           dtype=dtype)
+    return distM
+
+def haversine_nearest(lons1, lats1, lons2, lats2, chunksize=None,
+    dtype=None):
+    """
+    many to many search for the nearest point of set 2 for each point
+    of set 1 without storing the full distance matrix
+    returns: dists[n1], idx[n1] pointing to set 2
+    """
+    lons1, lats1 = np.ravel(lons1), np.ravel(lats1)
+    lons2, lats2 = np.ravel(lons2), np.ravel(lats2)
+    if chunksize is None:
+        # about 10^7 elements per chunk
+        chunksize = max(1,int(1e7/max(1,len(lons2))))
+    dists = np.empty(len(lons1))
+    idx = np.empty(len(lons1),dtype='int')
+    for i in range(0,len(lons1),chunksize):
+        tmp = haversine(lons1[i:i+chunksize,None],lats1[i:i+chunksize,None],
+                        lons2[None,:],lats2[None,:],dtype=dtype)
+        idx[i:i+chunksize] = np.nanargmin(tmp,axis=1)
+        dists[i:i+chunksize] = tmp[np.arange(len(tmp)),
+                                   idx[i:i+chunksize]]
+    return dists, idx
+
+def lonlat2xyz(lons,lats):
+    """
+    transform coordinates in decimal degrees to unit vectors in 3D,
+    returns array of shape (n,3)
+    """
+    lons = np.radians(np.array(lons,dtype='float64').ravel())
+    lats = np.radians(np.array(lats,dtype='float64').ravel())
+    xyz = np.empty((len(lons),3))
+    xyz[:,0] = np.cos(lats) * np.cos(lons)
+    xyz[:,1] = np.cos(lats) * np.sin(lons)
+    xyz[:,2] = np.sin(lats)
+    return xyz
+
+def km2chord(km):
+    """
+    great circle distance to straight line distance on the unit sphere
+    """
+    return 2 * np.sin(np.array(km,dtype='float64')/(2*6367.))
+
+def chord2km(chord):
+    """
+    straight line distance on the unit sphere to great circle distance
+    """
+    tmp = np.clip(np.array(chord,dtype='float64')/2.,0.,1.)
+    return 2 * 6367. * np.arcsin(tmp)
+
+def spherical_tree(lons,lats):
+    """
+    build a KD-tree of the unit vectors of a (model) grid such that
+    nearest neighbours in 3D are nearest neighbours on the sphere
+    """
+    from scipy.spatial import cKDTree
+    return cKDTree(lonlat2xyz(lons,lats))
+
+def query_tree(tree,lons,lats,distlim=None):
+    """
+    batched nearest neighbour query for all given points
+    returns:    dists in km (inf if no neighbour within distlim)
+                idx of the nearest grid point (tree.n if none found)
+    """
+    xyz = lonlat2xyz(lons,lats)
+    if len(xyz) == 0:
+        return np.array([]), np.array([],dtype='int')
+    if distlim is None:
+        chord, idx = tree.query(xyz,k=1)
+    else:
+        # inflate bound slightly, exact cut is done in km below
+        chord, idx = tree.query(xyz,k=1,
+                        distance_upper_bound=km2chord(distlim)*(1+1e-9))
+    dists = np.full(len(chord),np.inf)
+    found = np.isfinite(chord)
+    dists[found] = chord2km(chord[found])
+    if distlim is not None:
+        idx[dists>distlim] = tree.n
+        dists[dists>distlim] = np.inf
+    return dists, idx
+
+class validation_stats():
+    """
+    sufficient statistics of pairs a (product), b (reference) that
+    are updated chunk by chunk, merged across processes and
+    serialized with to_dict, metrics() returns the same as
+    metrics(a,b) for all pairs. Co-moments are kept centered and
+    merged pairwise (Chan et al.) to avoid cancellation.
+    n -> number of pairs
+    sa, sb -> sum of a, sum of b
+    sd, sad, sdd -> sum of a-b, |a-b| and (a-b)**2
+    caa, cbb, cab -> centered sums of squares and cross products
+    """
+    names = ['n','sa','sb','sd','sad','sdd','caa','cbb','cab']
+
+    def __init__(self,stats=None,dtype=None):
+        self.dtype = dtype
+        for name in self.names:
+            setattr(self,name,np.float64(0.))
+        self.n = 0
+        if stats is not None:
+            for name in self.names:
+                setattr(self,name,np.float64(stats[name]))
+            self.n = int(stats['n'])
+
+    def update(self,a,b):
+        """
+        adds pairs, pairs with nans are removed (marginalization)
+        """
+        a,b = np.asarray(a),np.asarray(b)
+        valid = ~(np.isnan(a) | np.isnan(b))
+        if not np.all(valid):
+            a,b = a[valid],b[valid]
+        if len(a)==0:
+            return self
+        if self.dtype is not None:
+            a = a.astype(self.dtype,copy=False)
+            b = b.astype(self.dtype,copy=False)
+        chunk = validation_stats()
+        chunk.n = len(a)
+        chunk.sa = np.sum(a)
+        chunk.sb = np.sum(b)
+        diff = a-b
+        chunk.sd = np.sum(diff)
+        chunk.sad = np.sum(np.abs(diff))
+        chunk.sdd = np.dot(diff,diff)
+        del diff
+        ac = a-chunk.sa/float(chunk.n)
+        bc = b-chunk.sb/float(chunk.n)
+        chunk.caa = np.dot(ac,ac)
+        chunk.cbb = np.dot(bc,bc)
+        chunk.cab = np.dot(ac,bc)
+        return self.merge(chunk)
+
+    def merge(self,other):
+        """
+        adds the statistics of other in place
+        """
+        if other.n==0:
+            return self
+        if self.n==0:
+            for name in self.names:
+                setattr(self,name,getattr(other,name))
+            return self
+        n = self.n + other.n
+        da = other.sa/float(other.n) - self.sa/float(self.n)
+        db = other.sb/float(other.n) - self.sb/float(self.n)
+        f = self.n*other.n/float(n)
+        self.caa = self.caa + other.caa + da*da*f
+        self.cbb = self.cbb + other.cbb + db*db*f
+        self.cab = self.cab + other.cab + da*db*f
+        for name in ['sa','sb','sd','sad','sdd']:
+            setattr(self,name,getattr(self,name) + getattr(other,name))
+        self.n = n
+        return self
+
+    def __add__(self,other):
+        return validation_stats(dtype=self.dtype).merge(self).merge(other)
+
+    def metrics(self):
+        """
+        metrics as returned by metrics(a,b)
+        """
+        n = np.float64(self.n)
+        with np.errstate(divide='ignore',invalid='ignore'):
+            mop = self.sa/n
+            mor = self.sb/n
+            msd = self.sdd/n
+            rmsd = np.sqrt(msd)
+            mad = self.sad/n
+            bias = self.sd/n
+            corr = self.cab/np.sqrt(self.caa*self.cbb)
+            slope = self.cab/self.cbb
+            SI = rmsd/mor*100.
+        return {'mop':mop,'mor':mor,'msd':msd,'rmsd':rmsd,'nov':self.n,
+                'mad':mad,'corr':corr,'bias':bias,
+                'SI':SI,'slope':slope}
+
+    def to_dict(self):
+        """
+        plain python types e.g. for json or netcdf attributes
+        """
+        stats = dict([(name,float(getattr(self,name)))
+                      for name in self.names])
+        stats['n'] = int(self.n)
+        return stats
+
+def metrics(a,b,dtype=None):
+    """
+    validation metrics of a (product) against b (reference),
+    pairs with nans are removed once (marginalization)
+    dtype -> accumulation type e.g. 'float64' for float32 input
+    returns dict with
+    mean of product --> mop
+    mean of reference --> mor
+    mean square difference --> msd
+    root mean square difference --> rmsd
+    number of data values --> nov
+    mean absolute difference --> mad
+    correlation --> corr
+    bias --> bias
+    scatter index in % --> SI
+    slope of the regression of a on b --> slope
+    """
+    return validation_stats(dtype=dtype).update(a,b).metrics()
+
 def rmsd(a,b):
     '''
     root mean square deviation
     if nans exist the prinziple of marginalization is applied
     '''
-    a,b = np.array(a),np.array(b)
-    comb = a + b
-    idx = np.array(range(len(a)))[~np.isnan(comb)]
-    a1=a[idx]
-    b1=b[idx]
-    n = len(a1)
-    diff2 = (a1-b1)**2
-    msd = diff2.sum()/n
-    rmsd = np.sqrt(msd)
-    return msd, rmsd
+    m = metrics(a,b)
+    return m['msd'], m['rmsd']
 
 def scatter_index(obs,model):
-    msd,rmsd = rmsd(obs,model)
-    SI = rmsd/np.nanmean(obs)*100.
-    return SI
+    return metrics(model,obs)['SI']
 
 def corr(a,b):
     '''
-    root mean square deviation
+    correlation
     if nans exist the prinziple of marginalization is applied
     '''
-    a,b = np.array(a),np.array(b)
-    comb = a + b
-    idx = np.array(range(len(a)))[~np.isnan(comb)]
-    a1=a[idx]
-    b1=b[idx]
-    corr = np.corrcoef(a1,b1)[1,0]
-    return corr
+    return metrics(a,b)['corr']
 
 def bias(a,b):
     """
     if nans exist the prinziple of marginalization is applied
     """
-    a,b = np.array(a),np.array(b)
-    comb = a + b
-    idx = np.array(range(len(a)))[~np.isnan(comb)]
-    a1=a[idx]
-    b1=b[idx]
-    N = len(a1)
-    bias = np.sum(a1-b1)/N
-    return bias
+    return metrics(a,b)['bias']
 
 def mad(a,b):
     """
     mean absolute deviation
     if nans exist the prinziple of marginalization is applied
     """
-    a,b = np.array(a),np.array(b)
-    comb = a + b
-    idx = np.array(range(len(a)))[~np.isnan(comb)]
-    a1=a[idx]
-    b1=b[idx]
-    N = len(a1)
-    mad = np.sum(np.abs(a1-b1))/N
-    return mad
+    return metrics(a,b)['mad']
 
-def runmean(vec,win,mode=None):
+def runstats(vec,win,skipnan=None,chunksize=None):
+    """
+    mean and std of all windows vec[j:j+win], windows are strided
+    views that are reduced in chunks of rows
+    """
+    import warnings
+    from numpy.lib.stride_tricks import as_strided
+    if chunksize is None:
+        chunksize = 2**16
+    vec = np.ascontiguousarray(vec,dtype='float64')
+    length = max(len(vec)-win+1,0)
+    mean = np.full(length,np.nan)
+    std = np.full(length,np.nan)
+    if length == 0:
+        return mean, std
+    windows = as_strided(vec,shape=(length,win),
+                         strides=(vec.strides[0],vec.strides[0]))
+    with warnings.catch_warnings():
+        # windows without values result in nan
+        warnings.simplefilter("ignore",RuntimeWarning)
+        for i in range(0,length,chunksize):
+            w = windows[i:i+chunksize]
+            if skipnan == True:
+                mean[i:i+chunksize] = np.nanmean(w,axis=1)
+                std[i:i+chunksize] = np.nanstd(w,axis=1)
+            else:
+                mean[i:i+chunksize] = np.mean(w,axis=1)
+                std[i:i+chunksize] = np.std(w,axis=1)
+    return mean, std
+
+def runmean(vec,win,mode=None,skipnan=None,bounds=None):
     """
     input:  vec = vector of values to me smoothed
             win = window length
             mode= string: left, centered, right
+            skipnan = True to ignore nans within a window
+            bounds = start, stop indices of blocks e.g. passes from
+                     block_bounds, windows do not straddle blocks
     """
     if mode is None:
         mode='centered'
@@ -245,55 +645,100 @@ def runmean(vec,win,mode=None):
     std = np.zeros(len(vec))*np.nan
     length = len(vec)-win+1
     if mode=='left':
-        count = win-1
-        start = win-1
-        for i in range(length):
-            out[count] = np.mean(vec[count-start:count+1])
-            std[count] = np.std(vec[count-start:count+1])
-            count = count+1
+        offset = win-1
     elif mode=='centered':
-        count = win/2
-        start = win/2
-        for i in range(length):
-            if win%2==0:
-                sys.exit("windo length needs to be odd!")
-            else:
-                out[count] = np.mean(vec[count-start:count+start+1])
-                std[count] = np.std(vec[count-start:count+start+1])
-                count = count+1
+        if (win%2==0 and length>0):
+            sys.exit("windo length needs to be odd!")
+        offset = win//2
     elif mode=='right':
-        count = 0
-        for i in range(length):
-            out[count] = np.mean(vec[i:i+win])
-            std[count] = np.std(vec[i:i+win])
-            count = count+1
+        offset = 0
+    else:
+        return out, std
+    if bounds is None:
+        bounds = ([0],[len(vec)])
+    for start, stop in zip(*bounds):
+        wmean, wstd = runstats(vec[start:stop],win,skipnan=skipnan)
+        out[start+offset:start+offset+len(wmean)] = wmean
+        std[start+offset:start+offset+len(wstd)] = wstd
     return out, std
 
-def bootstr(a,reps):
+def bootstr(a,reps,seed=None):
     """
     input:    - is a time series of length n
               - reps (number of repetitions)
+              - seed for reproducible draws
     output:   - an array of dim n x m where
                 m is the number of repetitions
               - indices of draws
     """
     n = len(a)
-    b = np.random.choice(a, (n, reps))
-    bidx = np.zeros(b.shape) * np.nan
-    for i in range(len(a)):
-        tmp = np.where(b==a[i])
-        bidx[tmp[0],tmp[1]] = i
-        del tmp
-    return b, bidx.astype('int')
+    bidx = np.random.RandomState(seed).randint(0,n,(n,reps))
+    return np.asarray(a)[bidx], bidx
+
+def bootstr_metrics(a,b,reps=None,seed=None,alpha=None,chunksize=None):
+    """
+    vectorized paired bootstrap of validation metrics
+    input:    - a (model) and b (reference) of length n,
+                pairs with nans are removed
+              - reps (number of repetitions)
+              - seed for reproducible draws
+              - alpha for the (1-alpha) percentile confidence
+                intervals
+              - chunksize, max elements of the (reps,n) index
+                matrix drawn at once, draws do not depend on it
+    output:   - dict with arrays of length reps for
+                msd, rmsd, bias, mad, corr and the confidence
+                intervals [lower,upper] as e.g. rmsd_ci
+    """
+    if reps is None:
+        reps = 1000
+    if alpha is None:
+        alpha = 0.05
+    if chunksize is None:
+        chunksize = int(1e7)
+    a, b, idx = marginalize(np.asarray(a,dtype='float64'),
+                            np.asarray(b,dtype='float64'))
+    n = len(a)
+    names = ['msd','rmsd','bias','mad','corr']
+    boot_dict = {}
+    for name in names:
+        boot_dict[name] = np.zeros(reps)*np.nan
+    if n > 0:
+        rs = np.random.RandomState(seed)
+        step = max(1,chunksize//n)
+        for i in range(0,reps,step):
+            m = min(step,reps-i)
+            bidx = rs.randint(0,n,(m,n))
+            A = a[bidx]
+            B = b[bidx]
+            diff = A-B
+            boot_dict['msd'][i:i+m] = np.mean(diff**2,axis=1)
+            boot_dict['bias'][i:i+m] = np.mean(diff,axis=1)
+            boot_dict['mad'][i:i+m] = np.mean(np.abs(diff),axis=1)
+            del diff
+            A -= np.mean(A,axis=1)[:,None]
+            B -= np.mean(B,axis=1)[:,None]
+            with np.errstate(divide='ignore',invalid='ignore'):
+                boot_dict['corr'][i:i+m] = (np.sum(A*B,axis=1)
+                        / np.sqrt(np.sum(A**2,axis=1)*np.sum(B**2,axis=1)))
+            del A, B, bidx
+        boot_dict['rmsd'] = np.sqrt(boot_dict['msd'])
+    for name in names:
+        if np.all(np.isnan(boot_dict[name])):
+            boot_dict[name + '_ci'] = np.array([np.nan,np.nan])
+        else:
+            boot_dict[name + '_ci'] = np.nanpercentile(boot_dict[name],
+                                [100*alpha/2.,100*(1-alpha/2.)])
+    return boot_dict
 
 def marginalize(a,b=None):
     if b is None:
         a = np.array(a)
-        return a[~np.isnan[a]]
+        return a[~np.isnan(a)]
     else:
         a,b = np.array(a),np.array(b)
         comb = a + b
-        idx = np.array(range(len(a)))[~np.isnan(comb)]
+        idx = np.flatnonzero(~np.isnan(comb))
         a1=a[idx]
         b1=b[idx]
         return a1,b1,idx
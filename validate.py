@@ -3,6 +3,7 @@ from datetime import datetime, timedelta
 from satmod import sentinel_altimeter as sa
 from stationmod import station_class as sc
 from stationmod import matchtime, get_model
+from stationmod import validate_stations
 from satmod import get_model2
 from satmod import validate
 from utils import identify_outliers
@@ -20,6 +21,7 @@ Validate a wave model (mwam4, mwam8, ARCMFC) against observations
 ./validate.py -m ARCMFC -fc 2018080218 -sat s3a # files 24h init steps
 ./validate.py -m mwam8 -fc 2018080218 -sat s3a # files 12h init steps
 ./validate.py -m mwam4 -fc 2018080218 -sat s3a # files 6h init steps
+./validate.py -m ARCMFC -sd 2018080100 -ed 2018080223 -plat all
 # Problems with leadtime e.g.:
 ./validate.py -m mwam8 -fc 2018080218 -lt 12 -sat s3a # 12h
 ./validate.py -m mwam4 -fc 2018080218 -lt 6 -sat s3a #  6h
@@ -37,7 +39,7 @@ parser.add_argument("-sd", metavar='startdate',
 parser.add_argument("-ed", metavar='enddate',
     help="end date of time period to be evaluated")
 parser.add_argument("-plat", metavar='platform',
-    help="name of platform")
+    help="name of platform, all for all stations in stationlist")
 parser.add_argument("-sat", metavar='satellite',
     help="name of satellite")
 parser.add_argument("-buoy", metavar='buoy',
@@ -87,6 +89,32 @@ if args.sat == 's3a':
     valid_dict=validate(results_dict)
     print valid_dict
 
-if args.plat is not None:
+if args.plat == 'all':
+    # all stations of stationlist in one pass
+    if args.sd is None:
+        fc_dates = [fc_date]
+    else:
+        if args.fc is None:
+            timewin = 0
+        fc_dates = [sdate + timedelta(hours=h) for h in
+                    range(int((edate-sdate).total_seconds()//3600)+1)]
+    if args.lt is None:
+        init_dates = fc_dates
+    else:
+        init_dates = [d - timedelta(hours=args.lt) for d in fc_dates]
+    results = validate_stations(args.m,fc_dates,init_dates=init_dates,
+                                timewin=timewin)
+    for name in results['names']:
+        valid_dict = results['station_metrics'][name]
+        print (name, valid_dict['nov'], valid_dict['rmsd'],
+               valid_dict['bias'], valid_dict['corr'])
+    print ('pooled', results['pooled_metrics'])
+    for error in results['errors']:
+        print ('skipped:', error)
+elif args.plat is not None:
+    if args.sd is None:
+        # only the time steps around fc_date are read
+        sdate = fc_date - timedelta(minutes=timewin)
+        edate = fc_date + timedelta(minutes=timewin)
     sc_obj = sc(args.plat,sdate,edate)
     ctime, cidx = matchtime(fc_date,fc_date,sc_obj.time,sc_obj.basedate)
@@ -14,7 +14,12 @@ import matplotlib.pyplot as plt
 from utils import grab_PID
 from stationmod import matchtime
 from satmod import get_model2
+from satmod import get_localfilelst, read_localtimes
+from satmod import load_state, save_state, cell_signature, pending_cells
+from satmod import init_worker, tmploop_validate
+from utils import validation_stats
 import os
+import multiprocessing as mp
 import argparse
 from argparse import RawTextHelpFormatter
 
@@ -23,23 +28,36 @@ parser = argparse.ArgumentParser(
 Main program to run the monthly ARCMFC validation
 with Sentinel.\n
 Usage example in unix command line: 
-./validate_arcmfc.py -d 201808\n
+./validate_arcmfc.py -d 201808 [-c 8] [-s state_201808.pkl]\n
 The argument consists of the year and month to be validated
 If no date is given the last month is validated.
+The collocations are computed in parallel by -c processes,
+default is the number of available cores.
+With -s completed cells (fc_date, lead time) are stored in the
+given state file and skipped when rerun, cells are computed again
+only if their model file or altimeter footprints changed.
     """,
     formatter_class = RawTextHelpFormatter
     )
 parser.add_argument('-d',help="validation for given month",
                     type=int)
+parser.add_argument('-c',help="number of processes for the validation",
+                    type=int)
+parser.add_argument('-s',help="state file to resume the validation")
 args = parser.parse_args()
 #args, rest = parser.parse_known_args()
 
-if len(sys.argv)<=2:
+if args.d is None:
     now = datetime.now()-relativedelta(months=1)
 else:
-    nowstr = str(sys.argv[2])
+    nowstr = str(args.d)
     now = datetime(int(nowstr[0:4]),int(nowstr[4:6]),1)
 
+if args.c is None:
+    corenum = mp.cpu_count()
+else:
+    corenum = args.c
+
 # retrieve PID
 grab_PID()
 
@@ -88,73 +106,140 @@ dictlst_all=[]
 excepts_all=[]
 count1 = 0
 
-start_time = time.time()
-sa_obj = sa(start_date,edate=end_date,timewin=timewin,
-            region="ARCMFC",mode="ARCMFC")
-time1 = time.time() - start_time
-print "Time used for collecting data: ", time1, " seconds" 
-
+# all (fc_date, init_date) combinations
+tasks = []
 while (tmp_date <= end_date):
-    print count1
     init_dates = map(lambda x: tmp_date - timedelta(hours=x),forecasts)
     fc_date = init_dates[0]
-    dictlst = []
-    excepts = []
-    count2 = 0
-    for element in init_dates:
-        print ("Validation for init_date: " 
-        + str(element) 
-        + "\n" 
-        + " and fc_date: " 
-        + str(fc_date))
-        try:
-            init_date = element
-            start_time = time.time()
-            results_dict = get_model2(sa_obj,"ARCMFC",init_date,fc_date)
-            time1 = time.time() - start_time
-            print "Time used for get_model: ", time1, " seconds"
-            valid_dict=validate(results_dict)
-            dictlst.append(valid_dict)
-            if np.isnan(valid_dict['msd']):
-                print "msd is np.nan --> no values in range"
-                print "For init_date: ", init_date
-                print "and fc_date: ", fc_date
-                M[count1,count2,0,3,0]=0
-                excepts.append([fc_date,init_date])
-                dictlst.append(9999.)
-            else:
-                dictnames=['mop','mor','msd','nov']
-                for i in range(len(dictnames)):
-                    M[count1,count2,0,i,0]=valid_dict[dictnames[i]]
-            count2=count2+1
-        except IOError as error:
-            #print "No pass for date: ", str(init_date)
-            print error, " for date: ", str(init_date)
-            print "!!! Model run missing !!!"
-            excepts.append([fc_date,init_date])
-            dictlst.append(9999.)
-            M[count1,count2,0,3,0]=0
-            count2=count2+1
-        except IndexError as error:
-            print error, " for date: ", str(init_date)
-            print "!!! No Sentinel pass !!!"
-            excepts.append([fc_date,init_date])
-            dictlst.append(9999.)
+    for count2 in range(len(init_dates)):
+        tasks.append((count1,count2,fc_date,init_dates[count2]))
+    dictlst_all.append([])
+    excepts_all.append([])
+    count1=count1+1
+    tmp_date = tmp_date + timedelta(hours=6)
+
+# cells of a previous run are kept if their input did not change
+state = load_state(args.s)
+signatures = None
+if args.s is not None:
+    pathlst, filelst = get_localfilelst(start_date,end_date,timewin,
+                                        "ARCMFC","ARCMFC",
+                                        sa.satpath_lustre)
+    sat_times = read_localtimes(pathlst,"ARCMFC")
+    signatures = {}
+    for count1, count2, fc_date, init_date in tasks:
+        signatures[(fc_date,forecasts[count2])] = \
+                cell_signature(fc_date,init_date,sat_times,
+                               timewin=timewin)
+pending = set(pending_cells([(task[2],forecasts[task[1]])
+                             for task in tasks],state,signatures))
+todo = [task for task in tasks
+        if (task[2],forecasts[task[1]]) in pending]
+print "Cells to compute: ", len(todo), " of ", len(tasks)
+
+if len(todo) > 0:
+    # only the time frame of cells to compute is read, limited to
+    # the time frame of the validation file as for a complete run
+    sdate = max(start_date,min([task[2] for task in todo]))
+    edate = max(sdate,min(end_date,max([task[2] for task in todo])))
+    start_time = time.time()
+    sa_obj = sa(sdate,edate=edate,timewin=timewin,
+                region="ARCMFC",mode="ARCMFC")
+    time1 = time.time() - start_time
+    print "Time used for collecting data: ", time1, " seconds" 
+    # region columns are computed before forking such that all
+    # processes share the same footprint arrays
+    sa_obj.materialize()
+else:
+    sa_obj = None
+print "Used number of processes: ", corenum
+if (corenum > 1 and len(todo) > 0):
+    pool = mp.Pool(processes=corenum,initializer=init_worker,
+                   initargs=(sa_obj,))
+    # tasks of one day use the same model files, keep them together 
+    # to benefit from the field cache of each process
+    results = pool.imap(tmploop_validate,todo,
+                        chunksize=4*len(forecasts))
+else:
+    init_worker(sa_obj)
+    results = map(tmploop_validate,todo)
+
+# results are returned in order of tasks
+cacheinfo_all = {}
+count = 0
+for count1, count2, fc_date, init_date, error, valid_dict, stats, \
+cacheinfo in results:
+    cacheinfo_all[cacheinfo[0]] = cacheinfo[1]
+    if isinstance(error,IOError):
+        #print "No pass for date: ", str(init_date)
+        print error, " for date: ", str(init_date)
+        print "!!! Model run missing !!!"
+    elif isinstance(error,IndexError):
+        print error, " for date: ", str(init_date)
+        print "!!! No Sentinel pass !!!"
+    elif isinstance(error,ValueError):
+        print error, " for date: ", str(init_date)
+        print "!!! Date not in model file !!!"
+    state[(fc_date,forecasts[count2])] = {
+        'init_date':init_date,
+        'signature':(None if signatures is None
+                     else signatures[(fc_date,forecasts[count2])]),
+        'error':(None if error is None else str(error)),
+        'valid_dict':valid_dict,
+        'stats':stats}
+    count = count + 1
+    # checkpoint once per fc_date
+    if (args.s is not None and count % len(forecasts) == 0):
+        save_state(args.s,state)
+if (corenum > 1 and len(todo) > 0):
+    pool.close()
+    pool.join()
+if args.s is not None:
+    save_state(args.s,state)
+
+# fill M from computed and resumed cells
+for count1, count2, fc_date, init_date in tasks:
+    cell = state[(fc_date,forecasts[count2])]
+    dictlst = dictlst_all[count1]
+    excepts = excepts_all[count1]
+    if cell['valid_dict'] is None:
+        excepts.append([fc_date,init_date])
+        dictlst.append(9999.)
+        M[count1,count2,0,3,0]=0
+    else:
+        valid_dict = cell['valid_dict']
+        dictlst.append(valid_dict)
+        if np.isnan(valid_dict['msd']):
+            print "msd is np.nan --> no values in range"
+            print "For init_date: ", init_date
+            print "and fc_date: ", fc_date
             M[count1,count2,0,3,0]=0
-            count2=count2+1
-        except ValueError as error:
-            print error, " for date: ", str(init_date)
-            print "!!! Date not in model file !!!"
             excepts.append([fc_date,init_date])
             dictlst.append(9999.)
-            M[count1,count2,0,3,0]=0
-            count2=count2+1
-    count1=count1+1
-    dictlst_all.append(dictlst)
-    excepts_all.append(excepts)
-    tmp_date = tmp_date + timedelta(hours=6)
+        else:
+            dictnames=['mop','mor','msd','nov']
+            for i in range(len(dictnames)):
+                M[count1,count2,0,i,0]=valid_dict[dictnames[i]]
+
+# metrics of all pairs of the month per lead time
+print "\nMonthly metrics per lead time:"
+for count2 in range(len(forecasts)):
+    pooled = validation_stats()
+    for count1, tmp, fc_date, init_date in tasks[count2::len(forecasts)]:
+        cell = state[(fc_date,forecasts[count2])]
+        if cell['stats'] is not None:
+            pooled.merge(validation_stats(cell['stats']))
+    valid_dict = pooled.metrics()
+    print (str(forecasts[count2]) + "h: nov " + str(valid_dict['nov'])
+          + ", rmsd " + str(valid_dict['rmsd'])
+          + ", bias " + str(valid_dict['bias'])
+          + ", corr " + str(valid_dict['corr']))
 loop_time = time.time() - loop_time_start
 print "Seconds needed for entire loop: ", loop_time
+print "Model field cache hits: ", \
+        sum([info['hits'] for info in cacheinfo_all.values()]), \
+        " misses: ", \
+        sum([info['misses'] for info in cacheinfo_all.values()])
 
 print "\nAppending results to existing netcdf validation file ..."
 